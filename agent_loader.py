@@ -1,25 +1,66 @@
 import os
+import sys
+import json
+import hashlib
+import threading
 import importlib.util
 from pathlib import Path
 import inspect
 from core.digiman_core import evaluate_agent_quality, log_action
-from gpt.gpt_router import interpret_command
+from core.journal import atomic_write_json
+from core.agent_registry import agent_registry
+from core.tracing import span, traced
+from gpt.gpt_router import interpret_command, current_task_context
 from datetime import datetime
 
 AGENT_REGISTRY = {}
 
+# === Loaded Module Cache ===
+# file path -> {"stat": (mtime_ns, size), "hash": sha256, "agents": {registry name: class}}
+_module_cache = {}
+_loader_lock = threading.Lock()
+
+# Quality scores survive restarts: keyed by content hash, so an edited file is rescored
+SCORE_CACHE_FILE = Path(".digi/agent_cache.json")
+_score_cache = None
+
+def load_score_cache():
+    global _score_cache
+    if _score_cache is None:
+        try:
+            _score_cache = json.loads(SCORE_CACHE_FILE.read_text())
+        except (FileNotFoundError, json.JSONDecodeError):
+            _score_cache = {}
+    return _score_cache
+
+def quality_for(file_hash, name, obj):
+    scores = load_score_cache().setdefault(file_hash, {})
+    if name not in scores:
+        score, reasons = evaluate_agent_quality(inspect.getsource(obj))
+        scores[name] = [score, reasons]
+    return scores[name]
+
 def wrap_with_gpt(agent_class):
     class GPTWrappedAgent(agent_class):
         def run_task(self, task):
+            with span("agent.wrapper", agent_class=agent_class.__name__, task_id=task.get("id")):
+                self._run_task(task)
+
+        def _run_task(self, task):
             log_action(self.__class__.__name__, f"Received task: {task['task']}", self.client_id)
             try:
+                context = current_task_context()
+                routed = context is not None and context.decision is not None
+                # Inside the loop's decision context this is served from the recorded decision
                 decision = interpret_command(task["task"], self.client_id)
                 log_action(self.__class__.__name__, f"GPT-decided: {decision}", self.client_id)
-                self.log_reasoning(task["task"], decision)
+                if not routed:
+                    self.log_reasoning(task["task"], decision)
                 task.update(decision)
             except Exception as e:
                 log_action(self.__class__.__name__, f"GPT failed: {e}", self.client_id)
-            super().run_task(task)
+            with span("agent.run_task", agent_class=agent_class.__name__):
+                super().run_task(task)
 
         def log_reasoning(self, input_text, output_json):
             log_path = Path(f".digi/clients/{self.client_id}/gpt_reasons.log")
@@ -29,30 +70,92 @@ def wrap_with_gpt(agent_class):
 
     return GPTWrappedAgent
 
+# Agent files load under their own package name, so an agents/metrics.py can't replace
+# the real top-level metrics module for the whole process
+AGENT_MODULE_PREFIX = "digiman_agents."
+
+def load_module_agents(file, file_hash, client_id=None):
+    module_name = AGENT_MODULE_PREFIX + file.stem
+    file_path = str(file.resolve())
+
+    spec = importlib.util.spec_from_file_location(module_name, file_path)
+    module = importlib.util.module_from_spec(spec)
+    agents = {}
+    try:
+        # inspect.getsource() resolves classes through sys.modules
+        sys.modules[module_name] = module
+        spec.loader.exec_module(module)
+        for name, obj in inspect.getmembers(module, inspect.isclass):
+            if agent_registry.is_agent_class(name):
+                score, reasons = quality_for(file_hash, name, obj)
+                if score >= 3:
+                    wrapped_class = wrap_with_gpt(obj)
+                    # Keyed by canonical name: the same name update_task_queue files tasks under
+                    agents[agent_registry.register(name)] = wrapped_class
+                    log_action(name, f"Loaded (GPT-wrapped) agent with score {score}/4", client_id)
+                else:
+                    log_action(name, f"Skipped (score {score}/4): {' | '.join(reasons)}", client_id)
+    except Exception as e:
+        # Don't leave a half-initialised module behind for the next import to find
+        if sys.modules.get(module_name) is module:
+            del sys.modules[module_name]
+        log_action("Agent Loader", f"Error loading {file.name}: {e}", client_id)
+    return agents
+
+@traced("agents.load")
 def load_agents(agent_dir="agents", client_id=None):
+    """
+    Only new or edited agent files are executed again; unchanged files keep their
+    loaded classes. A file counts as unchanged when its mtime and size match, or when
+    they moved but the content hash did not.
+    """
+    global AGENT_REGISTRY
     agent_path = Path(agent_dir)
-    for file in agent_path.glob("*.py"):
-        if file.name.startswith("_"):
-            continue
+    with _loader_lock:
+        seen = set()
+        scores_changed = False
+        for file in sorted(agent_path.glob("*.py")):
+            if file.name.startswith("_"):
+                continue
+            file_path = str(file.resolve())
+            seen.add(file_path)
+            try:
+                st = file.stat()
+            except FileNotFoundError:
+                continue
+            stat_key = (st.st_mtime_ns, st.st_size)
+            cached = _module_cache.get(file_path)
+            if cached and cached["stat"] == stat_key:
+                continue
 
-        module_name = file.stem
-        file_path = str(file.resolve())
+            file_hash = hashlib.sha256(file.read_bytes()).hexdigest()
+            if cached and cached["hash"] == file_hash:
+                cached["stat"] = stat_key
+                continue
 
-        spec = importlib.util.spec_from_file_location(module_name, file_path)
-        module = importlib.util.module_from_spec(spec)
-        try:
-            spec.loader.exec_module(module)
-            for name, obj in inspect.getmembers(module, inspect.isclass):
-                if name.endswith("Agent"):
-                    code = inspect.getsource(obj)
-                    score, reasons = evaluate_agent_quality(code)
-                    if score >= 3:
-                        wrapped_class = wrap_with_gpt(obj)
-                        AGENT_REGISTRY[name.replace("Agent", " Agent")] = wrapped_class
-                        log_action(name, f"Loaded (GPT-wrapped) agent with score {score}/4", client_id)
-                    else:
-                        log_action(name, f"Skipped (score {score}/4): {' | '.join(reasons)}", client_id)
-        except Exception as e:
-            log_action("Agent Loader", f"Error loading {file.name}: {e}", client_id)
-
-    return AGENT_REGISTRY
+            known_scores = file_hash in load_score_cache()
+            _module_cache[file_path] = {
+                "stat": stat_key,
+                "hash": file_hash,
+                "agents": load_module_agents(file, file_hash, client_id)
+            }
+            scores_changed = scores_changed or not known_scores
+
+        for file_path in [p for p in _module_cache if p not in seen and p.startswith(str(agent_path.resolve()))]:
+            del _module_cache[file_path]
+
+        # A fresh dict swapped in whole: a caller still iterating the previous result never
+        # sees it emptied and half refilled
+        registry = {}
+        for entry in _module_cache.values():
+            registry.update(entry["agents"])
+        AGENT_REGISTRY = registry
+
+        if scores_changed:
+            try:
+                live_hashes = {entry["hash"] for entry in _module_cache.values()}
+                atomic_write_json(SCORE_CACHE_FILE, {h: v for h, v in load_score_cache().items() if h in live_hashes})
+            except Exception as e:
+                log_action("Agent Loader", f"Failed to save agent cache: {e}", client_id)
+
+    return registry
@@ -1,7 +1,7 @@
 import json
 from core.metrics import metrics
 from core.memory_store import load_memory
-from core.digiman_core import log_action, update_task_queue
+from core.digiman_core import log_action, update_task_queue, enqueue_many
 from pathlib import Path
 from gpt.gpt_router import interpret_command
 from datetime import datetime
@@ -55,7 +55,9 @@ class AnalystAgent:
 
         for insight in insights:
             log_action("Analyst Agent", f"Insight: {insight}", self.client_id)
-            update_task_queue("Manager Agent", {"task": f"Review: {insight}", "priority": 2}, self.client_id)
+        enqueue_many([
+            ("Manager Agent", {"task": f"Review: {insight}", "priority": 2}) for insight in insights
+        ], self.client_id, source="Analyst Agent")
 
     def generate_scaling_report(self):
         summary = {
@@ -71,8 +73,10 @@ class AnalystAgent:
         update_task_queue("Manager Agent", {"task": "Review latest scaling report", "priority": 2}, self.client_id)
 
     def suggest_improvement(self):
-        update_task_queue("Marketing Agent", {"task": "Optimize campaign targeting", "priority": 2}, self.client_id)
-        update_task_queue("CRM Agent", {"task": "Review lead conversion workflow", "priority": 2}, self.client_id)
+        enqueue_many([
+            ("Marketing Agent", {"task": "Optimize campaign targeting", "priority": 2}),
+            ("CRM Agent", {"task": "Review lead conversion workflow", "priority": 2})
+        ], self.client_id, source="Analyst Agent")
         log_action("Analyst Agent", "Improvement tasks queued for Marketing and CRM", self.client_id)
 
     def log_reasoning(self, input_text, output_json):
@@ -1,47 +1,258 @@
 from pathlib import Path
+import os
+import json
 import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from core.agent_loader import load_agents
-from core.digiman_core import log_action, update_task_queue, load_task_queue
-from core.metrics import metrics
-from gpt.gpt_router import interpret_command
+from core.digiman_core import log_action, update_task_queue, enqueue_many
+from core.task_queue import get_task_queue, task_payload
+from core.agent_registry import agent_registry, resolve_agent, dead_letter, routable_dead_letters, remove_dead_letters
+from core.metrics import metrics, increment_metric
+from core.wakeup import wakeup_hub, TimerWheel
+from core.tracing import span, propagate
+from gpt.gpt_router import interpret_command, TaskDecisionContext, llm_saturated
+from gpt.llm_client import llm_client, LLMUnavailable
 from datetime import datetime
 from pathlib import Path
 
+LOOP_WORKERS = int(os.getenv("LOOP_WORKERS", 1))
+CALENDAR_JOBS_ENABLED = os.getenv("CALENDAR_JOBS_ENABLED", "True").lower() == "true"
+DEFER_RETRY_SECONDS = float(os.getenv("LOOP_DEFER_RETRY_SECONDS", 5))  # least wait before retrying deferred tasks
+
+# === Calendar Jobs ===
+# Periodic agent checks, run off a timer wheel instead of being re-checked every pass:
+# (agent, method, period in seconds, file under the client dir, timestamp key)
+WEEK = 7 * 24 * 3600
+CALENDAR_JOBS = [
+    ("Scout Agent", "auto_trigger", WEEK, "scout_last_run.json", "last_run"),
+    ("Marketing Agent", "check_auto_trigger", WEEK, "last_campaign.json", "last_run"),
+    ("Socials Agent", "auto_post_trigger", WEEK, "socials_last_post.json", "last_post"),
+]
+
+# One lock per (client, agent): an agent never runs two tasks for the same client at once,
+# even when several loops share the process
+_agent_locks = {}
+_agent_locks_guard = threading.Lock()
+
+def agent_lock(client_id, agent_name):
+    with _agent_locks_guard:
+        return _agent_locks.setdefault((client_id, agent_name), threading.Lock())
+
 class AutonomousLoop:
-    def __init__(self, client_id=None):
+    def __init__(self, client_id=None, max_workers=None):
         self.client_id = client_id
         self.metrics = metrics
+        self.max_workers = max_workers or LOOP_WORKERS
+        self.routing_calls_saved = 0
+        self.task_timings = []
+        self.stats_lock = threading.Lock()
+        self.registry_version = None
+        self.timers = None
+        self.tasks_deferred = 0
+        self.deferred_until = None
 
     def run(self):
+        with span("loop.run", client=self.client_id):
+            return self._run()
+
+    def _run(self):
         agents = load_agents(client_id=self.client_id)
-        queue = load_task_queue(self.client_id)
+        queue = get_task_queue(self.client_id)
+        self.routing_calls_saved = 0
+        self.task_timings = []
+        self.tasks_deferred = 0
+        started = time.monotonic()
+
+        self.reroute(queue, agents)
+        # Dispatch walks only agents with pending work, each one a dict lookup
+        ready = [(name, agents[name]) for name in queue.pending_agents() if name in agents]
+
+        if self.max_workers <= 1:
+            for agent_name, agent_class in ready:
+                self.run_agent(agent_name, agent_class, queue)
+        else:
+            # Agents run in parallel, each agent's tasks stay in order inside one job
+            with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="digiman-loop") as pool:
+                futures = []
+                for agent_name, agent_class in ready:
+                    # Backpressure: hold new agent jobs while the LLM gate is full
+                    while llm_saturated():
+                        time.sleep(0.05)
+                    futures.append(pool.submit(propagate(self.run_agent), agent_name, agent_class, queue))
+                for future in futures:
+                    future.result()
 
-        for agent_name, agent_class in agents.items():
+        self.run_due_jobs(agents)
+        # Deferred tasks wait out the LLM's cooldown instead of being retried straight away
+        self.deferred_until = (
+            time.time() + max(llm_client.retry_delay(), DEFER_RETRY_SECONDS) if self.tasks_deferred else None
+        )
+        self.report_timings(time.monotonic() - started)
+        log_action("Autonomous Loop", f"Routing calls saved this loop: {self.routing_calls_saved}", self.client_id)
+        log_action("Autonomous Loop", f"Loop completed for client: {self.client_id}", self.client_id)
+        return True
+
+    def reroute(self, queue, agents):
+        """
+        Fix up names left by older queues: tasks filed under an alias move to the canonical
+        name, tasks for names nothing resolves to go to the dead-letter file.
+        """
+        for name in queue.pending_agents():
+            if name in agents:
+                continue
+            canonical = resolve_agent(name)
+            if canonical == name:
+                continue  # a real agent, just not loaded in this process
+            if canonical:
+                moved = queue.move(name, canonical)
+                log_action("Autonomous Loop", f"Re-filed {moved} tasks from '{name}' to '{canonical}'", self.client_id)
+            else:
+                entries = queue.snapshot().get(name, [])
+                dead_letter(self.client_id, [(name, entry.get("task")) for entry in entries])
+                queue.pop(name)
+                log_action("Autonomous Loop", f"Dead-lettered {len(entries)} tasks for unknown agent '{name}'", self.client_id)
+
+        # Newly registered agents may claim tasks parked earlier
+        if self.registry_version != agent_registry.version:
+            self.registry_version = agent_registry.version
+            routable = routable_dead_letters(self.client_id)
+            if routable:
+                # Queued first, then taken out of the dead letters: a failure in between
+                # leaves them parked (to be re-queued again), never lost
+                enqueue_many([(name, record["task"]) for name, record in routable], self.client_id, source="Autonomous Loop")
+                remove_dead_letters(self.client_id, [record for _, record in routable])
+
+    def run_agent(self, agent_name, agent_class, queue):
+        with agent_lock(self.client_id, agent_name):
+            # Highest priority first; consumed durably before the tasks run
+            with span("queue.pop", agent=agent_name):
+                agent_tasks = [task_payload(entry) for entry in queue.pop(agent_name)]
+            if not agent_tasks:
+                return
             agent_instance = agent_class(client_id=self.client_id)
-            agent_tasks = sorted(queue.get(agent_name, []), key=lambda x: x.get("priority", 1), reverse=True)
 
             for task in agent_tasks:
-                try:
-                    gpt_decision = interpret_command(task["task"], self.client_id)
-                    log_action(agent_name, f"GPT interpreted: {gpt_decision}", self.client_id)
-                    self.log_reasoning(task["task"], gpt_decision)
-                    task.update(gpt_decision)
+                self.run_one(agent_name, agent_instance, task)
 
-                    agent_instance.run_task(task)
+    def run_one(self, agent_name, agent_instance, task):
+        started_at = datetime.now()
+        started = time.monotonic()
+        requeued = dict(task)
+        decision_context = TaskDecisionContext(self.client_id, task["task"], task.get("priority", 1))
+        try:
+            with decision_context, span("loop.task", agent=agent_name, task_id=task.get("id")):
+                gpt_decision = interpret_command(task["task"], self.client_id, agent=agent_name)
+                log_action(agent_name, f"GPT interpreted: {gpt_decision}", self.client_id)
+                self.log_reasoning(task["task"], gpt_decision)
+                task.update(gpt_decision)
 
-                except Exception as e:
-                    log_action(agent_name, f"Task error: {e}", self.client_id)
-                    self.metrics["tasks_failed"] += 1
+                agent_instance.run_task(task)
 
-            queue[agent_name] = []
+        except LLMUnavailable as e:
+            # Rate limited or down past its retries: put the task back rather than lose it,
+            # without an enqueue notification (it would wake this loop straight back up)
+            update_task_queue(agent_name, requeued, self.client_id, notify=False)
+            log_action(agent_name, f"LLM unavailable, task requeued: {e}", self.client_id)
+            increment_metric("tasks_deferred")
+            with self.stats_lock:
+                self.tasks_deferred += 1
+        except Exception as e:
+            log_action(agent_name, f"Task error: {e}", self.client_id)
+            increment_metric("tasks_failed")
 
-        log_action("Autonomous Loop", f"Loop completed for client: {self.client_id}", self.client_id)
-        return True
+        with self.stats_lock:
+            self.routing_calls_saved += decision_context.calls_saved
+            self.task_timings.append({
+                "agent": agent_name,
+                "task_id": task.get("id"),
+                "wall_seconds": round(time.monotonic() - started, 4),
+                "queue_wait_seconds": self.queue_wait(task, started_at)
+            })
+
+    def queue_wait(self, task, started_at):
+        enqueued = task.get("queued_at")
+        try:
+            return round((started_at - datetime.fromisoformat(enqueued)).total_seconds(), 4)
+        except (TypeError, ValueError):
+            return None
+
+    def report_timings(self, loop_seconds):
+        if not self.task_timings:
+            return
+        walls = [t["wall_seconds"] for t in self.task_timings]
+        waits = [t["queue_wait_seconds"] for t in self.task_timings if t["queue_wait_seconds"] is not None]
+        summary = (
+            f"Ran {len(walls)} tasks in {loop_seconds:.2f}s with {self.max_workers} worker(s) | "
+            f"avg wall {sum(walls) / len(walls):.3f}s, max wall {max(walls):.3f}s"
+        )
+        if waits:
+            summary += f" | avg queue wait {sum(waits) / len(waits):.1f}s"
+        log_action("Autonomous Loop", summary, self.client_id)
+
+    # === Calendar Jobs ===
+    def schedule_jobs(self):
+        """Put each calendar job on the wheel at its next due time, read from its last-run file."""
+        self.timers = TimerWheel()
+        for job in CALENDAR_JOBS if CALENDAR_JOBS_ENABLED else []:
+            self.timers.schedule(job, self.job_due(job))
+
+    def job_due(self, job):
+        _, _, period, file_name, key = job
+        try:
+            data = json.loads(Path(f".digi/clients/{self.client_id}/{file_name}").read_text())
+            return datetime.fromisoformat(data[key]).timestamp() + period
+        except (FileNotFoundError, KeyError, TypeError, ValueError, OverflowError):
+            return time.time()  # never ran: due now
+
+    def next_job_due(self):
+        if self.timers is None:
+            self.schedule_jobs()
+        return self.timers.next_deadline()
+
+    def next_wakeup(self):
+        """Earliest of the next calendar job and the retry time for deferred tasks."""
+        due = [t for t in (self.next_job_due(), self.deferred_until) if t is not None]
+        return min(due) if due else None
+
+    def run_due_jobs(self, agents=None):
+        if self.timers is None:
+            self.schedule_jobs()
+        due = self.timers.pop_due(time.time())
+        if not due:
+            return
+        agents = agents if agents is not None else load_agents(client_id=self.client_id)
+        for job in due:
+            agent_name, method, period = job[:3]
+            agent_class = agents.get(agent_name)
+            if agent_class is not None:
+                try:
+                    with span("loop.calendar_job", agent=agent_name):
+                        getattr(agent_class(client_id=self.client_id), method)()
+                except Exception as e:
+                    log_action(agent_name, f"Calendar job {method} failed: {e}", self.client_id)
+            self.timers.schedule(job, time.time() + period)
 
     def loop_forever(self, interval_seconds=10):
+        """
+        Run whenever this client's queue gets work and whenever a calendar job falls due;
+        otherwise block. interval_seconds is only a fallback poll, used when this process
+        can't receive other processes' enqueue signals.
+        """
+        listening = wakeup_hub.listen()
         while True:
+            seen = wakeup_hub.generation(self.client_id)
             self.run()
-            time.sleep(interval_seconds)
+            if self.deferred_until is not None:
+                # The LLM is cooling down: new work couldn't run either, so hold until it may answer
+                time.sleep(max(0.0, self.deferred_until - time.time()))
+                continue
+            timeout = None if listening else interval_seconds
+            next_due = self.next_job_due()
+            if next_due is not None:
+                until_due = max(0.0, next_due - time.time())
+                timeout = until_due if timeout is None else min(timeout, until_due)
+            wakeup_hub.wait(seen, timeout, self.client_id)
 
     def log_reasoning(self, input_text, output_json):
         log_path = Path(f".digi/clients/{self.client_id}/gpt_reasons.log")
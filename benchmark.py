@@ -0,0 +1,409 @@
+# benchmark.py
+"""
+Offline benchmark for the autonomous loop and the stores under it. Runs in a scratch
+directory against a seeded fake LLM (gpt.fake_backend), so no API key, network or real
+client data is touched, and writes one JSON result per run for diffing between commits:
+
+    python benchmark.py --tenants 4 --tasks 200 --latency 0.05 --failure-rate 0.02
+    python benchmark.py --compare .digi/benchmarks/<earlier run>.json
+    python benchmark.py --replay .digi/llm_archive.jsonl.gz --latency-scale 0.1
+"""
+import os
+import sys
+import json
+import time
+import logging
+import random
+import argparse
+import platform
+import subprocess
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+REPO_DIR = Path(__file__).resolve().parent
+
+WORDS = (
+    "lead campaign pricing churn onboarding franchise invoice renewal webinar referral "
+    "newsletter discount upsell audit forecast funnel retention partner outreach demo "
+    "landing budget revenue trial support ticket escalation segment cohort launch"
+).split()
+INDUSTRIES = ["saas", "retail", "fitness", "dental", "legal", "real estate", "hospitality"]
+
+# Stand-ins for the real agents: enough work to exercise routing, logging and memory,
+# and nothing (mail, scraping, file generation) that would make runs differ
+BENCH_AGENTS = {
+    "SalesAgent": "Sales Agent",
+    "MarketingAgent": "Marketing Agent",
+    "CRMAgent": "CRM Agent",
+    "AnalystAgent": "Analyst Agent",
+}
+BENCH_AGENT_SOURCE = '''
+from core.digiman_core import log_action
+from core.memory_store import add_memory_entry
+
+class {name}:
+    def __init__(self, client_id=None):
+        self.client_id = client_id
+
+    def run_task(self, task):
+        log_action("{name}", f"[RUN_TASK] {{task['task']}}", self.client_id)
+        self.record(task)
+
+    def record(self, task):
+        add_memory_entry(self.client_id, "assistant", f"{name} handled: {{task['task']}}")
+'''
+
+# === Settings ===
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline DigiMan benchmark with a fake LLM")
+    parser.add_argument("--tenants", type=int, default=3, help="synthetic clients run through the loop")
+    parser.add_argument("--tasks", type=int, default=200, help="queued tasks per tenant")
+    parser.add_argument("--memory", type=int, default=5000, help="memory.json entries per tenant")
+    parser.add_argument("--leads", type=int, default=5000, help="leads.json entries per tenant")
+    parser.add_argument("--ops", type=int, default=2000, help="calls per micro-benchmark")
+    parser.add_argument("--workers", type=int, default=4, help="loop workers (LOOP_WORKERS)")
+    parser.add_argument("--latency", type=float, default=0.02, help="fake LLM seconds per call")
+    parser.add_argument("--jitter", type=float, default=0.5, help="latency spread, as a fraction")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="share of fake LLM calls that fail")
+    parser.add_argument("--follow-up-rate", type=float, default=0.0, help="share of routing replies queueing a follow-up")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--replay", help="recorded LLM archive to replay (misses fall back to the fake LLM)")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="replayed latency multiplier (0.1 = 10x speed)")
+    parser.add_argument("--output", help="result file (default .digi/benchmarks/<commit>_<time>.json)")
+    parser.add_argument("--compare", help="earlier result file to print deltas against")
+    parser.add_argument("--workdir", help="scratch directory to keep (default: a temp dir)")
+    parser.add_argument("--verbose", action="store_true", help="keep the modules' INFO logging on the console")
+    return parser.parse_args(argv)
+
+def configure_environment(args):
+    """Set before any core module is imported: most of them read their settings at import time."""
+    os.environ.setdefault("LLM_CACHE_ENABLED", "False")    # every call should reach the fake LLM
+    os.environ.setdefault("LLM_RPM", "1000000")            # measure the code, not the rate limiter
+    os.environ.setdefault("LLM_TPM", "1000000000")
+    os.environ.setdefault("LLM_RETRY_BASE", "0.01")
+    os.environ.setdefault("CALENDAR_JOBS_ENABLED", "False")
+    os.environ.setdefault("DIGIMAN_WAKEUP_ENABLED", "False")
+    os.environ.setdefault("DIGIMAN_API_KEY", "bench")
+    os.environ["LOOP_WORKERS"] = str(args.workers)
+    # Configured first, the modules' own basicConfig(INFO) is a no-op: console output would swamp the timings
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
+
+# === Helpers ===
+def summarize(samples):
+    """Latency summary in milliseconds."""
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+    return {
+        "count": len(ordered),
+        "mean_ms": round(1000 * sum(ordered) / len(ordered), 4),
+        "p50_ms": round(1000 * pick(0.50), 4),
+        "p95_ms": round(1000 * pick(0.95), 4),
+        "p99_ms": round(1000 * pick(0.99), 4),
+        "max_ms": round(1000 * ordered[-1], 4)
+    }
+
+def timed(fn, calls):
+    samples = []
+    for i in range(calls):
+        started = time.perf_counter()
+        fn(i)
+        samples.append(time.perf_counter() - started)
+    return samples
+
+def rate(count, seconds):
+    return round(count / seconds, 2) if seconds > 0 else None
+
+def sentence(rng, words=8):
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+def git_revision():
+    def git(*cmd):
+        return subprocess.run(
+            ["git", *cmd], cwd=REPO_DIR, capture_output=True, text=True, timeout=10
+        ).stdout.strip()
+    try:
+        return {"commit": git("rev-parse", "HEAD") or None, "dirty": bool(git("status", "--porcelain"))}
+    except Exception:
+        return {"commit": None, "dirty": None}
+
+# === Synthetic Tenants ===
+def write_agents(agent_dir):
+    agent_dir.mkdir(parents=True, exist_ok=True)
+    for name in BENCH_AGENTS:
+        (agent_dir / f"bench_{name.lower()}.py").write_text(BENCH_AGENT_SOURCE.format(name=name))
+
+def make_tenant(client_id, args, rng):
+    """memory.json, leads.json and agent_queue.json in the formats older installs left behind."""
+    base = Path(f".digi/clients/{client_id}")
+    base.mkdir(parents=True, exist_ok=True)
+    now = datetime.now().isoformat()
+
+    memory = [
+        {"role": "user" if i % 2 == 0 else "assistant", "content": sentence(rng, 20), "timestamp": now}
+        for i in range(args.memory)
+    ]
+    (base / "memory.json").write_text(json.dumps(memory))
+
+    leads = [
+        {
+            "email": f"lead{i}@{client_id}.example.com",
+            "source": rng.choice(["scout", "webinar", "referral", "ads"]),
+            "status": rng.choice(["new", "contacted", "qualified", "closed"]),
+            "score": rng.randint(1, 10),
+            "industry": rng.choice(INDUSTRIES),
+            "created_at": now,
+            "notes": [sentence(rng, 6) for _ in range(rng.randint(0, 2))]
+        }
+        for i in range(args.leads)
+    ]
+    (base / "leads.json").write_text(json.dumps(leads))
+
+    queue = {}
+    for i in range(args.tasks):
+        agent = rng.choice(sorted(BENCH_AGENTS.values()))
+        priority = rng.randint(1, 3)
+        queue.setdefault(agent, []).append({
+            "task": {"task": f"{sentence(rng)} #{i}", "priority": priority},
+            "priority": priority,
+            "timestamp": now
+        })
+    (base / "agent_queue.json").write_text(json.dumps(queue))
+
+# === Benchmarks ===
+def bench_enqueue(args):
+    from core.digiman_core import update_task_queue, enqueue_many
+    rng = random.Random(args.seed)
+    tasks = [(rng.choice(["Sales Agent", "CRM Agent"]), {"task": sentence(rng), "priority": 1}) for _ in range(args.ops)]
+
+    single = timed(lambda i: update_task_queue(tasks[i][0], tasks[i][1], "bench-enqueue"), len(tasks))
+    started = time.perf_counter()
+    for offset in range(0, len(tasks), 50):
+        enqueue_many(tasks[offset:offset + 50], "bench-enqueue-batch")
+    batched = time.perf_counter() - started
+    return {
+        "single": dict(summarize(single), tasks_per_second=rate(len(single), sum(single))),
+        "batched_50": {"tasks_per_second": rate(len(tasks), batched)}
+    }
+
+def bench_log_action(args):
+    from core.digiman_core import log_action
+    from core.action_logger import action_logger
+    samples = timed(lambda i: log_action("Benchmark", f"synthetic action {i}", "bench-log"), args.ops)
+    started = time.perf_counter()
+    action_logger.flush()
+    flush = time.perf_counter() - started
+    return dict(summarize(samples), calls_per_second=rate(len(samples), sum(samples)), flush_ms=round(1000 * flush, 4))
+
+def bench_memory(args, client_id):
+    from core.memory_store import load_memory, add_memory_entry
+    from core.memory_index import search_memory
+    rng = random.Random(args.seed)
+
+    started = time.perf_counter()
+    loaded = len(load_memory(client_id))
+    cold_load = time.perf_counter() - started
+
+    first_search = timed(lambda i: search_memory(client_id, "pricing churn renewal"), 1)
+    appends = timed(lambda i: add_memory_entry(client_id, "user", sentence(rng, 20)), args.ops)
+    reads = timed(lambda i: load_memory(client_id), min(args.ops, 200))
+    queries = [sentence(rng, 4) for _ in range(min(args.ops, 500))]
+    searches = timed(lambda i: search_memory(client_id, queries[i]), len(queries))
+    return {
+        "entries_loaded": loaded,
+        "cold_load_ms": round(1000 * cold_load, 4),
+        "first_search_ms": round(1000 * first_search[0], 4),
+        "append": dict(summarize(appends), ops_per_second=rate(len(appends), sum(appends))),
+        "load": summarize(reads),
+        "search": summarize(searches)
+    }
+
+def bench_leads(args, client_id):
+    from core.lead_store import get_lead_store
+    rng = random.Random(args.seed)
+
+    started = time.perf_counter()
+    store = get_lead_store(client_id)  # first open migrates leads.json
+    migrate = time.perf_counter() - started
+
+    emails = [f"lead{rng.randrange(max(args.leads, 1))}@{client_id}.example.com" for _ in range(args.ops)]
+    lookups = timed(lambda i: store.get(emails[i]), len(emails))
+    adds = timed(lambda i: store.add({"email": f"new{i}@{client_id}.example.com", "source": "bench"}), args.ops)
+    filters = timed(lambda i: store.count(status="qualified", industry=INDUSTRIES[i % len(INDUSTRIES)]), 100)
+    return {
+        "leads": store.count(),
+        "migrate_ms": round(1000 * migrate, 4),
+        "get": summarize(lookups),
+        "add": dict(summarize(adds), ops_per_second=rate(len(adds), sum(adds))),
+        "count_filtered": summarize(filters)
+    }
+
+def bench_loop(args, tenants):
+    from core.autonomous_loop import AutonomousLoop
+    from core.task_queue import get_task_queue
+
+    per_tenant = {}
+    total_tasks = 0
+    started = time.perf_counter()
+    for client_id in tenants:
+        loop = AutonomousLoop(client_id=client_id, max_workers=args.workers)
+        tenant_started = time.perf_counter()
+        walls, passes, first_pass = [], 0, None
+        # Follow-ups and requeued tasks land back in the queue: keep passing until it drains
+        while passes < 50:
+            pass_started = time.perf_counter()
+            loop.run()
+            passes += 1
+            if first_pass is None:
+                first_pass = time.perf_counter() - pass_started
+            walls.extend(t["wall_seconds"] for t in loop.task_timings)
+            if not get_task_queue(client_id).pending_agents():
+                break
+        seconds = time.perf_counter() - tenant_started
+        ran = len(walls)
+        per_tenant[client_id] = {
+            "tasks": ran,
+            "passes": passes,
+            "seconds": round(seconds, 4),
+            "first_pass_seconds": round(first_pass, 4),
+            "tasks_per_second": rate(ran, seconds),
+            "task_wall": summarize(walls)
+        }
+        total_tasks += ran
+    seconds = time.perf_counter() - started
+    return {
+        "workers": args.workers,
+        "tasks": total_tasks,
+        "seconds": round(seconds, 4),
+        "tasks_per_second": rate(total_tasks, seconds),
+        "tenants": per_tenant
+    }
+
+def bench_command_api(args):
+    try:
+        import digiman_server
+    except ImportError as e:
+        return {"skipped": f"server unavailable: {e}"}
+    client = digiman_server.app.test_client()
+    headers = {"Authorization": f"Bearer {digiman_server.API_KEY}"}
+    rng = random.Random(args.seed)
+    results = {}
+    calls = min(args.ops, 200)
+    for mode in ("async", "sync"):
+        digiman_server.COMMAND_MODE = mode
+        statuses = {}
+
+        def post(i):
+            response = client.post("/digiman/command", headers=headers, json={
+                "client_id": "bench-api", "message": f"{sentence(rng)} ({mode} {i})"
+            })
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        samples = timed(post, calls)
+        results[mode] = dict(summarize(samples), statuses={str(k): v for k, v in statuses.items()})
+    return results
+
+# === Reporting ===
+def flatten(value, prefix=""):
+    if isinstance(value, dict):
+        flat = {}
+        for key, inner in value.items():
+            flat.update(flatten(inner, f"{prefix}{key}."))
+        return flat
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return {prefix[:-1]: value}
+    return {}
+
+def compare(baseline, current, threshold=0.05):
+    """Print every metric that moved by more than `threshold` (a fraction) since the baseline."""
+    old, new = flatten(baseline.get("results", {})), flatten(current.get("results", {}))
+    print(f"\nAgainst {baseline.get('git', {}).get('commit') or 'baseline'}:")
+    for key in sorted(set(old) & set(new)):
+        if old[key] == new[key] or (old[key] and abs(new[key] - old[key]) <= threshold * abs(old[key])):
+            continue
+        change = f"{100 * (new[key] - old[key]) / old[key]:+.1f}%" if old[key] else "new"
+        print(f"  {key:<55} {old[key]:>14} -> {new[key]:<14} {change}")
+
+def main(argv=None):
+    args = parse_args(argv)
+    output = Path(args.output).resolve() if args.output else None
+    baseline = json.loads(Path(args.compare).read_text()) if args.compare else None
+    replay = Path(args.replay).resolve() if args.replay else None
+    workdir = Path(args.workdir or tempfile.mkdtemp(prefix="digiman-bench-")).resolve()
+    workdir.mkdir(parents=True, exist_ok=True)
+
+    # Everything below reads and writes relative .digi/ paths: keep them in the scratch dir
+    configure_environment(args)
+    os.chdir(workdir)
+    sys.path.insert(0, str(REPO_DIR))
+    write_agents(workdir / "agents")
+    rng = random.Random(args.seed)
+    tenants = [f"bench-tenant-{i}" for i in range(args.tenants)]
+    for client_id in tenants + ["bench-ops"]:
+        make_tenant(client_id, args, rng)
+
+    from gpt.fake_backend import FakeLLM
+    from gpt.llm_client import llm_client, set_backend
+    fake = FakeLLM(
+        seed=args.seed, latency=args.latency, jitter=args.jitter, failure_rate=args.failure_rate,
+        agents=sorted(BENCH_AGENTS.values()), follow_up_rate=args.follow_up_rate
+    )
+    if replay is not None:
+        from gpt.replay_backend import ReplayBackend
+        set_backend(ReplayBackend(replay, args.latency_scale, fallback=fake))
+    else:
+        set_backend(fake)
+
+    results = {}
+    sections = [
+        ("log_action", lambda: bench_log_action(args)),
+        ("enqueue", lambda: bench_enqueue(args)),
+        ("memory", lambda: bench_memory(args, "bench-ops")),
+        ("leads", lambda: bench_leads(args, "bench-ops")),
+        ("loop", lambda: bench_loop(args, tenants)),
+        ("command_api", lambda: bench_command_api(args)),
+    ]
+    for name, run in sections:
+        print(f"Running {name}...", flush=True)
+        started = time.perf_counter()
+        try:
+            results[name] = run()
+        except Exception as e:
+            # One broken section is a result too: record it and keep measuring the rest
+            logging.exception(f"Benchmark section {name} failed")
+            results[name] = {"error": f"{type(e).__name__}: {e}"}
+        results[name]["section_seconds"] = round(time.perf_counter() - started, 4)
+    results["llm"] = dict(fake.stats(), client=llm_client.stats())
+
+    report = {
+        "generated_at": datetime.now().isoformat(),
+        "git": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": {k: v for k, v in vars(args).items() if k not in ("output", "compare", "workdir", "verbose")},
+        "workdir": str(workdir),
+        "results": results
+    }
+    if output is None:
+        commit = (report["git"]["commit"] or "nogit")[:10]
+        output = REPO_DIR / ".digi" / "benchmarks" / f"{commit}_{datetime.now():%Y%m%d_%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+
+    loop = results["loop"]
+    if "error" in loop:
+        print(f"Loop: failed ({loop['error']})")
+    else:
+        print(f"Loop: {loop['tasks']} tasks in {loop['seconds']}s ({loop['tasks_per_second']} tasks/s, {args.workers} workers)")
+    failed = [name for name, section in results.items() if "error" in section]
+    if failed:
+        print(f"Failed sections: {', '.join(failed)}")
+    print(f"Results written to {output}")
+    if baseline is not None:
+        compare(baseline, report)
+    return report
+
+if __name__ == "__main__":
+    main()
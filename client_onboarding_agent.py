@@ -1,6 +1,6 @@
 import os
 import json
-from core.digiman_core import log_action, update_task_queue
+from core.digiman_core import log_action, enqueue_many
 from core.memory_store import load_memory
 from pathlib import Path
 from gpt.gpt_router import interpret_command
@@ -73,9 +73,11 @@ class ClientOnboardingAgent:
         if plan == "enterprise":
             tiers_to_load.append("enterprise")
 
-        for tier in tiers_to_load:
-            for agent in self.default_agents_by_tier[tier]:
-                update_task_queue(agent, {"task": "Initiate onboarding action", "priority": 2}, self.client_id)
+        enqueue_many([
+            (agent, {"task": "Initiate onboarding action", "priority": 2})
+            for tier in tiers_to_load
+            for agent in self.default_agents_by_tier[tier]
+        ], self.client_id, source="Client Onboarding Agent")
 
     def log_reasoning(self, input_text, output_json):
         log_path = Path(f".digi/clients/{self.client_id}/gpt_reasons.log")
@@ -1,7 +1,7 @@
 import os
 from core.digiman_core import log_action, update_task_queue
 from core.memory_store import load_memory
-from core.metrics import metrics
+from core.metrics import increment_metric
 from gpt.gpt_router import interpret_command
 from datetime import datetime
 from pathlib import Path
@@ -30,12 +30,12 @@ class CloserAgent:
     def handle_closure(self):
         if not self.active:
             log_action("Closer Agent", "Mock deal closed (Twilio inactive)", self.client_id)
-            metrics["revenue_generated"] += 1000
+            increment_metric("revenue_generated", 1000)
             update_task_queue("CRM Agent", {"task": "Update deal status", "priority": 2}, self.client_id)
             return
 
         reasoning = "Client expressed readiness and pain point resolution. Escalating to CRM."
-        metrics["revenue_generated"] += 1500
+        increment_metric("revenue_generated", 1500)
         update_task_queue("CRM Agent", {"task": "Client marked as closed-won", "priority": 2}, self.client_id)
         update_task_queue("Support Agent", {"task": "Welcome and onboarding follow-up", "priority": 2}, self.client_id)
         log_action("Closer Agent", f"Closed deal: {reasoning}", self.client_id)
@@ -0,0 +1,14 @@
+import os
+import tempfile
+
+SCRATCH_DIR = tempfile.mkdtemp(prefix="digiman-tests-")
+
+def pytest_configure(config):
+    # Modules create and flush .digi/ relative to the working directory at import and at
+    # exit: run the session from a scratch directory so none of it lands in the checkout
+    os.chdir(SCRATCH_DIR)
+
+def pytest_sessionfinish(session, exitstatus):
+    # pytest has just changed back to where it started; the exit-time flushes (action
+    # log, metrics) still belong in the scratch directory
+    os.chdir(SCRATCH_DIR)
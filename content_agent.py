@@ -3,7 +3,9 @@ from pathlib import Path
 from datetime import datetime, timedelta
 from core.digiman_core import log_action, update_task_queue
 from core.memory_store import load_memory
-from gpt.gpt_router import interpret_command
+from gpt.gpt_router import interpret_command, gather_commands
+
+LEAD_MAGNET_PROMPT = "Write a 1-page PDF lead magnet for our product, including value props and CTA."
 
 class ContentAgent:
     def __init__(self, client_id=None):
@@ -19,19 +21,33 @@ class ContentAgent:
         log_action("Content Agent", f"Running task: {task['task']}", self.client_id)
         command = task["task"].lower()
 
-        try:
-            gpt = interpret_command(task["task"], self.client_id)
+        # The branch comes from the original text, and the recycle and lead-magnet prompts
+        # don't use the routing answer, so those go out together with the routing call
+        requests = [task["task"]]
+        if "generate content" in command or "write" in command:
+            pass  # the draft prompt is built from the routed task text
+        elif "recycle" in command:
+            last = self.last_draft()
+            if last is not None:
+                requests.append(self.repurpose_prompt(last))
+        elif "lead magnet" in command:
+            requests.append(LEAD_MAGNET_PROMPT)
+        results = gather_commands(requests, self.client_id, return_exceptions=True)
+        prefetched = results[1] if len(results) > 1 else None
+
+        gpt = results[0]
+        if isinstance(gpt, Exception):
+            log_action("Content Agent", f"GPT failed: {gpt}", self.client_id)
+        else:
             log_action("Content Agent", f"GPT Decision: {gpt}", self.client_id)
             task.update(gpt)
-        except Exception as e:
-            log_action("Content Agent", f"GPT failed: {e}", self.client_id)
 
         if "generate content" in command or "write" in command:
             self.generate_content(task["task"])
         elif "recycle" in command:
-            self.repurpose_content()
+            self.repurpose_content(prefetched)
         elif "lead magnet" in command:
-            self.create_lead_magnet()
+            self.create_lead_magnet(prefetched)
         elif "auto" in command:
             self.auto_publish()
 
@@ -58,21 +74,33 @@ Add SEO keywords, CTA, and metadata.
 
         self.log_calendar(topic, filename.name)
 
-    def repurpose_content(self):
+    def last_draft(self):
         drafts = list(self.content_dir.glob("draft_*.txt"))
-        if not drafts:
-            log_action("Content Agent", "No content to recycle", self.client_id)
-            return
-        last = drafts[-1].read_text()
-        reprompt = f"Convert this into a tweet thread and IG caption:\\n{last}"
-        short = interpret_command(reprompt, self.client_id).get("task", "")
+        return drafts[-1].read_text() if drafts else None
+
+    def repurpose_prompt(self, last):
+        return f"Convert this into a tweet thread and IG caption:\\n{last}"
+
+    def repurpose_content(self, result=None):
+        if result is None:
+            last = self.last_draft()
+            if last is None:
+                log_action("Content Agent", "No content to recycle", self.client_id)
+                return
+            result = interpret_command(self.repurpose_prompt(last), self.client_id)
+        elif isinstance(result, Exception):
+            raise result
+        short = result.get("task", "")
         filename = self.content_dir / f"recycled_{datetime.now().strftime('%Y%m%d_%H%M')}.txt"
         filename.write_text(short)
         log_action("Content Agent", f"Recycled into: {filename.name}", self.client_id)
 
-    def create_lead_magnet(self):
-        prompt = "Write a 1-page PDF lead magnet for our product, including value props and CTA."
-        pdf_draft = interpret_command(prompt, self.client_id).get("task", "")
+    def create_lead_magnet(self, result=None):
+        if result is None:
+            result = interpret_command(LEAD_MAGNET_PROMPT, self.client_id)
+        elif isinstance(result, Exception):
+            raise result
+        pdf_draft = result.get("task", "")
         filename = self.content_dir / f"lead_magnet_{datetime.now().strftime('%Y%m%d')}.txt"
         filename.write_text(pdf_draft)
         log_action("Content Agent", f"Created lead magnet: {filename.name}", self.client_id)
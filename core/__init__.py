@@ -1 +1,27 @@
+import sys
+import importlib
+import importlib.abc
+import importlib.util
 
+# === Root Module Aliases ===
+# The loop, the agent loader and the metrics store sit next to the agents at the repo
+# root but are imported as core.<name> throughout. Resolve those names to the top-level
+# module itself (one module object under both names), and only when no core/<name>.py
+# exists: the finder runs after the regular path finders.
+ROOT_MODULES = ("metrics", "agent_loader", "autonomous_loop")
+
+class _RootAlias(importlib.abc.MetaPathFinder, importlib.abc.Loader):
+    def find_spec(self, fullname, path, target=None):
+        package, _, name = fullname.partition(".")
+        if package != __name__ or name not in ROOT_MODULES:
+            return None
+        return importlib.util.spec_from_loader(fullname, self)
+
+    def create_module(self, spec):
+        return importlib.import_module(spec.name.partition(".")[2])
+
+    def exec_module(self, module):
+        pass  # already executed under its top-level name
+
+if not any(isinstance(finder, _RootAlias) for finder in sys.meta_path):
+    sys.meta_path.append(_RootAlias())
@@ -0,0 +1,146 @@
+import os
+import sys
+import atexit
+import signal
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger("DigiManActionLog")
+
+# === Buffer Settings ===
+FLUSH_BYTES = int(os.getenv("ACTION_LOG_FLUSH_BYTES", 64 * 1024))
+FLUSH_INTERVAL = float(os.getenv("ACTION_LOG_FLUSH_INTERVAL", 1.0))
+MAX_OPEN_LOGS = int(os.getenv("ACTION_LOG_MAX_OPEN", 256))
+# Lines of logs whose write failed (EMFILE, ENOSPC, a removed directory) are kept for the
+# next flush up to this many bytes; past it the oldest are dropped
+RETRY_BYTES = int(os.getenv("ACTION_LOG_RETRY_BYTES", 1024 * 1024))
+
+class ActionLogger:
+    """
+    Buffered writer for the per-client actions.log files. Keeps one long-lived handle
+    per log (least recently used handles are closed past MAX_OPEN_LOGS) and flushes when
+    FLUSH_BYTES are pending or every FLUSH_INTERVAL seconds from a background thread.
+    """
+
+    def __init__(self, flush_bytes=FLUSH_BYTES, flush_interval=FLUSH_INTERVAL, max_open=MAX_OPEN_LOGS,
+                 retry_bytes=RETRY_BYTES):
+        self.flush_bytes = flush_bytes
+        self.flush_interval = flush_interval
+        self.max_open = max_open
+        self.retry_bytes = retry_bytes
+        self.lock = threading.RLock()
+        self.handles = OrderedDict()  # path -> open file
+        self.buffers = {}             # path -> [lines]
+        self.pending_bytes = 0
+        self.retained_bytes = 0       # held over from failed writes; not counted toward flush_bytes
+        self.known_dirs = set()
+        self.flusher = None
+        self.stop_event = threading.Event()
+
+    def write(self, path, line):
+        with self.lock:
+            self.buffers.setdefault(path, []).append(line)
+            self.pending_bytes += len(line)
+            if self.pending_bytes >= self.flush_bytes:
+                self.flush()
+        self._ensure_flusher()
+
+    def _handle(self, path):
+        handle = self.handles.get(path)
+        if handle is not None:
+            self.handles.move_to_end(path)
+            return handle
+        directory = path.parent
+        if directory not in self.known_dirs:
+            directory.mkdir(parents=True, exist_ok=True)
+            self.known_dirs.add(directory)
+        handle = self.handles[path] = open(path, "a", buffering=1024 * 64)
+        while len(self.handles) > self.max_open:
+            _, oldest = self.handles.popitem(last=False)
+            oldest.close()
+        return handle
+
+    def flush(self):
+        with self.lock:
+            retained, retained_bytes = {}, 0
+            for path, lines in self.buffers.items():
+                if not lines:
+                    continue
+                try:
+                    handle = self._handle(path)
+                    handle.write("".join(lines))
+                    handle.flush()
+                except Exception as e:
+                    self.handles.pop(path, None)
+                    self.known_dirs.discard(path.parent)  # recreate it if it was rotated away
+                    kept = []
+                    for line in reversed(lines):
+                        if retained_bytes + len(line) > self.retry_bytes:
+                            break
+                        kept.append(line)
+                        retained_bytes += len(line)
+                    kept.reverse()
+                    dropped = len(lines) - len(kept)
+                    logger.error(f"Failed to write action log {path}: {e}; {len(kept)} lines kept for retry"
+                                 + (f", {dropped} dropped" if dropped else ""))
+                    if kept:
+                        retained[path] = kept
+            self.buffers = retained
+            self.pending_bytes = 0
+            self.retained_bytes = retained_bytes
+
+    def close(self):
+        self.stop_event.set()
+        with self.lock:
+            self.flush()
+            for handle in self.handles.values():
+                try:
+                    handle.close()
+                except Exception:
+                    pass
+            self.handles.clear()
+
+    def _ensure_flusher(self):
+        if self.flusher is not None and self.flusher.is_alive():
+            return
+        with self.lock:
+            if self.flusher is not None and self.flusher.is_alive():
+                return
+            self.stop_event.clear()
+            self.flusher = threading.Thread(target=self._flush_loop, name="digiman-action-log", daemon=True)
+            self.flusher.start()
+
+    def _flush_loop(self):
+        while not self.stop_event.wait(self.flush_interval):
+            if self.pending_bytes or self.retained_bytes:
+                self.flush()
+
+action_logger = ActionLogger()
+
+# === Flush On Shutdown / Crash ===
+atexit.register(action_logger.close)
+
+_previous_excepthook = sys.excepthook
+def _flush_excepthook(exc_type, exc, tb):
+    action_logger.flush()
+    _previous_excepthook(exc_type, exc, tb)
+sys.excepthook = _flush_excepthook
+
+_previous_thread_excepthook = threading.excepthook
+def _flush_thread_excepthook(args):
+    action_logger.flush()
+    _previous_thread_excepthook(args)
+threading.excepthook = _flush_thread_excepthook
+
+def _flush_on_sigterm(signum, frame):
+    action_logger.close()
+    signal.signal(signum, signal.SIG_DFL)
+    os.kill(os.getpid(), signum)
+
+# Only take SIGTERM when nobody else (gunicorn, a scheduler) has claimed it
+try:
+    if threading.current_thread() is threading.main_thread() and signal.getsignal(signal.SIGTERM) == signal.SIG_DFL:
+        signal.signal(signal.SIGTERM, _flush_on_sigterm)
+except (ValueError, AttributeError):
+    pass
@@ -0,0 +1,201 @@
+import os
+import re
+import json
+import logging
+import threading
+from datetime import datetime
+from pathlib import Path
+from core.journal import Journal
+
+logger = logging.getLogger("DigiManAgentRegistry")
+
+# === Canonical Names ===
+# Agent class -> the one name its tasks are queued under
+CANONICAL_AGENTS = {
+    "AnalystAgent": "Analyst Agent",
+    "AutonomousSalesReplicator": "Autonomous Sales Replicator",
+    "ClientOnboardingAgent": "Client Onboarding Agent",
+    "CloserAgent": "Closer Agent",
+    "ContentAgent": "Content Agent",
+    "CRMAgent": "CRM Agent",
+    "EmailAgent": "Email Agent",
+    "FinancialAllocationAgent": "Financial Allocation Agent",
+    "FranchiseBuilderAgent": "Franchise Builder Agent",
+    "FranchiseIntelligenceAgent": "Franchise Intelligence Agent",
+    "FranchiseRelationshipAgent": "Franchise Relationship Agent",
+    "ManagerAgent": "Manager Agent",
+    "MarketingAgent": "Marketing Agent",
+    "MonetizationAgent": "Monetization Agent",
+    "OutreachAgent": "Outreach Agent",
+    "PartnershipScoutAgent": "Partnership Scout Agent",
+    "SalesAgent": "Sales Agent",
+    "ScoutAgent": "Scout Agent",
+    "SocialsAgent": "Socials Agent",
+    "SubscriptionAgent": "Subscription Agent",
+    "SupportRetentionAgent": "Support Agent",
+    "TutorialAgent": "Tutorial Agent",
+    "VisualsAgent": "Visuals Agent",
+    "WebBuilderAgent": "WebBuilder Agent",
+}
+
+# Extra names seen in prompts and older queues; spacing, case and a trailing "Agent" don't matter
+ALIASES = {
+    "Retention Agent": "Support Agent",
+    "Support Retention Agent": "Support Agent",
+    "Customer Support Agent": "Support Agent",
+    "Sales Replicator": "Autonomous Sales Replicator",
+    "Onboarding Agent": "Client Onboarding Agent",
+    "Finance Agent": "Financial Allocation Agent",
+    "Web Builder Agent": "WebBuilder Agent",
+    "Social Media Agent": "Socials Agent",
+    "Social Agent": "Socials Agent",
+}
+
+# Resolved spellings kept for the dispatch path; names come from LLM output, so the cache
+# holds hits only and starts over past this size
+RESOLVE_CACHE_MAX = 4096
+
+NON_ALNUM_RE = re.compile(r"[^a-z0-9]+")
+CAMEL_RE = re.compile(r"(?<=[a-z0-9])(?=[A-Z])|(?<=[A-Z])(?=[A-Z][a-z])")
+
+def alias_key(name):
+    """'FranchiseBuilderAgent', 'franchise builder agent', 'Franchise-Builder' -> 'franchisebuilder'."""
+    key = NON_ALNUM_RE.sub("", str(name).lower())
+    return key[:-5] if key.endswith("agent") and len(key) > 5 else key
+
+def display_name(class_name):
+    """Name for an agent class with no table entry: 'LeadNurtureAgent' -> 'Lead Nurture Agent'."""
+    return CAMEL_RE.sub(" ", class_name).strip()
+
+class AgentRegistry:
+    """
+    One table from every known spelling of an agent to its canonical name. resolve() is
+    a dict hit for names seen before and one normalization otherwise.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.by_key = {}
+        self.canonical = set()
+        self.resolved = {}  # raw name -> canonical, the dispatch-path cache (hits only)
+        self.version = 0
+        for class_name, name in CANONICAL_AGENTS.items():
+            self.register(class_name, name)
+        for alias, name in ALIASES.items():
+            self.add_alias(alias, name)
+
+    def register(self, class_name, name=None):
+        """Make an agent class routable; returns its canonical name."""
+        with self.lock:
+            name = name or CANONICAL_AGENTS.get(class_name) or self.by_key.get(alias_key(class_name)) \
+                or display_name(class_name)
+            known = len(self.by_key), len(self.canonical)
+            self.canonical.add(name)
+            self.by_key.setdefault(alias_key(name), name)
+            self.by_key.setdefault(alias_key(class_name), name)
+            if (len(self.by_key), len(self.canonical)) != known:
+                # New names may route tasks that were dead-lettered or cached as unknown
+                self.version += 1
+                self.resolved.clear()
+            return name
+
+    def add_alias(self, alias, name):
+        with self.lock:
+            self.by_key[alias_key(alias)] = name
+            self.resolved.clear()
+
+    def resolve(self, name):
+        """Canonical name for any known spelling, or None if nothing routes there."""
+        try:
+            return self.resolved[name]
+        except (KeyError, TypeError):
+            pass
+        canonical = self.by_key.get(alias_key(name)) if name else None
+        if canonical is not None and isinstance(name, str):
+            if len(self.resolved) >= RESOLVE_CACHE_MAX:
+                self.resolved.clear()
+            self.resolved[name] = canonical
+        return canonical
+
+    def is_agent_class(self, class_name):
+        return class_name.endswith("Agent") or class_name in CANONICAL_AGENTS
+
+agent_registry = AgentRegistry()
+
+def resolve_agent(name):
+    return agent_registry.resolve(name)
+
+# === Dead Letters ===
+# Tasks addressed to a name no agent answers to are parked here instead of piling up in
+# agent_queue.json where nothing would ever pop them.
+def dead_letter_journal(client_id):
+    base = Path(f".digi/clients/{client_id}") if client_id else Path(".digi")
+    return Journal(base / "dead_letters.jsonl", fsync=False)
+
+def dead_letter(client_id, items):
+    """Park [(agent_name, task), ...] that resolve to no agent."""
+    if not items:
+        return
+    journal = dead_letter_journal(client_id)
+    now = str(datetime.now())
+    with journal.locked():
+        journal.append([{"agent": agent_name, "task": task, "timestamp": now} for agent_name, task in items])
+    for agent_name, _ in items:
+        logger.warning(f"Dead-lettered task for unknown agent '{agent_name}' (client {client_id})")
+
+def read_dead_letters(client_id):
+    journal = dead_letter_journal(client_id)
+    with journal.locked(shared=True):
+        records, _ = journal.read_new()
+    return records
+
+def dead_letter_report(client_id):
+    records = read_dead_letters(client_id)
+    by_name = {}
+    for record in records:
+        by_name[record["agent"]] = by_name.get(record["agent"], 0) + 1
+    return {
+        "total": len(records),
+        "by_agent": dict(sorted(by_name.items(), key=lambda kv: -kv[1])),
+        "oldest": records[0]["timestamp"] if records else None
+    }
+
+def routable_dead_letters(client_id):
+    """
+    [(canonical name, record)] for parked tasks that now resolve. The file is left alone:
+    enqueue the tasks, then remove_dead_letters() the records, so a crash in between
+    re-queues them twice rather than losing them.
+    """
+    if not dead_letter_journal(client_id).path.exists():
+        return []
+    routable = []
+    for record in read_dead_letters(client_id):
+        name = resolve_agent(record["agent"])
+        if name:
+            routable.append((name, record))
+    return routable
+
+def record_key(record):
+    return json.dumps(record, sort_keys=True, separators=(",", ":"))
+
+def remove_dead_letters(client_id, records):
+    """Drop exactly these records (one occurrence each) from the dead-letter file."""
+    if not records:
+        return
+    journal = dead_letter_journal(client_id)
+    taken = {}
+    for record in records:
+        taken[record_key(record)] = taken.get(record_key(record), 0) + 1
+    with journal.locked():
+        journal.offset, journal.inode = 0, None
+        current, _ = journal.read_new()
+        remaining = []
+        for record in current:
+            key = record_key(record)
+            if taken.get(key):
+                taken[key] -= 1
+            else:
+                remaining.append(record)
+        tmp_path = journal.path.with_name(f".{journal.path.name}.{os.getpid()}.new")
+        tmp_path.write_text("".join(json.dumps(r, separators=(",", ":")) + "\n" for r in remaining))
+        tmp_path.replace(journal.path)
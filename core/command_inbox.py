@@ -0,0 +1,222 @@
+import os
+import json
+import time
+import uuid
+import logging
+import sqlite3
+import threading
+from pathlib import Path
+
+logger = logging.getLogger("DigiManCommandInbox")
+
+# === Inbox Settings ===
+INBOX_PATH = Path(os.getenv("COMMAND_INBOX_PATH", ".digi/commands.db"))
+COMMAND_WORKERS = int(os.getenv("COMMAND_WORKERS", 4))
+COMMAND_MAX_ATTEMPTS = int(os.getenv("COMMAND_MAX_ATTEMPTS", 3))
+COMMAND_LEASE_SECONDS = float(os.getenv("COMMAND_LEASE_SECONDS", 300))
+COMMAND_POLL_INTERVAL = float(os.getenv("COMMAND_POLL_INTERVAL", 1.0))
+COMMAND_RETENTION_SECONDS = float(os.getenv("COMMAND_RETENTION_SECONDS", 7 * 24 * 3600))
+# A failed command waits this long before its first retry, doubling after each further
+# failure. It defaults to the LLM breaker's cooldown: retrying sooner only trips it again.
+COMMAND_RETRY_SECONDS = float(os.getenv("COMMAND_RETRY_SECONDS", os.getenv("LLM_BREAKER_COOLDOWN", 30)))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS commands (
+    id TEXT PRIMARY KEY,
+    client_id TEXT NOT NULL,
+    message TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    lease_until REAL,
+    not_before REAL
+);
+CREATE INDEX IF NOT EXISTS idx_commands_status ON commands(status, created_at);
+"""
+
+class CommandInbox:
+    """
+    Durable inbox for /digiman/command. submit() is one fsynced INSERT, so the HTTP
+    handler returns in milliseconds; workers claim rows with a lease (a crashed worker's
+    command is picked up again once its lease runs out) and record the result for
+    /digiman/task/<id>.
+    """
+
+    def __init__(self, path=None):
+        self.path = Path(path) if path else INBOX_PATH
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.local = threading.local()
+        self.arrived = threading.Condition()
+        conn = self.connection()
+        conn.executescript(SCHEMA)
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(commands)")}
+        if "not_before" not in columns:
+            # Inboxes created before retry backoff
+            with conn:
+                conn.execute("ALTER TABLE commands ADD COLUMN not_before REAL")
+
+    def connection(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.path), timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=FULL")
+            self.local.conn = conn
+        return conn
+
+    # === Producer Side ===
+    def submit(self, client_id, message):
+        task_id = uuid.uuid4().hex
+        now = time.time()
+        with self.connection() as conn:
+            conn.execute(
+                "INSERT INTO commands (id, client_id, message, status, created_at, updated_at) "
+                "VALUES (?, ?, ?, 'queued', ?, ?)",
+                (task_id, client_id, message, now, now)
+            )
+        with self.arrived:
+            self.arrived.notify()
+        return task_id
+
+    def get(self, task_id):
+        row = self.connection().execute("SELECT * FROM commands WHERE id = ?", (task_id,)).fetchone()
+        if row is None:
+            return None
+        return {
+            "task_id": row["id"],
+            "client_id": row["client_id"],
+            "status": row["status"],
+            "attempts": row["attempts"],
+            "result": json.loads(row["result"]) if row["result"] else None,
+            "error": row["error"],
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"]
+        }
+
+    # === Worker Side ===
+    def claim(self, lease_seconds=COMMAND_LEASE_SECONDS):
+        """Oldest due queued command (or one whose worker's lease expired), marked processing."""
+        now = time.time()
+        conn = self.connection()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT * FROM commands WHERE (status = 'queued' AND (not_before IS NULL OR not_before <= ?)) "
+                "OR (status = 'processing' AND lease_until < ?) ORDER BY created_at LIMIT 1",
+                (now, now)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE commands SET status = 'processing', attempts = attempts + 1, "
+                "lease_until = ?, updated_at = ? WHERE id = ?",
+                (now + lease_seconds, now, row["id"])
+            )
+        return {"task_id": row["id"], "client_id": row["client_id"], "message": row["message"],
+                "attempts": row["attempts"] + 1}
+
+    def complete(self, task_id, result):
+        with self.connection() as conn:
+            conn.execute(
+                "UPDATE commands SET status = 'done', result = ?, error = NULL, lease_until = NULL, "
+                "updated_at = ? WHERE id = ?",
+                (json.dumps(result), time.time(), task_id)
+            )
+
+    def fail(self, task_id, error, retry=False, delay=0.0):
+        """Mark a command failed, or with retry queue it again to be claimed `delay` seconds from now."""
+        now = time.time()
+        with self.connection() as conn:
+            conn.execute(
+                "UPDATE commands SET status = ?, error = ?, lease_until = NULL, not_before = ?, "
+                "updated_at = ? WHERE id = ?",
+                ("queued" if retry else "failed", str(error), now + delay if retry else None, now, task_id)
+            )
+        if retry and delay <= 0:
+            with self.arrived:
+                self.arrived.notify()
+
+    def purge(self, older_than=COMMAND_RETENTION_SECONDS):
+        with self.connection() as conn:
+            conn.execute(
+                "DELETE FROM commands WHERE status IN ('done', 'failed') AND updated_at < ?",
+                (time.time() - older_than,)
+            )
+
+    def wait(self, timeout=COMMAND_POLL_INTERVAL):
+        # Same-process submits wake a worker at once; the timeout covers other processes
+        with self.arrived:
+            self.arrived.wait(timeout)
+
+    def depth(self):
+        return self.connection().execute(
+            "SELECT COUNT(*) FROM commands WHERE status IN ('queued', 'processing')"
+        ).fetchone()[0]
+
+class CommandWorkers:
+    """Background threads that drain the inbox through handler(client_id, message) -> result."""
+
+    def __init__(self, inbox, handler, count=COMMAND_WORKERS, max_attempts=COMMAND_MAX_ATTEMPTS,
+                 retry_seconds=COMMAND_RETRY_SECONDS):
+        self.inbox = inbox
+        self.handler = handler
+        self.count = count
+        self.max_attempts = max_attempts
+        self.retry_seconds = retry_seconds
+        self.threads = []
+        self.stop_event = threading.Event()
+        self.lock = threading.Lock()
+        self.last_purge = 0.0
+
+    def start(self):
+        with self.lock:
+            self.threads = [t for t in self.threads if t.is_alive()]
+            while len(self.threads) < self.count:
+                thread = threading.Thread(
+                    target=self._work, name=f"digiman-command-{len(self.threads)}", daemon=True
+                )
+                thread.start()
+                self.threads.append(thread)
+
+    def stop(self):
+        self.stop_event.set()
+        with self.inbox.arrived:
+            self.inbox.arrived.notify_all()
+
+    def _work(self):
+        while not self.stop_event.is_set():
+            try:
+                command = self.inbox.claim()
+            except sqlite3.OperationalError as e:
+                logger.error(f"Command claim failed: {e}")
+                command = None
+            if command is None:
+                self._maybe_purge()
+                self.inbox.wait()
+                continue
+            if command["attempts"] > self.max_attempts:
+                # Lease expired on every attempt (the worker died mid-command); stop retrying
+                self.inbox.fail(command["task_id"], "Exceeded max attempts", retry=False)
+                continue
+            try:
+                result = self.handler(command["client_id"], command["message"])
+                self.inbox.complete(command["task_id"], result)
+            except Exception as e:
+                retry = command["attempts"] < self.max_attempts
+                delay = self.retry_seconds * 2 ** (command["attempts"] - 1)
+                logger.error(f"Command {command['task_id']} failed (attempt {command['attempts']}): {e}"
+                             + (f"; retrying in {delay:.0f}s" if retry else ""))
+                self.inbox.fail(command["task_id"], e, retry=retry, delay=delay)
+
+    def _maybe_purge(self):
+        if time.monotonic() - self.last_purge < 3600:
+            return
+        self.last_purge = time.monotonic()
+        try:
+            self.inbox.purge()
+        except sqlite3.OperationalError:
+            pass
@@ -6,6 +6,11 @@ from datetime import datetime
 from dotenv import load_dotenv
 import re
 import inspect
+from core.action_logger import action_logger
+from core.task_queue import get_task_queue
+from core.agent_registry import resolve_agent, dead_letter
+from core.wakeup import notify_enqueue
+from core.tracing import traced
 
 # === Load Environment + Ensure .digi Directory Exists ===
 load_dotenv()
@@ -28,13 +33,12 @@ metrics = {
 }
 
 # === Logging Utility ===
+@traced("core.log_action")
 def log_action(agent_name, action, client_id=None):
+    # Buffered: core.action_logger flushes by size/time and on exit, same line format
     log_dir = Path(f".digi/clients/{client_id}") if client_id else Path(".digi")
-    log_dir.mkdir(parents=True, exist_ok=True)
-    log_path = log_dir / "actions.log"
     try:
-        with log_path.open("a") as f:
-            f.write(f"[{datetime.now()}] {agent_name}: {action}\n")
+        action_logger.write(log_dir / "actions.log", f"[{datetime.now()}] {agent_name}: {action}\n")
     except Exception as e:
         logger.error(f"Failed to log action for {agent_name}: {e}")
     logger.info(f"{agent_name}: {action}")
@@ -73,35 +77,61 @@ def load_config():
 CONFIG = load_config()
 
 # === Task Queue Utilities ===
+@traced("core.load_task_queue")
 def load_task_queue(client_id=None):
-    log_dir = Path(f".digi/clients/{client_id}") if client_id else Path(".digi")
-    path = log_dir / "agent_queue.json"
-    if path.exists():
-        try:
-            with path.open("r") as f:
-                return json.load(f)
-        except:
-            return {}
-    return {}
+    # Pending tasks only, in the {agent: [entries]} layout of agent_queue.json
+    return get_task_queue(client_id).snapshot()
 
-def update_task_queue(agent_name, task, client_id=None):
-    log_dir = Path(f".digi/clients/{client_id}") if client_id else Path(".digi")
-    log_dir.mkdir(parents=True, exist_ok=True)
-    path = log_dir / "agent_queue.json"
-    queue = load_task_queue(client_id)
-    task_entry = {
-        "task": task,
-        "priority": task.get("priority", 1),
-        "timestamp": str(datetime.now())
-    }
-    queue.setdefault(agent_name, []).append(task_entry)
+@traced("core.update_task_queue")
+def update_task_queue(agent_name, task, client_id=None, notify=True):
+    # notify=False: a task put back for later must not wake the loop that just deferred it
     try:
-        with path.open("w") as f:
-            json.dump(queue, f, indent=2)
-        log_action(agent_name, f"Queued task: {task}", client_id)
+        # Queued under the canonical name so the loop's lookup finds it; unknown names are dead-lettered
+        canonical = resolve_agent(agent_name)
+        if canonical is None:
+            dead_letter(client_id, [(agent_name, task)])
+            log_action("Task Queue", f"No agent named '{agent_name}', dead-lettered: {task}", client_id)
+            return
+        get_task_queue(client_id).append(canonical, task)
+        if notify:
+            notify_enqueue(client_id)
+        log_action(canonical, f"Queued task: {task}", client_id)
     except Exception as e:
         logger.error(f"Failed to update task queue for {agent_name}: {e}")
 
+@traced("core.enqueue_many")
+def enqueue_many(tasks, client_id=None, source="Task Queue"):
+    """
+    Queue [(agent_name, task), ...] in one atomic queue write with one summary log line
+    instead of one write and one log line per task. Returns the queued entries.
+    """
+    routable, unroutable = [], []
+    for agent_name, task in tasks:
+        canonical = resolve_agent(agent_name)
+        if canonical is None:
+            unroutable.append((agent_name, task))
+        else:
+            routable.append((canonical, task))
+    tasks = routable
+    if unroutable:
+        dead_letter(client_id, unroutable)
+        log_action(source, f"Dead-lettered {len(unroutable)} tasks for unknown agents: "
+                           f"{', '.join(sorted({name for name, _ in unroutable}))}", client_id)
+    if not tasks:
+        return []
+    try:
+        entries = get_task_queue(client_id).append_many(tasks)
+    except Exception as e:
+        logger.error(f"Failed to enqueue {len(tasks)} tasks: {e}")
+        return []
+    notify_enqueue(client_id)
+    counts = {}
+    for agent_name, _ in tasks:
+        counts[agent_name] = counts.get(agent_name, 0) + 1
+    summary = ", ".join(f"{name} x{n}" if n > 1 else name for name, n in counts.items())
+    log_action(source, f"Queued {len(tasks)} tasks: {summary}", client_id)
+    return entries
+
 # === Agent Quality Score ===
 def evaluate_agent_quality(code):
     score = 0
@@ -0,0 +1,145 @@
+import os
+import json
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows dev boxes: fall back to in-process locking only
+    fcntl = None
+
+# === Atomic Snapshot Writes ===
+def atomic_write_json(path, data, indent=None):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with tmp_path.open("w") as f:
+        json.dump(data, f, indent=indent, separators=None if indent else (",", ":"))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+# === Append-Only Journal ===
+class Journal:
+    """
+    JSON-lines journal shared between processes. Appends are single writes under an
+    exclusive flock; compaction swaps in a fresh file, which readers notice through the
+    inode change and answer by reloading their snapshot.
+    """
+
+    def __init__(self, path, fsync=True):
+        self.path = Path(path)
+        self.lock_path = self.path.with_name(self.path.name + ".lock")
+        self.fsync = fsync
+        self.offset = 0
+        self.inode = None
+        self.records_since_compaction = 0
+
+    @contextmanager
+    def locked(self, shared=False):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if fcntl is None:
+            yield
+            return
+        with open(self.lock_path, "a") as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _stat(self):
+        try:
+            st = os.stat(self.path)
+            return st.st_ino, st.st_size
+        except FileNotFoundError:
+            return None, 0
+
+    def changed(self):
+        inode, size = self._stat()
+        return inode != self.inode or size != self.offset
+
+    def append(self, records):
+        """
+        Caller must hold locked() and should read_new() first, so that our own records
+        are not read back later. Writes every record in one write call.
+        """
+        if not records:
+            return
+        data = "".join(json.dumps(r, separators=(",", ":")) + "\n" for r in records).encode("utf-8")
+        fresh = self._stat()[0] is None
+        fd = os.open(self.path, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            self._trim_torn_tail(fd)
+            inode, size = self._stat()
+            caught_up = fresh or (inode == self.inode and size == self.offset)
+            os.write(fd, data)
+            if self.fsync:
+                os.fsync(fd)
+        finally:
+            os.close(fd)
+        if caught_up:
+            self.inode, self.offset = self._stat()
+        self.records_since_compaction += len(records)
+
+    def _trim_torn_tail(self, fd):
+        # A writer that crashed mid-append left a line without its newline; our first
+        # record would be glued onto it and both lost. Nobody else can be writing while
+        # we hold the lock, so cut the fragment off.
+        end = os.fstat(fd).st_size
+        if end == 0 or self._read_at(fd, end - 1, 1) == b"\n":
+            return
+        while end > 0:
+            start = max(0, end - 65536)
+            newline = self._read_at(fd, start, end - start).rfind(b"\n")
+            if newline >= 0:
+                os.ftruncate(fd, start + newline + 1)
+                return
+            end = start
+        os.ftruncate(fd, 0)
+
+    @staticmethod
+    def _read_at(fd, offset, length):
+        os.lseek(fd, offset, os.SEEK_SET)  # O_APPEND writes still go to the end
+        return os.read(fd, length)
+
+    def read_new(self):
+        """
+        Returns (records, rotated). rotated=True means the journal was compacted by
+        someone else since the last read and the caller must reload its snapshot first;
+        records then hold the whole new journal.
+        """
+        inode, size = self._stat()
+        rotated = inode != self.inode or size < self.offset
+        start = 0 if rotated else self.offset
+        records = []
+        if inode is not None and size > start:
+            with open(self.path, "rb") as f:
+                f.seek(start)
+                data = f.read(size - start)
+            # A torn final line (crash mid-write) is left for the next read
+            end = data.rfind(b"\n") + 1
+            for line in data[:end].splitlines():
+                if not line.strip():
+                    continue
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+            size = start + end
+        self.inode = inode
+        self.offset = size if inode is not None else 0
+        if rotated:
+            self.records_since_compaction = len(records)
+        else:
+            self.records_since_compaction += len(records)
+        return records, rotated
+
+    def rotate(self):
+        """Caller must hold locked() and have written its snapshot already."""
+        tmp_path = self.path.with_name(f".{self.path.name}.{os.getpid()}.new")
+        tmp_path.write_bytes(b"")
+        os.replace(tmp_path, self.path)
+        self.inode, self.offset = self._stat()
+        self.records_since_compaction = 0
@@ -0,0 +1,225 @@
+import os
+import json
+import logging
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+
+logger = logging.getLogger("DigiManLeadStore")
+
+LEAD_DB_TIMEOUT = float(os.getenv("LEAD_DB_TIMEOUT", 30))
+
+# Columns with their own index; anything else a lead carries lives in `extra`
+LEAD_COLUMNS = ("email", "source", "status", "score", "industry", "created_at")
+INDEXED_COLUMNS = ("status", "source", "industry")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS leads (
+    id INTEGER PRIMARY KEY,
+    email TEXT NOT NULL UNIQUE,
+    source TEXT,
+    status TEXT,
+    score INTEGER,
+    industry TEXT,
+    created_at TEXT,
+    extra TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_leads_status ON leads(status);
+CREATE INDEX IF NOT EXISTS idx_leads_source ON leads(source);
+CREATE INDEX IF NOT EXISTS idx_leads_industry ON leads(industry);
+CREATE TABLE IF NOT EXISTS lead_notes (
+    id INTEGER PRIMARY KEY,
+    lead_id INTEGER NOT NULL REFERENCES leads(id) ON DELETE CASCADE,
+    note TEXT,
+    created_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_lead_notes_lead ON lead_notes(lead_id);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+INSERT_LEAD = (
+    "INSERT OR IGNORE INTO leads (email, source, status, score, industry, created_at, extra) "
+    "VALUES (?1, COALESCE(?2, 'unknown'), COALESCE(?3, 'new'), COALESCE(?4, 1), ?5, COALESCE(?6, ?8), ?7)"
+)
+
+class LeadStore:
+    """
+    One client's leads in .digi/clients/<id>/leads.db (SQLite, WAL mode). Lookups by
+    email hit the unique index, notes are appended as rows, and status/source/industry
+    filters use their own indexes, so no call reads or rewrites the whole lead list.
+    """
+
+    def __init__(self, client_id=None):
+        self.client_id = client_id
+        self.base = Path(f".digi/clients/{client_id}")
+        self.db_path = self.base / "leads.db"
+        self.legacy_path = self.base / "leads.json"
+        self.local = threading.local()
+        self.base.mkdir(parents=True, exist_ok=True)
+        self.connection().executescript(SCHEMA)
+        self.migrate_json()
+
+    # === Connections ===
+    def connection(self):
+        # sqlite3 connections are per-thread; WAL lets readers run alongside the writer
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.db_path), timeout=LEAD_DB_TIMEOUT)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self.local.conn = conn
+        return conn
+
+    # === Migration ===
+    def migrate_json(self):
+        """One-time import of a legacy leads.json; the file is kept as leads.json.migrated."""
+        conn = self.connection()
+        if conn.execute("SELECT 1 FROM meta WHERE key = 'json_migrated'").fetchone():
+            return 0
+        with conn:
+            # Take the write lock before re-checking so two processes can't both import
+            conn.execute("BEGIN IMMEDIATE")
+            if conn.execute("SELECT 1 FROM meta WHERE key = 'json_migrated'").fetchone():
+                return 0
+            leads = []
+            if self.legacy_path.exists():
+                try:
+                    leads = json.loads(self.legacy_path.read_text())
+                except json.JSONDecodeError as e:
+                    logger.error(f"Skipping unreadable {self.legacy_path}: {e}")
+            imported = self._upsert(conn, leads, keep_notes=True)
+            conn.execute(
+                "INSERT INTO meta (key, value) VALUES ('json_migrated', ?)", (datetime.now().isoformat(),)
+            )
+        if self.legacy_path.exists():
+            self.legacy_path.rename(self.legacy_path.with_name("leads.json.migrated"))
+            logger.info(f"Migrated {imported} leads from {self.legacy_path} to {self.db_path}")
+        return imported
+
+    # === Writes ===
+    def _row(self, lead):
+        extra = {k: v for k, v in lead.items() if k not in LEAD_COLUMNS and k != "notes"}
+        return (
+            lead["email"],
+            lead.get("source"),
+            lead.get("status"),
+            lead.get("score"),
+            lead.get("industry"),
+            lead.get("created_at"),
+            json.dumps(extra) if extra else None
+        )
+
+    def add(self, lead):
+        """Insert a new lead. Returns False if the email is already known."""
+        with self.connection() as conn:
+            cursor = conn.execute(INSERT_LEAD, self._row(lead) + (datetime.now().isoformat(),))
+            return cursor.rowcount == 1
+
+    def upsert_many(self, leads):
+        """Insert or update leads by email in one transaction. Returns the number written."""
+        with self.connection() as conn:
+            return self._upsert(conn, leads)
+
+    def _upsert(self, conn, leads, keep_notes=False):
+        rows = [lead for lead in leads if lead and lead.get("email")]
+        if not rows:
+            return 0
+        now = datetime.now().isoformat()
+        values = [self._row(lead) for lead in rows]
+        conn.executemany(INSERT_LEAD, [row + (now,) for row in values])
+        # Only the fields a caller actually passed overwrite what's stored
+        conn.executemany(
+            "UPDATE leads SET source = COALESCE(?, source), status = COALESCE(?, status), "
+            "score = COALESCE(?, score), industry = COALESCE(?, industry), "
+            "created_at = COALESCE(?, created_at), extra = COALESCE(?, extra) WHERE email = ?",
+            [row[1:] + (row[0],) for row in values]
+        )
+        if keep_notes:
+            conn.executemany(
+                "INSERT INTO lead_notes (lead_id, note, created_at) SELECT id, ?, NULL FROM leads WHERE email = ?",
+                [
+                    (note if isinstance(note, str) else json.dumps(note), lead["email"])
+                    for lead in rows for note in lead.get("notes") or []
+                ]
+            )
+        return len(rows)
+
+    def update_status(self, email, status):
+        with self.connection() as conn:
+            cursor = conn.execute("UPDATE leads SET status = ? WHERE email = ?", (status, email))
+            return cursor.rowcount == 1
+
+    def add_note(self, email, note):
+        with self.connection() as conn:
+            cursor = conn.execute(
+                "INSERT INTO lead_notes (lead_id, note, created_at) SELECT id, ?, ? FROM leads WHERE email = ?",
+                (note, datetime.now().isoformat(), email)
+            )
+            return cursor.rowcount == 1
+
+    # === Reads ===
+    def _lead(self, row, with_notes=True):
+        lead = {key: row[key] for key in LEAD_COLUMNS}
+        if row["extra"]:
+            lead.update(json.loads(row["extra"]))
+        if with_notes:
+            lead["notes"] = [
+                r["note"] for r in self.connection().execute(
+                    "SELECT note FROM lead_notes WHERE lead_id = ? ORDER BY id", (row["id"],)
+                )
+            ]
+        return lead
+
+    def get(self, email):
+        row = self.connection().execute("SELECT * FROM leads WHERE email = ?", (email,)).fetchone()
+        return self._lead(row) if row else None
+
+    def exists(self, email):
+        return self.connection().execute("SELECT 1 FROM leads WHERE email = ?", (email,)).fetchone() is not None
+
+    def find(self, limit=None, with_notes=False, **filters):
+        """Leads matching every filter, e.g. find(status="new", industry="dental")."""
+        unknown = set(filters) - set(INDEXED_COLUMNS)
+        if unknown:
+            raise ValueError(f"Unsupported lead filter(s): {', '.join(sorted(unknown))}")
+        sql = "SELECT * FROM leads"
+        if filters:
+            sql += " WHERE " + " AND ".join(f"{column} = ?" for column in filters)
+        sql += " ORDER BY id"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        rows = self.connection().execute(sql, tuple(filters.values())).fetchall()
+        return [self._lead(row, with_notes) for row in rows]
+
+    def count(self, **filters):
+        unknown = set(filters) - set(INDEXED_COLUMNS)
+        if unknown:
+            raise ValueError(f"Unsupported lead filter(s): {', '.join(sorted(unknown))}")
+        sql = "SELECT COUNT(*) FROM leads"
+        if filters:
+            sql += " WHERE " + " AND ".join(f"{column} = ?" for column in filters)
+        return self.connection().execute(sql, tuple(filters.values())).fetchone()[0]
+
+    def most_common_industry(self):
+        row = self.connection().execute(
+            "SELECT industry, COUNT(*) AS n FROM leads WHERE industry IS NOT NULL "
+            "GROUP BY industry ORDER BY n DESC LIMIT 1"
+        ).fetchone()
+        return row["industry"] if row else None
+
+# === Process-Level Registry ===
+_stores = {}
+_stores_lock = threading.Lock()
+
+def get_lead_store(client_id):
+    with _stores_lock:
+        store = _stores.get(client_id)
+        if store is None:
+            store = _stores[client_id] = LeadStore(client_id)
+        return store
@@ -0,0 +1,278 @@
+import os
+import re
+import time
+import codecs
+import shutil
+import hashlib
+import binascii
+from email.header import decode_header
+from email.parser import BytesFeedParser
+from pathlib import Path
+
+# === Ingest Settings ===
+EMAIL_TEXT_CAP = int(os.getenv("EMAIL_TEXT_CAP", 20000))          # characters of body text kept per message
+EMAIL_HEADER_CAP = int(os.getenv("EMAIL_HEADER_CAP", 256 * 1024))  # bytes of headers per part before giving up
+EMAIL_SPOOL_TTL = float(os.getenv("EMAIL_SPOOL_TTL", 7 * 24 * 3600))  # seconds kept attachments outlive their message
+
+SAFE_NAME_RE = re.compile(r"[^A-Za-z0-9._-]+")
+
+def decode_subject(value):
+    if not value:
+        return ""
+    subject, charset = decode_header(value)[0]
+    if isinstance(subject, bytes):
+        return subject.decode(charset or "utf-8", errors="ignore")
+    return subject
+
+class TransferDecoder:
+    """Incremental Content-Transfer-Encoding decoder: base64, quoted-printable or raw."""
+
+    def __init__(self, encoding):
+        self.encoding = (encoding or "7bit").strip().lower()
+        self.carry = b""
+        self.soft_break = False
+
+    def decode(self, line):
+        if self.encoding == "base64":
+            data = self.carry + b"".join(line.split())
+            usable = len(data) - len(data) % 4
+            self.carry = data[usable:]
+            try:
+                return binascii.a2b_base64(data[:usable]) if usable else b""
+            except binascii.Error:
+                return b""
+        if self.encoding == "quoted-printable":
+            if line in (b"\r\n", b"\n"):
+                # The line break after a trailing "=" is a soft break: drop it
+                if self.soft_break:
+                    self.soft_break = False
+                    return b""
+                return line
+            self.soft_break = line.endswith(b"=")
+            return binascii.a2b_qp(line)
+        return line
+
+    def flush(self):
+        if self.encoding == "base64" and self.carry:
+            try:
+                return binascii.a2b_base64(self.carry + b"=" * (-len(self.carry) % 4))
+            except binascii.Error:
+                return b""
+        return b""
+
+class TextSink:
+    """Keeps decoded text/plain up to a shared character cap."""
+
+    def __init__(self, result, charset, encoding):
+        self.result = result
+        self.transfer = TransferDecoder(encoding)
+        try:
+            self.text = codecs.getincrementaldecoder(charset or "utf-8")(errors="ignore")
+        except LookupError:
+            self.text = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+
+    def write(self, line):
+        self._append(self.text.decode(self.transfer.decode(line)))
+
+    def _append(self, text):
+        room = self.result.text_cap - self.result.text_length
+        if room <= 0:
+            self.result.truncated = self.result.truncated or bool(text)
+            return
+        if len(text) > room:
+            self.result.truncated = True
+            text = text[:room]
+        self.result.body_parts.append(text)
+        self.result.text_length += len(text)
+
+    def close(self):
+        self._append(self.text.decode(self.transfer.flush(), final=True))
+
+class AttachmentSink:
+    """Decodes an attachment straight into a file under the spool directory."""
+
+    def __init__(self, result, filename, content_type, encoding):
+        self.result = result
+        self.transfer = TransferDecoder(encoding)
+        index = len(result.attachments)
+        safe = SAFE_NAME_RE.sub("_", filename or f"attachment_{index}")[:120]
+        self.path = result.spool_dir / f"{index:02d}_{safe}"
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.handle = open(self.path, "wb")
+        self.digest = hashlib.sha256()
+        self.meta = {"filename": filename, "content_type": content_type, "size": 0, "path": str(self.path)}
+        result.attachments.append(self.meta)
+
+    def write(self, line):
+        self._emit(self.transfer.decode(line))
+
+    def _emit(self, data):
+        if data:
+            self.handle.write(data)
+            self.digest.update(data)
+            self.meta["size"] += len(data)
+
+    def close(self):
+        self._emit(self.transfer.flush())
+        self.handle.close()
+        self.meta["sha256"] = self.digest.hexdigest()
+
+class DiscardSink:
+    def write(self, line):
+        pass
+
+    def close(self):
+        pass
+
+class IngestedMessage:
+    def __init__(self, spool_dir, text_cap):
+        self.spool_dir = Path(spool_dir)
+        self.text_cap = text_cap
+        self.headers = None
+        self.body_parts = []
+        self.text_length = 0
+        self.truncated = False
+        self.attachments = []
+
+    @property
+    def body(self):
+        return "".join(self.body_parts)
+
+    @property
+    def subject(self):
+        return decode_subject(self.headers.get("Subject")) if self.headers is not None else ""
+
+    @property
+    def sender(self):
+        return self.headers.get("From", "") if self.headers is not None else ""
+
+class MimeStreamParser:
+    """
+    Single-pass MIME reader for feed()-ing a message in chunks. Each part's headers go
+    through BytesFeedParser; bodies are never held whole: text/plain is decoded up to
+    text_cap characters and attachments are decoded straight to files in spool_dir, so
+    memory stays flat however large the attachments are.
+    """
+
+    def __init__(self, spool_dir, text_cap=EMAIL_TEXT_CAP):
+        self.result = IngestedMessage(spool_dir, text_cap)
+        self.partial = b""
+        self.boundaries = []        # open multipart boundaries, innermost last
+        self.state = "headers"      # headers | body | skip
+        self.header_parser = BytesFeedParser()
+        self.header_bytes = 0
+        self.sink = None
+        self.pending_eol = b""      # a part's final line break belongs to the next boundary
+
+    def feed(self, data):
+        data = self.partial + data
+        lines = data.splitlines(keepends=True)
+        # Hold back an unterminated last line (or a bare \r whose \n may be in the next chunk)
+        self.partial = lines.pop() if lines and not lines[-1].endswith(b"\n") else b""
+        for line in lines:
+            self._line(line)
+
+    def close(self):
+        if self.partial:
+            self._line(self.partial)
+            self.partial = b""
+        if self.state == "headers":
+            self._end_headers()
+        self._end_part()
+        return self.result
+
+    # === Line State Machine ===
+    def _line(self, line):
+        if self.state == "headers":
+            self.header_bytes += len(line)
+            if line in (b"\r\n", b"\n") or self.header_bytes > EMAIL_HEADER_CAP:
+                self._end_headers()
+            else:
+                self.header_parser.feed(line)
+            return
+
+        boundary = self._boundary(line)
+        if boundary is not None:
+            depth, closing = boundary
+            self._end_part()
+            del self.boundaries[depth + 1:]
+            if closing:
+                self.boundaries.pop()
+                self.state = "skip"     # epilogue, until the parent's next boundary
+            else:
+                self.state = "headers"
+                self.header_parser = BytesFeedParser()
+                self.header_bytes = 0
+            return
+
+        if self.state == "body":
+            if self.pending_eol:
+                self.sink.write(self.pending_eol)
+            content = line.rstrip(b"\r\n")
+            self.pending_eol = line[len(content):]
+            if content:
+                self.sink.write(content)
+
+    def _boundary(self, line):
+        if not self.boundaries or not line.startswith(b"--"):
+            return None
+        marker = line.rstrip()
+        for depth in range(len(self.boundaries) - 1, -1, -1):
+            b = self.boundaries[depth]
+            if marker == b"--" + b:
+                return depth, False
+            if marker == b"--" + b + b"--":
+                return depth, True
+        return None
+
+    def _end_headers(self):
+        part = self.header_parser.close()
+        if self.result.headers is None:
+            self.result.headers = part
+        content_type = part.get_content_type()
+        if part.get_content_maintype() == "multipart" and part.get_boundary():
+            self.boundaries.append(part.get_boundary().encode("latin-1", errors="ignore"))
+            self.state = "skip"     # preamble
+            return
+        self.state = "body"
+        self.pending_eol = b""
+        encoding = part.get("Content-Transfer-Encoding")
+        if part.get_content_disposition() == "attachment" or content_type == "message/rfc822":
+            filename = part.get_filename() or ("message.eml" if content_type == "message/rfc822" else None)
+            self.sink = AttachmentSink(self.result, filename, content_type, encoding)
+        elif content_type == "text/plain":
+            self.sink = TextSink(self.result, part.get_content_charset(), encoding)
+        else:
+            self.sink = DiscardSink()
+
+    def _end_part(self):
+        if self.sink is not None:
+            self.sink.close()
+            self.sink = None
+        self.pending_eol = b""
+
+def ingest_message(chunks, spool_dir, text_cap=EMAIL_TEXT_CAP):
+    parser = MimeStreamParser(spool_dir, text_cap)
+    for chunk in chunks:
+        parser.feed(chunk)
+    return parser.close()
+
+# === Spool Cleanup ===
+def remove_spool(spool_dir):
+    shutil.rmtree(spool_dir, ignore_errors=True)
+
+def purge_spool(root, ttl=EMAIL_SPOOL_TTL):
+    """Delete message spool directories under root untouched for ttl seconds; returns how many went."""
+    root = Path(root)
+    if not root.is_dir():
+        return 0
+    cutoff = time.time() - ttl
+    removed = 0
+    for spool_dir in root.iterdir():
+        try:
+            if spool_dir.is_dir() and spool_dir.stat().st_mtime < cutoff:
+                remove_spool(spool_dir)
+                removed += 1
+        except FileNotFoundError:
+            continue
+    return removed
@@ -0,0 +1,352 @@
+import os
+import re
+import time
+import imaplib
+import smtplib
+import logging
+import threading
+from collections import deque
+from email.message import EmailMessage
+from email.parser import BytesHeaderParser
+
+logger = logging.getLogger("DigiManMailTransport")
+
+# === Transport Settings ===
+MAIL_USE_SSL = os.getenv("MAIL_USE_SSL", "True").lower() == "true"  # False for local IMAP/SMTP stand-ins
+MAIL_FETCH_BATCH = int(os.getenv("MAIL_FETCH_BATCH", 50))
+MAIL_REPLY_BATCH = int(os.getenv("MAIL_REPLY_BATCH", 50))
+# Bodies up to MAIL_FETCH_CHUNK come in batched whole-message fetches of at most MAIL_FETCH_BATCH_BYTES;
+# larger ones are read with partial BODY.PEEK[]<offset.length> fetches so no message is held whole
+MAIL_FETCH_CHUNK = int(os.getenv("MAIL_FETCH_CHUNK", 1024 * 1024))
+MAIL_FETCH_BATCH_BYTES = int(os.getenv("MAIL_FETCH_BATCH_BYTES", 4 * 1024 * 1024))
+SMTP_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", 2))
+# Idle sessions older than this get a NOOP before reuse; servers drop idle clients after a few minutes
+MAIL_HEALTH_CHECK_SECONDS = float(os.getenv("MAIL_HEALTH_CHECK_SECONDS", 30))
+
+HEADER_FIELDS = (
+    "FROM SUBJECT DATE MESSAGE-ID CONTENT-TYPE PRECEDENCE AUTO-SUBMITTED "
+    "LIST-UNSUBSCRIBE X-SPAM-FLAG X-SPAM-STATUS X-AUTOREPLY"
+)
+FETCH_META_RE = re.compile(rb"UID (\d+)|RFC822\.SIZE (\d+)")
+
+def uid_set(uids):
+    """Compact IMAP sequence set: [1, 2, 3, 7] -> '1:3,7'."""
+    ranges = []
+    for uid in sorted(int(u) for u in uids):
+        if ranges and uid == ranges[-1][1] + 1:
+            ranges[-1][1] = uid
+        else:
+            ranges.append([uid, uid])
+    return ",".join(f"{a}:{b}" if a != b else str(a) for a, b in ranges)
+
+def chunks(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+def classify_headers(headers):
+    """'spam' / 'skip' from headers alone, or None when the body is worth downloading."""
+    if headers.get("X-Spam-Flag", "").strip().lower() == "yes":
+        return "spam"
+    if headers.get("X-Spam-Status", "").strip().lower().startswith("yes"):
+        return "spam"
+    # Auto-replies, bulk and list mail: never answer them (reply loops, newsletters)
+    if headers.get("Auto-Submitted", "no").strip().lower() != "no" or headers.get("X-Autoreply"):
+        return "skip"
+    if headers.get("Precedence", "").strip().lower() in ("bulk", "junk", "list"):
+        return "skip"
+    if headers.get("List-Unsubscribe"):
+        return "skip"
+    return None
+
+class MailHeader:
+    def __init__(self, uid, size, headers):
+        self.uid = uid
+        self.size = size
+        self.headers = headers
+
+class SMTPPool:
+    """Authenticated SMTP sessions kept open between sends and NOOP-checked after idling."""
+
+    def __init__(self, factory, account, password, size=SMTP_POOL_SIZE, stats=None):
+        self.factory = factory
+        self.account = account
+        self.password = password
+        self.size = size
+        self.idle = deque()  # (session, last_used)
+        self.lock = threading.Lock()
+        self.stats = stats if stats is not None else {}
+
+    def _connect(self):
+        session = self.factory()
+        if self.account:
+            session.login(self.account, self.password)
+        self.stats["smtp_connects"] = self.stats.get("smtp_connects", 0) + 1
+        return session
+
+    def _healthy(self, session, last_used):
+        if time.monotonic() - last_used < MAIL_HEALTH_CHECK_SECONDS:
+            return True
+        try:
+            return session.noop()[0] == 250
+        except Exception:
+            return False
+
+    def acquire(self):
+        with self.lock:
+            while self.idle:
+                session, last_used = self.idle.pop()
+                if self._healthy(session, last_used):
+                    return session
+                self._close(session)
+        return self._connect()
+
+    def release(self, session):
+        with self.lock:
+            if len(self.idle) < self.size:
+                self.idle.append((session, time.monotonic()))
+                return
+        self._close(session)
+
+    def discard(self, session):
+        self._close(session)
+
+    def _close(self, session):
+        try:
+            session.quit()
+        except Exception:
+            try:
+                session.close()
+            except Exception:
+                pass
+
+    def close(self):
+        with self.lock:
+            while self.idle:
+                self._close(self.idle.pop()[0])
+
+class MailTransport:
+    """
+    IMAP + SMTP for one mailbox. The IMAP session stays logged in across sweeps, UNSEEN
+    messages are fetched by UID in batches (headers first, bodies only for what survives
+    header triage) and replies are queued and sent over a pooled SMTP session.
+    """
+
+    def __init__(self, imap_server, imap_port, smtp_server, smtp_port, account, password,
+                 imap_factory=None, smtp_factory=None, use_ssl=MAIL_USE_SSL):
+        self.account = account
+        self.password = password
+        if imap_factory is None:
+            imap_cls = imaplib.IMAP4_SSL if use_ssl else imaplib.IMAP4
+            imap_factory = lambda: imap_cls(imap_server, imap_port)
+        if smtp_factory is None:
+            smtp_cls = smtplib.SMTP_SSL if use_ssl else smtplib.SMTP
+            smtp_factory = lambda: smtp_cls(smtp_server, smtp_port)
+        self.imap_factory = imap_factory
+        self.imap = None
+        self.imap_last_used = 0.0
+        self.stats = {
+            "imap_connects": 0, "smtp_connects": 0, "imap_round_trips": 0,
+            "headers_fetched": 0, "bodies_fetched": 0, "bytes_fetched": 0,
+            "skipped": 0, "replies_sent": 0, "replies_failed": 0, "seconds": 0.0
+        }
+        self.smtp = SMTPPool(smtp_factory, account, password, stats=self.stats)
+        self.outbox = deque()
+        self.lock = threading.RLock()
+
+    # === IMAP ===
+    def mailbox(self, folder="inbox"):
+        with self.lock:
+            if self.imap is not None and time.monotonic() - self.imap_last_used >= MAIL_HEALTH_CHECK_SECONDS:
+                try:
+                    if self.imap.noop()[0] != "OK":
+                        raise imaplib.IMAP4.abort("NOOP failed")
+                except Exception:
+                    self._drop_imap()
+            if self.imap is None:
+                self.imap = self.imap_factory()
+                self.imap.login(self.account, self.password)
+                self.imap.select(folder)
+                self.stats["imap_connects"] += 1
+            self.imap_last_used = time.monotonic()
+            return self.imap
+
+    def _drop_imap(self):
+        try:
+            self.imap.logout()
+        except Exception:
+            pass
+        self.imap = None
+
+    def _uid(self, command, *args):
+        # The whole exchange, reconnect included, holds the lock: one IMAP session can't
+        # interleave commands, and two callers must not both drop and reopen it
+        with self.lock:
+            imap = self.mailbox()
+            self.stats["imap_round_trips"] += 1
+            try:
+                status, data = imap.uid(command, *args)
+            except (imaplib.IMAP4.abort, OSError):
+                # Connection went away mid-sweep: reconnect once and retry
+                self._drop_imap()
+                imap = self.mailbox()
+                status, data = imap.uid(command, *args)
+        if status != "OK":
+            raise imaplib.IMAP4.error(f"UID {command} failed: {data}")
+        return data
+
+    def unseen_uids(self):
+        data = self._uid("SEARCH", None, "UNSEEN")
+        return [int(u) for u in (data[0] or b"").split()]
+
+    def _fetch(self, uids, items):
+        """Yield (uid, size, payload bytes) for one batched UID FETCH per MAIL_FETCH_BATCH uids."""
+        for batch in chunks(list(uids), MAIL_FETCH_BATCH):
+            for part in self._uid("FETCH", uid_set(batch), items):
+                if not isinstance(part, tuple):
+                    continue
+                uid = size = None
+                for m in FETCH_META_RE.finditer(part[0]):
+                    if m.group(1):
+                        uid = int(m.group(1))
+                    elif m.group(2):
+                        size = int(m.group(2))
+                if uid is not None:
+                    self.stats["bytes_fetched"] += len(part[1])
+                    yield uid, size, part[1]
+
+    def fetch_headers(self, uids):
+        parser = BytesHeaderParser()
+        headers = []
+        for uid, size, payload in self._fetch(uids, f"(UID RFC822.SIZE BODY.PEEK[HEADER.FIELDS ({HEADER_FIELDS})])"):
+            headers.append(MailHeader(uid, size, parser.parsebytes(payload)))
+            self.stats["headers_fetched"] += 1
+        return headers
+
+    def fetch_bodies(self, uids):
+        """Yield (uid, raw RFC822 bytes); BODY.PEEK leaves \\Seen alone until mark_seen()."""
+        for uid, _, payload in self._fetch(uids, "(UID BODY.PEEK[])"):
+            self.stats["bodies_fetched"] += 1
+            yield uid, payload
+
+    def fetch_streams(self, headers, chunk_size=MAIL_FETCH_CHUNK):
+        """Yield (uid, iterable of byte chunks) for each header, small messages batched together."""
+        batch, batch_bytes = [], 0
+        for header in headers:
+            size = header.size or 0
+            if size > chunk_size:
+                yield header.uid, self.stream_body(header.uid, chunk_size)
+                continue
+            if batch and batch_bytes + size > MAIL_FETCH_BATCH_BYTES:
+                for uid, payload in self.fetch_bodies(batch):
+                    yield uid, (payload,)
+                batch, batch_bytes = [], 0
+            batch.append(header.uid)
+            batch_bytes += size
+        if batch:
+            for uid, payload in self.fetch_bodies(batch):
+                yield uid, (payload,)
+
+    def stream_body(self, uid, chunk_size=MAIL_FETCH_CHUNK):
+        offset = 0
+        while True:
+            payload = b""
+            for _, _, data in self._fetch([uid], f"(UID BODY.PEEK[]<{offset}.{chunk_size}>)"):
+                payload = data
+            if payload:
+                yield payload
+            if len(payload) < chunk_size:
+                self.stats["bodies_fetched"] += 1
+                return
+            offset += len(payload)
+
+    def mark_seen(self, uids):
+        for batch in chunks(list(uids), MAIL_FETCH_BATCH * 10):
+            self._uid("STORE", uid_set(batch), "+FLAGS.SILENT", "(\\Seen)")
+
+    # === SMTP ===
+    def queue_reply(self, to_email, subject, body):
+        msg = EmailMessage()
+        msg["Subject"] = subject if subject.lower().startswith("re:") else f"Re: {subject}"
+        msg["From"] = self.account
+        msg["To"] = to_email
+        msg.set_content(body)
+        with self.lock:
+            self.outbox.append(msg)
+            full = len(self.outbox) >= MAIL_REPLY_BATCH
+        if full:
+            self.flush_replies()
+
+    def flush_replies(self):
+        """Send everything queued over one pooled session. Returns the messages that failed."""
+        with self.lock:
+            pending = list(self.outbox)
+            self.outbox.clear()
+        if not pending:
+            return []
+        try:
+            session = self.smtp.acquire()
+        except Exception:
+            with self.lock:
+                self.outbox.extendleft(reversed(pending))
+            raise
+        failed = []
+        try:
+            for msg in pending:
+                try:
+                    session.send_message(msg)
+                    self.stats["replies_sent"] += 1
+                except smtplib.SMTPServerDisconnected:
+                    session = self._resend(session, msg, failed)
+                except smtplib.SMTPException as e:
+                    logger.error(f"Reply to {msg['To']} failed: {e}")
+                    failed.append(msg)
+                except OSError:
+                    session = self._resend(session, msg, failed)
+        finally:
+            self.smtp.release(session)
+        self.stats["replies_failed"] += len(failed)
+        return failed
+
+    def _resend(self, session, msg, failed):
+        # The pooled session died between sends: reconnect once for this message
+        self.smtp.discard(session)
+        session = self.smtp.acquire()
+        try:
+            session.send_message(msg)
+            self.stats["replies_sent"] += 1
+        except Exception as e:
+            logger.error(f"Reply to {msg['To']} failed: {e}")
+            failed.append(msg)
+        return session
+
+    # === Reporting ===
+    def record_sweep(self, seconds, skipped=0):
+        self.stats["seconds"] += seconds
+        self.stats["skipped"] += skipped
+
+    def messages_per_second(self):
+        handled = self.stats["headers_fetched"]
+        return round(handled / self.stats["seconds"], 2) if self.stats["seconds"] else 0.0
+
+    def close(self):
+        self.flush_replies()
+        self.smtp.close()
+        with self.lock:
+            if self.imap is not None:
+                self._drop_imap()
+
+# === Per-Tenant Transports ===
+# Cached so the IMAP session and SMTP pool outlive a single EmailAgent instance; keyed by
+# client as well as mailbox so tenants never share a session or each other's credentials
+_transports = {}
+_transports_lock = threading.Lock()
+
+def get_mail_transport(imap_server, imap_port, smtp_server, smtp_port, account, password, client_id=None, **kwargs):
+    key = (client_id, imap_server, imap_port, smtp_server, smtp_port, account)
+    with _transports_lock:
+        transport = _transports.get(key)
+        if transport is None:
+            transport = _transports[key] = MailTransport(
+                imap_server, imap_port, smtp_server, smtp_port, account, password, **kwargs
+            )
+        return transport
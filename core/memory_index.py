@@ -0,0 +1,131 @@
+import os
+import re
+import math
+import threading
+from collections import OrderedDict
+from core.memory_store import get_memory_engine
+from core.tracing import traced
+
+# === Retrieval Settings ===
+MEMORY_TOP_K = int(os.getenv("MEMORY_TOP_K", 5))
+MEMORY_TOKEN_BUDGET = int(os.getenv("MEMORY_TOKEN_BUDGET", 800))
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+STOPWORDS = {
+    "the", "and", "for", "you", "your", "with", "that", "this", "are", "was", "from", "have",
+    "has", "not", "but", "all", "can", "our", "out", "use", "into", "per", "via", "any", "its"
+}
+
+def tokenize(text):
+    return [t for t in TOKEN_RE.findall(str(text).lower()) if len(t) > 1 and t not in STOPWORDS]
+
+def estimate_tokens(text):
+    # ~4 characters per token for English prose; good enough for budgeting
+    return max(1, len(str(text)) // 4)
+
+class MemoryIndex:
+    """
+    Incremental BM25 index over one client's memory entries. Scoring walks only the
+    posting lists of the query's terms, so retrieval cost follows term selectivity
+    rather than the number of stored memories.
+    """
+
+    k1 = 1.5
+    b = 0.75
+
+    def __init__(self):
+        self.postings = {}          # term -> {seq: term frequency}
+        self.docs = OrderedDict()   # seq -> (entry, length), oldest first
+        self.total_length = 0
+        self.indexed_upto = -1
+
+    def add(self, seq, entry):
+        terms = tokenize(entry.get("content", ""))
+        counts = {}
+        for term in terms:
+            counts[term] = counts.get(term, 0) + 1
+        for term, tf in counts.items():
+            self.postings.setdefault(term, {})[seq] = tf
+        self.docs[seq] = (entry, len(terms))
+        self.total_length += len(terms)
+        self.indexed_upto = max(self.indexed_upto, seq)
+
+    def remove(self, seq):
+        entry, length = self.docs.pop(seq)
+        for term in set(tokenize(entry.get("content", ""))):
+            posting = self.postings.get(term)
+            if posting is not None:
+                posting.pop(seq, None)
+                if not posting:
+                    del self.postings[term]
+        self.total_length -= length
+
+    def sync(self, first_seq, newer):
+        # Evicted (or reloaded) entries are the oldest ones, so pop from the front
+        while self.docs:
+            oldest = next(iter(self.docs))
+            if oldest >= first_seq:
+                break
+            self.remove(oldest)
+        for seq, entry in newer:
+            if seq not in self.docs:
+                self.add(seq, entry)
+
+    def search(self, query, k=MEMORY_TOP_K, token_budget=MEMORY_TOKEN_BUDGET):
+        """Top-k entries for the query that fit in token_budget, returned oldest first."""
+        n = len(self.docs)
+        if n == 0:
+            return []
+        avg_length = (self.total_length / n) or 1.0
+        scores = {}
+        for term in set(tokenize(query)):
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            idf = math.log(1 + (n - len(posting) + 0.5) / (len(posting) + 0.5))
+            for seq, tf in posting.items():
+                length = self.docs[seq][1]
+                norm = tf * (self.k1 + 1) / (tf + self.k1 * (1 - self.b + self.b * length / avg_length))
+                scores[seq] = scores.get(seq, 0.0) + idf * norm
+
+        # Ties go to the more recent memory
+        ranked = sorted(scores, key=lambda seq: (scores[seq], seq), reverse=True)
+        return self.within_budget(ranked, k, token_budget)
+
+    def recent(self, k=MEMORY_TOP_K, token_budget=MEMORY_TOKEN_BUDGET):
+        return self.within_budget(list(reversed(self.docs)), k, token_budget)
+
+    def within_budget(self, seqs, k, token_budget):
+        chosen = []
+        used = 0
+        for seq in seqs:
+            if len(chosen) >= k:
+                break
+            cost = estimate_tokens(self.docs[seq][0].get("content", ""))
+            if token_budget is not None and used + cost > token_budget:
+                continue
+            chosen.append(seq)
+            used += cost
+        return [self.docs[seq][0] for seq in sorted(chosen)]
+
+# === Per-Client Indexes ===
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+def get_memory_index(client_id):
+    with _indexes_lock:
+        entry = _indexes.get(client_id)
+        if entry is None:
+            entry = _indexes[client_id] = (MemoryIndex(), threading.Lock())
+    index, lock = entry
+    with lock:
+        first_seq, newer = get_memory_engine(client_id).delta(index.indexed_upto)
+        index.sync(first_seq, newer)
+    return index, lock
+
+@traced("memory.search")
+def search_memory(client_id, query, k=MEMORY_TOP_K, token_budget=MEMORY_TOKEN_BUDGET):
+    index, lock = get_memory_index(client_id)
+    with lock:
+        hits = index.search(query, k, token_budget)
+        return hits if hits else index.recent(k, token_budget)
@@ -1,35 +1,160 @@
 from pathlib import Path
+import os
 import json
-from pathlib import Path
+import threading
+from collections import deque
 from datetime import datetime
+from core.journal import Journal, atomic_write_json
+from core.tracing import traced
 
 MAX_MEMORY = 100  # Limit memory to prevent overload
+COMPACT_EVERY = int(os.getenv("MEMORY_COMPACT_EVERY", 200))
 
-def load_memory(client_id):
-    path = Path(f".digi/clients/{client_id}/memory.json")
-    if path.exists():
+class MemoryEngine:
+    """
+    One client's conversation memory: the last MAX_MEMORY entries held in a ring buffer,
+    memory.json as the compacted snapshot and memory.journal as the append-only log of
+    everything added since. Appends are O(1); compaction runs on a background thread.
+    """
+
+    def __init__(self, client_id):
+        self.client_id = client_id
+        base = Path(f".digi/clients/{client_id}")
+        self.snapshot_path = base / "memory.json"
+        self.journal = Journal(base / "memory.journal", fsync=False)
+        self.lock = threading.RLock()
+        self.entries = deque(maxlen=MAX_MEMORY)  # (seq, entry)
+        self.next_seq = 0
+        self.loaded = False
+        self.compacting = False
+
+    # === Loading / Replay ===
+    def _load_snapshot(self):
+        self.entries.clear()
+        if not self.snapshot_path.exists():
+            return
         try:
-            messages = json.loads(path.read_text())
-            return messages[-MAX_MEMORY:]  # Trim if over limit
+            messages = json.loads(self.snapshot_path.read_text())
         except json.JSONDecodeError:
-            return []
-    return []
+            return
+        for entry in messages[-MAX_MEMORY:]:
+            self._push(entry)
+
+    def _push(self, entry):
+        self.entries.append((self.next_seq, entry))
+        self.next_seq += 1
+
+    def _refresh(self):
+        records, rotated = self.journal.read_new()
+        if rotated or not self.loaded:
+            self._load_snapshot()
+            self.loaded = True
+        for record in records:
+            self._push(record["entry"])
+
+    def _sync(self):
+        if self.loaded and not self.journal.changed():
+            return
+        with self.journal.locked(shared=True):
+            self._refresh()
+
+    # === Public API ===
+    def messages(self):
+        with self.lock:
+            self._sync()
+            return [entry for _, entry in self.entries]
+
+    def sequenced(self):
+        """(seq, entry) pairs; seqs only grow, so an index can follow appends and evictions."""
+        with self.lock:
+            self._sync()
+            return list(self.entries)
+
+    def delta(self, after_seq):
+        """(oldest live seq, entries newer than after_seq). Walks only the new tail."""
+        with self.lock:
+            self._sync()
+            if not self.entries:
+                return self.next_seq, []
+            newer = []
+            for seq, entry in reversed(self.entries):
+                if seq <= after_seq:
+                    break
+                newer.append((seq, entry))
+            newer.reverse()
+            return self.entries[0][0], newer
 
+    def append(self, entries):
+        with self.lock:
+            with self.journal.locked():
+                self._refresh()
+                self.journal.append([{"entry": entry} for entry in entries])
+            for entry in entries:
+                self._push(entry)
+            if self.journal.records_since_compaction >= COMPACT_EVERY and not self.compacting:
+                self.compacting = True
+                threading.Thread(target=self.compact, name="digiman-memory-compact", daemon=True).start()
+
+    def replace(self, messages):
+        with self.lock:
+            with self.journal.locked():
+                self.entries.clear()
+                for entry in messages[-MAX_MEMORY:]:
+                    self._push(entry)
+                atomic_write_json(self.snapshot_path, [e for _, e in self.entries], indent=2)
+                self.journal.rotate()
+                self.loaded = True
+
+    def compact(self):
+        with self.lock:
+            try:
+                with self.journal.locked():
+                    self._refresh()
+                    atomic_write_json(self.snapshot_path, [e for _, e in self.entries], indent=2)
+                    self.journal.rotate()
+            finally:
+                self.compacting = False
+
+    def clear(self):
+        with self.lock:
+            with self.journal.locked():
+                self.entries.clear()
+                if self.snapshot_path.exists():
+                    self.snapshot_path.unlink()
+                self.journal.rotate()
+                self.loaded = True
+
+# === Process-Level Cache ===
+# Every agent constructor calls load_memory(client_id); they all share one parsed copy.
+_engines = {}
+_engines_lock = threading.Lock()
+
+def get_memory_engine(client_id):
+    with _engines_lock:
+        engine = _engines.get(client_id)
+        if engine is None:
+            engine = _engines[client_id] = MemoryEngine(client_id)
+        return engine
+
+@traced("memory.load")
+def load_memory(client_id):
+    return get_memory_engine(client_id).messages()
+
+@traced("memory.save")
 def save_memory(client_id, messages):
-    path = Path(f".digi/clients/{client_id}/memory.json")
-    path.parent.mkdir(parents=True, exist_ok=True)
     # Truncate memory if over limit
-    messages = messages[-MAX_MEMORY:]
-    path.write_text(json.dumps(messages, indent=2))
+    get_memory_engine(client_id).replace(messages)
 
 def add_memory_entry(client_id, role, content):
-    memory = load_memory(client_id)
+    add_memory_entries(client_id, [(role, content)])
+
+@traced("memory.add")
+def add_memory_entries(client_id, items):
     timestamp = datetime.now().isoformat()
-    memory.append({"role": role, "content": content, "timestamp": timestamp})
-    save_memory(client_id, memory)
+    get_memory_engine(client_id).append(
+        [{"role": role, "content": content, "timestamp": timestamp} for role, content in items]
+    )
 
+@traced("memory.clear")
 def clear_memory(client_id):
-    path = Path(f".digi/clients/{client_id}/memory.json")
-    if path.exists():
-        path.unlink()
-
+    get_memory_engine(client_id).clear()
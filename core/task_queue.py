@@ -0,0 +1,255 @@
+import os
+import json
+import heapq
+import uuid
+import hashlib
+import logging
+import threading
+from datetime import datetime
+from pathlib import Path
+from core.journal import Journal, atomic_write_json
+from core.tracing import traced
+
+logger = logging.getLogger("DigiManTaskQueue")
+
+# === Queue Settings ===
+QUEUE_FSYNC = os.getenv("QUEUE_FSYNC", "True").lower() == "true"
+COMPACT_EVERY = int(os.getenv("QUEUE_COMPACT_EVERY", 500))
+
+class TaskQueue:
+    """
+    Per-client task queue: agent_queue.json is the compacted snapshot (same
+    {agent: [entries]} layout as before) and agent_queue.journal holds every
+    enqueue/consume since. Each agent keeps a priority heap, so popping work
+    never sorts the whole queue.
+    """
+
+    def __init__(self, client_id=None):
+        self.client_id = client_id
+        base = Path(f".digi/clients/{client_id}") if client_id else Path(".digi")
+        self.snapshot_path = base / "agent_queue.json"
+        self.journal = Journal(base / "agent_queue.journal", fsync=QUEUE_FSYNC)
+        self.lock = threading.RLock()
+        self.tasks = {}       # task id -> (agent_name, entry), pending only
+        self.heaps = {}       # agent_name -> [(-priority, seq, task id)]
+        self.pending_by_agent = {}
+        self.seq = 0
+        self.loaded = False
+
+    # === Loading / Replay ===
+    def _load_snapshot(self):
+        self.tasks.clear()
+        self.heaps.clear()
+        self.pending_by_agent.clear()
+        if not self.snapshot_path.exists():
+            return
+        try:
+            with self.snapshot_path.open("r") as f:
+                snapshot = json.load(f)
+        except Exception as e:
+            logger.error(f"Failed to read task queue snapshot {self.snapshot_path}: {e}")
+            return
+        for agent_name, entries in snapshot.items():
+            for position, entry in enumerate(entries or []):
+                if "id" not in entry:
+                    # Entries written before the journal existed: derive a stable id so
+                    # every process agrees on it until the next compaction persists it
+                    raw = json.dumps([agent_name, position, entry], sort_keys=True, default=str)
+                    entry["id"] = hashlib.sha1(raw.encode("utf-8")).hexdigest()
+                self._add(agent_name, entry)
+
+    def _add(self, agent_name, entry):
+        if entry["id"] in self.tasks:
+            return
+        self.tasks[entry["id"]] = (agent_name, entry)
+        self.seq += 1
+        heapq.heappush(self.heaps.setdefault(agent_name, []), (-entry.get("priority", 1), self.seq, entry["id"]))
+        self.pending_by_agent[agent_name] = self.pending_by_agent.get(agent_name, 0) + 1
+
+    def _consume(self, task_id):
+        found = self.tasks.pop(task_id, None)
+        if found:
+            self.pending_by_agent[found[0]] -= 1
+        return found
+
+    def _owned(self, agent_name, task_id):
+        # A heap can still hold ids consumed or moved to another agent since it was built
+        found = self.tasks.get(task_id)
+        return found is not None and found[0] == agent_name
+
+    def _apply(self, record):
+        if record.get("op") == "add":
+            self._add(record["agent"], record["entry"])
+        elif record.get("op") == "add_many":
+            for item in record.get("items", []):
+                self._add(item["agent"], item["entry"])
+        elif record.get("op") == "done":
+            for task_id in record.get("ids", []):
+                self._consume(task_id)
+        elif record.get("op") == "move":
+            sources = set()
+            for task_id in record.get("ids", []):
+                found = self._consume(task_id)
+                if found:
+                    sources.add(found[0])
+                    self._add(record["to"], found[1])
+            # Rebuild the old heaps without the moved ids, or a later snapshot files them under both names
+            for agent_name in sources - {record["to"]}:
+                self.heaps[agent_name] = [item for item in self.heaps.get(agent_name, []) if self._owned(agent_name, item[2])]
+                heapq.heapify(self.heaps[agent_name])
+
+    def _refresh(self):
+        """Caller holds the journal lock."""
+        records, rotated = self.journal.read_new()
+        if rotated or not self.loaded:
+            self._load_snapshot()
+            self.loaded = True
+        for record in records:
+            self._apply(record)
+
+    def _sync(self):
+        """Bring the in-memory view up to date with the journal. Cheap when nothing changed."""
+        if self.loaded and not self.journal.changed():
+            return
+        with self.journal.locked(shared=True):
+            self._refresh()
+
+    # === Public API ===
+    def _entry(self, task):
+        return {
+            "id": uuid.uuid4().hex,
+            "task": task,
+            "priority": task.get("priority", 1),
+            "timestamp": str(datetime.now())
+        }
+
+    def append(self, agent_name, task):
+        entry = self._entry(task)
+        with self.lock:
+            with self.journal.locked():
+                self._refresh()
+                self.journal.append([{"op": "add", "agent": agent_name, "entry": entry}])
+            self._add(agent_name, entry)
+            self._maybe_compact()
+        return entry
+
+    def append_many(self, items):
+        """
+        Enqueue [(agent_name, task), ...] as one journal record: a single write that
+        lands whole or (torn by a crash) not at all. Returns the entries in order.
+        """
+        added = [(agent_name, self._entry(task)) for agent_name, task in items]
+        if not added:
+            return []
+        with self.lock:
+            with self.journal.locked():
+                self._refresh()
+                self.journal.append([{
+                    "op": "add_many",
+                    "items": [{"agent": agent_name, "entry": entry} for agent_name, entry in added]
+                }])
+            for agent_name, entry in added:
+                self._add(agent_name, entry)
+            self._maybe_compact()
+        return [entry for _, entry in added]
+
+    def pop(self, agent_name, limit=None):
+        """
+        Remove and return up to `limit` pending tasks for one agent, highest priority
+        first (FIFO within a priority). The consume record is durable before returning.
+        """
+        with self.lock:
+            with self.journal.locked():
+                self._refresh()
+                heap = self.heaps.get(agent_name, [])
+                popped = []
+                while heap and (limit is None or len(popped) < limit):
+                    _, _, task_id = heapq.heappop(heap)
+                    if not self._owned(agent_name, task_id):
+                        continue
+                    popped.append(self._consume(task_id)[1])
+                if popped:
+                    self.journal.append([{"op": "done", "ids": [e["id"] for e in popped]}])
+            self._maybe_compact()
+            return popped
+
+    def move(self, agent_name, new_agent_name):
+        """Re-file every pending task of agent_name under new_agent_name in one record."""
+        with self.lock:
+            with self.journal.locked():
+                self._refresh()
+                record = {
+                    "op": "move",
+                    "to": new_agent_name,
+                    "ids": [task_id for _, _, task_id in sorted(self.heaps.get(agent_name, []))
+                            if self._owned(agent_name, task_id)]
+                }
+                if not record["ids"]:
+                    return 0
+                self.journal.append([record])
+                self._apply(record)
+            self._maybe_compact()
+            return len(record["ids"])
+
+    def pending(self, agent_name=None):
+        with self.lock:
+            self._sync()
+            if agent_name is not None:
+                return self.pending_by_agent.get(agent_name, 0)
+            return len(self.tasks)
+
+    def pending_agents(self):
+        with self.lock:
+            self._sync()
+            return [name for name, count in self.pending_by_agent.items() if count > 0]
+
+    def snapshot(self):
+        """Pending tasks in the legacy {agent: [entries]} layout, priority order per agent."""
+        with self.lock:
+            self._sync()
+            return self._snapshot_view()
+
+    # === Compaction ===
+    def _maybe_compact(self):
+        if self.journal.records_since_compaction >= COMPACT_EVERY:
+            self.compact()
+
+    @traced("queue.compact")
+    def compact(self):
+        with self.lock:
+            with self.journal.locked():
+                self._refresh()
+                # Drop heap entries left behind by consumed tasks while we are here
+                for agent_name, heap in self.heaps.items():
+                    self.heaps[agent_name] = [item for item in heap if self._owned(agent_name, item[2])]
+                    heapq.heapify(self.heaps[agent_name])
+                atomic_write_json(self.snapshot_path, self._snapshot_view(), indent=2)
+                self.journal.rotate()
+
+    def _snapshot_view(self):
+        view = {}
+        for agent_name, heap in self.heaps.items():
+            entries = [self.tasks[task_id][1] for _, _, task_id in sorted(heap) if self._owned(agent_name, task_id)]
+            if entries:
+                view[agent_name] = entries
+        return view
+
+def task_payload(entry):
+    """The task dict an agent's run_task() expects, unwrapped from its queue entry."""
+    task = entry.get("task")
+    payload = dict(task) if isinstance(task, dict) else {"task": str(task)}
+    payload.setdefault("priority", entry.get("priority", 1))
+    payload["id"] = entry.get("id")
+    payload["queued_at"] = entry.get("timestamp")
+    return payload
+
+# === Process-Level Queue Registry ===
+_queues = {}
+_queues_lock = threading.Lock()
+
+def get_task_queue(client_id=None):
+    with _queues_lock:
+        queue = _queues.get(client_id)
+        if queue is None:
+            queue = _queues[client_id] = TaskQueue(client_id)
+        return queue
@@ -0,0 +1,264 @@
+import os
+import json
+import time
+import heapq
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from core.digiman_core import log_action
+from core.task_queue import get_task_queue
+from core.wakeup import wakeup_hub, TimerWheel
+
+logger = logging.getLogger("DigiManScheduler")
+
+CLIENTS_DIR = Path(".digi/clients")
+SCHEDULER_WORKERS = int(os.getenv("SCHEDULER_WORKERS", 4))
+DISCOVERY_INTERVAL = float(os.getenv("SCHEDULER_DISCOVERY_INTERVAL", 30))
+
+# Share of loop runs a tenant gets relative to a starter tenant with the same backlog
+TIER_WEIGHTS = {"starter": 1, "pro": 2, "enterprise": 4, "cancelled": 0}
+
+class TenantState:
+    def __init__(self, client_id):
+        self.client_id = client_id
+        self.base = CLIENTS_DIR / client_id
+        self.queue_signature = None
+        self.subscription_signature = None
+        self.weight = 1
+        self.finish_tag = 0.0
+        self.ready_since = None
+        self.running = False
+        self.runs = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.last_run_seconds = 0.0
+        self.deferred_until = None   # tasks put back for the LLM cooldown retry after this
+
+    def queue_changed(self):
+        """stat() the queue files only; an idle tenant costs two syscalls per pass."""
+        signature = []
+        for name in ("agent_queue.journal", "agent_queue.json"):
+            try:
+                st = os.stat(self.base / name)
+                signature.append((st.st_ino, st.st_size, st.st_mtime_ns))
+            except FileNotFoundError:
+                signature.append(None)
+        signature = tuple(signature)
+        if signature == self.queue_signature:
+            return False
+        self.queue_signature = signature
+        return True
+
+    def refresh_weight(self):
+        path = self.base / "subscription.json"
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            self.weight = TIER_WEIGHTS["starter"]
+            return
+        if mtime == self.subscription_signature:
+            return
+        self.subscription_signature = mtime
+        try:
+            plan = json.loads(path.read_text()).get("plan", "starter")
+        except Exception:
+            plan = "starter"
+        self.weight = TIER_WEIGHTS.get(plan, TIER_WEIGHTS["starter"])
+
+class TenantScheduler:
+    """
+    Drives every client under .digi/clients/ from one process. Tenants with pending
+    work sit in a ready heap ordered by start-time fair queueing tags, so a tenant with
+    weight w gets w times the loop runs of a weight-1 tenant while both are backlogged;
+    idle tenants are never run.
+    """
+
+    def __init__(self, max_workers=None, loop_workers=1, clients_dir=None):
+        self.clients_dir = Path(clients_dir) if clients_dir else CLIENTS_DIR
+        self.max_workers = max_workers or SCHEDULER_WORKERS
+        self.loop_workers = loop_workers
+        self.tenants = {}
+        self.loops = {}
+        self.ready = []
+        self.virtual_time = 0.0
+        self.last_discovery = 0.0
+        self.lock = threading.Lock()
+        self.seq = 0
+        self.timers = TimerWheel()      # client id -> when its next calendar job is due
+
+    # === Discovery ===
+    def discover(self):
+        if not self.clients_dir.exists():
+            return
+        with os.scandir(self.clients_dir) as entries:
+            for entry in entries:
+                if entry.is_dir() and entry.name not in self.tenants:
+                    self.tenants[entry.name] = TenantState(entry.name)
+                    self.schedule_jobs(entry.name)
+        self.last_discovery = time.monotonic()
+
+    def loop_for(self, client_id):
+        from core.autonomous_loop import AutonomousLoop
+        loop = self.loops.get(client_id)
+        if loop is None:
+            loop = self.loops[client_id] = AutonomousLoop(client_id, max_workers=self.loop_workers)
+        return loop
+
+    def schedule_jobs(self, client_id):
+        # Calendar jobs and deferred-task retries share the tenant's one timer
+        next_due = self.loop_for(client_id).next_wakeup()
+        if next_due is None:
+            self.timers.cancel(client_id)
+        else:
+            self.timers.schedule(client_id, next_due)
+
+    def wake_due_tenants(self):
+        """Tenants with a calendar job due run even if their queue is empty."""
+        for client_id in self.timers.pop_due(time.time()):
+            with self.lock:
+                tenant = self.tenants.get(client_id)
+                if tenant is None or tenant.running or tenant.ready_since is not None:
+                    continue
+                tenant.refresh_weight()
+                if tenant.weight <= 0:
+                    self.timers.cancel(client_id)   # cancelled plan: its jobs don't run
+                    continue
+                self.mark_ready(tenant)
+
+    def refresh(self, client_ids=None):
+        """Move tenants whose queue files changed and who have pending tasks onto the ready heap."""
+        with self.lock:
+            for client_id in client_ids or list(self.tenants):
+                tenant = self.tenants.get(client_id)
+                if tenant is None:
+                    tenant = self.tenants[client_id] = TenantState(client_id)
+                if tenant.running or tenant.ready_since is not None:
+                    continue
+                if tenant.deferred_until is not None and time.time() < tenant.deferred_until:
+                    continue  # its tasks were put back for the LLM cooldown; the timer wakes it
+                if not tenant.queue_changed():
+                    continue
+                if get_task_queue(client_id).pending() == 0:
+                    continue
+                tenant.refresh_weight()
+                if tenant.weight <= 0:
+                    continue
+                self.mark_ready(tenant)
+
+    def mark_ready(self, tenant):
+        if tenant.weight <= 0:
+            return False
+        tenant.ready_since = time.monotonic()
+        start = max(self.virtual_time, tenant.finish_tag)
+        tenant.finish_tag = start + 1.0 / tenant.weight
+        self.seq += 1
+        heapq.heappush(self.ready, (tenant.finish_tag, self.seq, tenant.client_id))
+        return True
+
+    # === Dispatch ===
+    def next_tenant(self):
+        with self.lock:
+            while self.ready:
+                tag, _, client_id = heapq.heappop(self.ready)
+                tenant = self.tenants[client_id]
+                if tenant.ready_since is None:
+                    continue
+                self.virtual_time = max(self.virtual_time, tag - 1.0 / tenant.weight)
+                tenant.last_lag = time.monotonic() - tenant.ready_since
+                tenant.max_lag = max(tenant.max_lag, tenant.last_lag)
+                tenant.ready_since = None
+                tenant.running = True
+                return tenant
+            return None
+
+    def run_tenant(self, tenant):
+        started = time.monotonic()
+        try:
+            loop = self.loop_for(tenant.client_id)
+            loop.run()
+            tenant.deferred_until = loop.deferred_until
+            self.schedule_jobs(tenant.client_id)
+        except Exception as e:
+            log_action("Tenant Scheduler", f"Loop failed for {tenant.client_id}: {e}")
+        finally:
+            tenant.last_run_seconds = time.monotonic() - started
+            tenant.runs += 1
+            with self.lock:
+                tenant.running = False
+                # Agents often enqueue follow-ups during the run; force a recheck
+                tenant.queue_signature = None
+
+    def run_once(self):
+        """Run every currently ready tenant once, in fair order. Returns the number of runs."""
+        if time.monotonic() - self.last_discovery >= DISCOVERY_INTERVAL:
+            self.discover()
+        self.refresh()
+        self.wake_due_tenants()
+        runs = 0
+        while True:
+            tenant = self.next_tenant()
+            if tenant is None:
+                return runs
+            self.run_tenant(tenant)
+            runs += 1
+
+    def run_forever(self, idle_sleep=1.0):
+        """
+        Keep at most max_workers tenant loops running. A backlogged tenant is re-queued
+        after each run with its tag advanced by 1/weight, so heavier tiers come back sooner.
+        With nothing ready the scheduler blocks until an enqueue notification or the next
+        calendar job; idle_sleep is only a fallback poll for when this process can't
+        receive other processes' notifications.
+        """
+        listening = wakeup_hub.listen()
+        self.discover()
+        slots = threading.BoundedSemaphore(self.max_workers)
+
+        def run_and_release(tenant):
+            try:
+                self.run_tenant(tenant)
+            finally:
+                slots.release()
+                # A finished run may leave a backlog (or follow-ups): look again
+                wakeup_hub.notify(tenant.client_id, broadcast=False)
+
+        seen = wakeup_hub.generation()
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="digiman-tenant") as pool:
+            while True:
+                if not listening and time.monotonic() - self.last_discovery >= DISCOVERY_INTERVAL:
+                    self.discover()
+                dirty = wakeup_hub.drain()
+                # Notifications name the clients to re-stat; without the socket, re-stat them all
+                if None in dirty or not listening:
+                    self.refresh()
+                elif dirty:
+                    self.refresh(list(dirty))
+                self.wake_due_tenants()
+                tenant = self.next_tenant()
+                if tenant is None:
+                    timeout = None if listening else idle_sleep
+                    next_due = self.timers.next_deadline()
+                    if next_due is not None:
+                        until_due = max(0.0, next_due - time.time())
+                        timeout = until_due if timeout is None else min(timeout, until_due)
+                    seen = wakeup_hub.wait(seen, timeout)
+                    continue
+                slots.acquire()
+                pool.submit(run_and_release, tenant)
+
+    # === Reporting ===
+    def lag_report(self):
+        now = time.monotonic()
+        with self.lock:
+            return {
+                client_id: {
+                    "weight": t.weight,
+                    "runs": t.runs,
+                    "waiting_seconds": round(now - t.ready_since, 3) if t.ready_since is not None else 0.0,
+                    "last_lag_seconds": round(t.last_lag, 3),
+                    "max_lag_seconds": round(t.max_lag, 3),
+                    "last_run_seconds": round(t.last_run_seconds, 3)
+                }
+                for client_id, t in self.tenants.items()
+            }
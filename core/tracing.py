@@ -0,0 +1,218 @@
+import os
+import sys
+import json
+import time
+import atexit
+import random
+import logging
+import threading
+import functools
+import itertools
+from collections import deque
+from pathlib import Path
+
+logger = logging.getLogger("DigiManTracing")
+
+# === Tracing Settings ===
+# A root span (a loop pass, a server command) is sampled at TRACE_SAMPLE_RATE and every
+# span under it follows that decision, so a trace is either whole or absent. At 0 (the
+# default) a traced call costs one thread-local lookup.
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", 0.0))
+TRACE_DIR = Path(os.getenv("TRACE_DIR", ".digi/traces"))
+TRACE_BUFFER_SPANS = int(os.getenv("TRACE_BUFFER_SPANS", 50000))   # oldest spans drop past this
+TRACE_FLUSH_INTERVAL = float(os.getenv("TRACE_FLUSH_INTERVAL", 2.0))
+TRACE_FLUSH_SPANS = int(os.getenv("TRACE_FLUSH_SPANS", 1000))
+
+# Tags a span hands down to the spans opened under it
+INHERITED_TAGS = ("client", "agent", "task_id")
+
+_state = threading.local()
+_UNSAMPLED = object()   # stands in for an unsampled root, so its children don't re-roll
+
+class Tracer:
+    """
+    Finished spans, buffered in memory and appended to JSONL when a root span ends and
+    TRACE_FLUSH_INTERVAL has passed or TRACE_FLUSH_SPANS are waiting (and at exit).
+    """
+
+    def __init__(self, sample_rate=TRACE_SAMPLE_RATE, trace_dir=TRACE_DIR, buffer_spans=TRACE_BUFFER_SPANS):
+        self.sample_rate = sample_rate
+        self.trace_dir = Path(trace_dir)
+        self.spans = deque(maxlen=buffer_spans)
+        self.ids = itertools.count(1)
+        self.lock = threading.Lock()
+        self.last_flush = time.monotonic()
+
+    def new_id(self):
+        return f"{os.getpid():x}-{next(self.ids):x}"
+
+    def sampled(self):
+        return self.sample_rate > 0 and (self.sample_rate >= 1 or random.random() < self.sample_rate)
+
+    def drain(self):
+        spans = []
+        while True:
+            try:
+                spans.append(self.spans.popleft())
+            except IndexError:
+                return spans
+
+    def maybe_flush(self):
+        if len(self.spans) >= TRACE_FLUSH_SPANS or time.monotonic() - self.last_flush >= TRACE_FLUSH_INTERVAL:
+            self.flush()
+
+    def flush(self, path=None):
+        """Append buffered spans to this process's spans-<pid>.jsonl; returns how many were written."""
+        self.last_flush = time.monotonic()
+        spans = self.drain()
+        if not spans:
+            return 0
+        path = Path(path) if path else self.trace_dir / f"spans-{os.getpid()}.jsonl"
+        with self.lock:
+            try:
+                export_jsonl(spans, path)
+            except OSError as e:
+                logger.error(f"Failed to write {len(spans)} spans to {path}: {e}")
+                return 0
+        return len(spans)
+
+tracer = Tracer()
+atexit.register(tracer.flush)
+
+class span:
+    """
+    with span("loop.task", agent=..., task_id=...): one timed span, tagged with client,
+    agent and task id (inherited from the enclosing span unless given). `as` binds the span's
+    tag dict, or None when the trace isn't sampled.
+    """
+    __slots__ = ("name", "tags", "previous", "record", "started")
+
+    def __init__(self, name, **tags):
+        self.name = name
+        self.tags = tags
+        self.record = None
+
+    def __enter__(self):
+        parent = getattr(_state, "span", None)
+        self.previous = parent
+        if parent is _UNSAMPLED:
+            return None
+        if parent is None and not tracer.sampled():
+            if tracer.sample_rate > 0:
+                _state.span = _UNSAMPLED
+            return None
+        tags = {k: parent["tags"][k] for k in INHERITED_TAGS if k in parent["tags"]} if parent else {}
+        tags.update((k, v) for k, v in self.tags.items() if v is not None)
+        self.record = {
+            "name": self.name,
+            "trace_id": parent["trace_id"] if parent else tracer.new_id(),
+            "span_id": tracer.new_id(),
+            "parent_id": parent["span_id"] if parent else None,
+            "start_us": int(time.time() * 1e6),
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+            "thread": threading.current_thread().name,
+            "tags": tags
+        }
+        _state.span = self.record
+        self.started = time.perf_counter()
+        return tags
+
+    def __exit__(self, exc_type, exc, tb):
+        _state.span = self.previous
+        record = self.record
+        if record is None:
+            return False
+        record["duration_us"] = int((time.perf_counter() - self.started) * 1e6)
+        if exc_type is not None:
+            record["tags"]["error"] = f"{exc_type.__name__}: {exc}"
+        tracer.spans.append(record)
+        if record["parent_id"] is None:
+            tracer.maybe_flush()
+        return False
+
+def traced(name):
+    """Decorator: run the function inside span(name)."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if getattr(_state, "span", None) is None and tracer.sample_rate <= 0:
+                return fn(*args, **kwargs)
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def annotate(**tags):
+    """Add tags to the current span (no-op when not tracing); None values are skipped."""
+    current = getattr(_state, "span", None)
+    if current is not None and current is not _UNSAMPLED:
+        current["tags"].update((k, v) for k, v in tags.items() if v is not None)
+
+def propagate(fn):
+    """fn bound to the caller's span, for work handed to another thread (pools, fan-out)."""
+    parent = getattr(_state, "span", None)
+    if parent is None:
+        return fn
+
+    @functools.wraps(fn)
+    def attached(*args, **kwargs):
+        previous = getattr(_state, "span", None)
+        _state.span = parent
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _state.span = previous
+    return attached
+
+# === Export ===
+def export_jsonl(spans, path):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write("".join(json.dumps(s, default=str) + "\n" for s in spans))
+
+def read_spans(paths):
+    spans = []
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    spans.append(json.loads(line))
+                except ValueError:
+                    continue  # a line cut short by a crash
+    return spans
+
+def to_chrome(spans):
+    """Chrome trace-event JSON (chrome://tracing, Perfetto): one complete event per span."""
+    events, threads = [], {}
+    for s in spans:
+        args = dict(s.get("tags", {}), trace_id=s["trace_id"], span_id=s["span_id"], parent_id=s["parent_id"])
+        events.append({
+            "name": s["name"],
+            "cat": s["name"].split(".", 1)[0],
+            "ph": "X",
+            "ts": s["start_us"],
+            "dur": s.get("duration_us", 0),
+            "pid": s["pid"],
+            "tid": s["tid"],
+            "args": args
+        })
+        threads[(s["pid"], s["tid"])] = s.get("thread")
+    for (pid, tid), name in threads.items():
+        events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}})
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+def export_chrome(spans, path):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(to_chrome(spans)))
+
+if __name__ == "__main__":
+    # python -m core.tracing trace.json .digi/traces/spans-*.jsonl
+    if len(sys.argv) < 3:
+        print("usage: python -m core.tracing <chrome trace.json> <spans.jsonl>...")
+        sys.exit(1)
+    collected = read_spans(sys.argv[2:])
+    export_chrome(collected, sys.argv[1])
+    print(f"Wrote {len(collected)} spans to {sys.argv[1]}")
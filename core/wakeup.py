@@ -0,0 +1,179 @@
+import os
+import socket
+import logging
+import threading
+from pathlib import Path
+
+logger = logging.getLogger("DigiManWakeup")
+
+# === Wakeup Settings ===
+WAKEUP_SOCKET = Path(os.getenv("DIGIMAN_WAKEUP_SOCKET", ".digi/wakeup.sock"))
+WAKEUP_ENABLED = os.getenv("DIGIMAN_WAKEUP_ENABLED", "True").lower() == "true"
+TIMER_TICK = float(os.getenv("TIMER_WHEEL_TICK", 60))
+TIMER_SLOTS = int(os.getenv("TIMER_WHEEL_SLOTS", 1024))
+
+class WakeupHub:
+    """
+    Enqueue notifications. Every notify() bumps a per-client generation under one
+    condition variable, so a waiting loop in this process wakes at once; other processes
+    get a one-datagram signal on a unix socket that the waiting process listens on.
+    Waiters block with no timeout, so an idle client costs nothing until work arrives.
+    """
+
+    def __init__(self, socket_path=WAKEUP_SOCKET):
+        self.socket_path = Path(socket_path)
+        self.cond = threading.Condition()
+        self.generations = {}       # client id -> notify count; None counts every client
+        self.dirty = set()          # clients notified since the last drain()
+        self.listening = False
+        self.sender = None
+        self.sender_lock = threading.Lock()
+
+    # === Producers ===
+    def notify(self, client_id=None, broadcast=True):
+        with self.cond:
+            self._bump(client_id)
+        # A listener in this process has just been woken; only other processes need the datagram
+        if broadcast and not self.listening:
+            self.send(client_id)
+
+    def _bump(self, client_id):
+        self.generations[client_id] = self.generations.get(client_id, 0) + 1
+        if client_id is not None:
+            self.generations[None] = self.generations.get(None, 0) + 1
+        self.dirty.add(client_id)
+        self.cond.notify_all()
+
+    def send(self, client_id):
+        if not WAKEUP_ENABLED or not hasattr(socket, "AF_UNIX"):
+            return
+        payload = (client_id or "").encode("utf-8")
+        with self.sender_lock:
+            try:
+                if self.sender is None:
+                    self.sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+                    self.sender.setblocking(False)
+                self.sender.sendto(payload, str(self.socket_path))
+            except OSError:
+                # Nobody listening, or the listener's buffer is full (it is already awake)
+                pass
+
+    # === Consumers ===
+    def generation(self, client_id=None):
+        with self.cond:
+            return self.generations.get(client_id, 0)
+
+    def wait(self, seen, timeout=None, client_id=None):
+        """Block until client_id (None: any client) is notified past `seen`; returns the new generation."""
+        with self.cond:
+            self.cond.wait_for(lambda: self.generations.get(client_id, 0) != seen, timeout)
+            return self.generations.get(client_id, 0)
+
+    def drain(self):
+        """Clients notified since the last call (None in the set means 'unknown, check all')."""
+        with self.cond:
+            dirty, self.dirty = self.dirty, set()
+            return dirty
+
+    def listen(self):
+        """Receive other processes' notifications; False if another process already owns the socket."""
+        if self.listening:
+            return True
+        if not WAKEUP_ENABLED or not hasattr(socket, "AF_UNIX"):
+            return False
+        self.socket_path.parent.mkdir(parents=True, exist_ok=True)
+        if self.socket_path.exists():
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            try:
+                probe.connect(str(self.socket_path))
+                logger.info(f"Wakeup socket {self.socket_path} is served by another process")
+                return False
+            except OSError:
+                self.socket_path.unlink()  # left behind by a process that died
+            finally:
+                probe.close()
+        receiver = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        try:
+            receiver.bind(str(self.socket_path))
+        except OSError as e:
+            receiver.close()
+            logger.warning(f"Could not bind wakeup socket {self.socket_path}: {e}")
+            return False
+        self.listening = True
+        threading.Thread(target=self._receive, args=(receiver,), name="digiman-wakeup", daemon=True).start()
+        return True
+
+    def _receive(self, receiver):
+        while True:
+            try:
+                payload = receiver.recv(4096)
+            except OSError as e:
+                logger.error(f"Wakeup socket closed: {e}")
+                self.listening = False
+                return
+            with self.cond:
+                self._bump(payload.decode("utf-8", errors="ignore") or None)
+
+wakeup_hub = WakeupHub()
+
+def notify_enqueue(client_id):
+    wakeup_hub.notify(client_id)
+
+class TimerWheel:
+    """
+    Hashed timing wheel for calendar jobs: `slots` buckets of `tick` seconds. schedule()
+    and cancel() are O(1), pop_due() walks only the buckets passed since the last call,
+    and a job more than one turn away waits in its bucket until its deadline comes round.
+    One key holds one deadline; scheduling it again replaces the old one.
+    """
+
+    def __init__(self, tick=TIMER_TICK, slots=TIMER_SLOTS):
+        self.tick = tick
+        self.slots = slots
+        self.buckets = [{} for _ in range(slots)]
+        self.entries = {}           # key -> (deadline, bucket index)
+        self.current_tick = None    # last tick pop_due() processed
+        self.lock = threading.Lock()
+
+    def schedule(self, key, deadline):
+        with self.lock:
+            self._cancel(key)
+            tick = int(deadline // self.tick)
+            if self.current_tick is not None:
+                tick = max(tick, self.current_tick)  # already overdue: fire on the next pop
+            index = tick % self.slots
+            self.buckets[index][key] = deadline
+            self.entries[key] = (deadline, index)
+
+    def cancel(self, key):
+        with self.lock:
+            self._cancel(key)
+
+    def _cancel(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.buckets[entry[1]].pop(key, None)
+
+    def pop_due(self, now):
+        with self.lock:
+            now_tick = int(now // self.tick)
+            first = now_tick - self.slots + 1
+            if self.current_tick is not None:
+                first = max(first, self.current_tick)
+            due = []
+            for tick in range(first, now_tick + 1):
+                bucket = self.buckets[tick % self.slots]
+                for key, deadline in list(bucket.items()):
+                    if deadline <= now:
+                        del bucket[key]
+                        del self.entries[key]
+                        due.append(key)
+            self.current_tick = now_tick
+            return due
+
+    def next_deadline(self):
+        with self.lock:
+            return min((deadline for deadline, _ in self.entries.values()), default=None)
+
+    def __len__(self):
+        return len(self.entries)
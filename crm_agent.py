@@ -3,6 +3,7 @@ import json
 from pathlib import Path
 from core.digiman_core import log_action, update_task_queue
 from core.memory_store import load_memory
+from core.lead_store import get_lead_store
 from gpt.gpt_router import interpret_command
 from datetime import datetime
 
@@ -10,11 +11,8 @@ class CRMAgent:
     def __init__(self, client_id=None):
         self.client_id = client_id
         self.memory = load_memory(client_id)
-        self.leads_path = Path(f".digi/clients/{client_id}/leads.json")
+        self.leads = get_lead_store(client_id)
         self.reasons_path = Path(f".digi/clients/{client_id}/gpt_reasons.log")
-        self.leads_path.parent.mkdir(parents=True, exist_ok=True)
-        if not self.leads_path.exists():
-            self.leads_path.write_text(json.dumps([], indent=2))
 
     def run_task(self, task):
         log_action("CRM Agent", f"Running task: {task['task']}", self.client_id)
@@ -34,48 +32,30 @@ class CRMAgent:
         elif "log note" in task_text:
             self.add_note_to_lead(task.get("email"), task.get("note"))
 
-    def load_leads(self):
-        return json.loads(self.leads_path.read_text())
-
-    def save_leads(self, leads):
-        self.leads_path.write_text(json.dumps(leads, indent=2))
-
     def add_lead(self, email, source="unknown"):
-        leads = self.load_leads()
-        if not any(lead["email"] == email for lead in leads):
-            new_lead = {
-                "email": email,
-                "source": source,
-                "status": "new",
-                "score": 1,
-                "notes": [],
-                "created_at": datetime.now().isoformat()
-            }
-            leads.append(new_lead)
-            self.save_leads(leads)
+        new_lead = {
+            "email": email,
+            "source": source,
+            "status": "new",
+            "score": 1,
+            "created_at": datetime.now().isoformat()
+        }
+        if self.leads.add(new_lead):
             log_action("CRM Agent", f"Added new lead: {email}", self.client_id)
             update_task_queue("Sales Agent", {"task": f"Pitch lead: {email}", "priority": 2}, self.client_id)
         else:
             log_action("CRM Agent", f"Lead already exists: {email}", self.client_id)
 
     def update_lead_status(self, email, status):
-        leads = self.load_leads()
-        for lead in leads:
-            if lead["email"] == email:
-                lead["status"] = status
-                self.save_leads(leads)
-                log_action("CRM Agent", f"Updated lead status: {email} → {status}", self.client_id)
-                return
+        if self.leads.update_status(email, status):
+            log_action("CRM Agent", f"Updated lead status: {email} → {status}", self.client_id)
+            return
         log_action("CRM Agent", f"Lead not found: {email}", self.client_id)
 
     def add_note_to_lead(self, email, note):
-        leads = self.load_leads()
-        for lead in leads:
-            if lead["email"] == email:
-                lead["notes"].append(note)
-                self.save_leads(leads)
-                log_action("CRM Agent", f"Added note to lead: {email}", self.client_id)
-                return
+        if self.leads.add_note(email, note):
+            log_action("CRM Agent", f"Added note to lead: {email}", self.client_id)
+            return
         log_action("CRM Agent", f"Lead not found for note: {email}", self.client_id)
 
     def log_reasoning(self, input_text, output_json):
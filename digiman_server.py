@@ -1,8 +1,12 @@
 from pathlib import Path
 from flask import Flask, request, jsonify, send_file
-from core.digiman_core import metrics, update_task_queue, log_action
+from core.digiman_core import update_task_queue, log_action
+from core.metrics import get_metrics
 from gpt.gpt_router import interpret_command
+from gpt.llm_client import llm_client, LLMUnavailable
+from gpt.structured_output import parse_stats
 from core.memory_store import load_memory
+from core.command_inbox import CommandInbox, CommandWorkers
 import logging
 import os
 
@@ -17,6 +21,28 @@ def validate_request(req):
     key = req.headers.get("Authorization", "")
     return key == f"Bearer {API_KEY}"
 
+# "async": accept, store and return a task id; routing happens on background workers.
+# "sync": route inline as before.
+COMMAND_MODE = os.getenv("DIGIMAN_COMMAND_MODE", "async").lower()
+
+def route_command(client_id, input_text):
+    gpt_task = interpret_command(input_text, client_id)
+    update_task_queue(gpt_task["agent"], gpt_task, client_id)
+    log_action("DigiManAPI", f"Delegated to {gpt_task['agent']}: {gpt_task['task']}", client_id)
+    return gpt_task
+
+_inbox = None
+_workers = None
+
+def command_inbox():
+    # Created on first use so forked server workers each open their own connections/threads
+    global _inbox, _workers
+    if _inbox is None:
+        _inbox = CommandInbox()
+        _workers = CommandWorkers(_inbox, route_command)
+    _workers.start()
+    return _inbox
+
 # === 🚀 New: Landing page route ===
 @app.route("/", methods=["GET"])
 def landing_page():
@@ -38,19 +64,53 @@ def command():
     if not input_text:
         return jsonify({"status": "error", "message": "Missing message"}), 400
 
+    if COMMAND_MODE == "sync":
+        try:
+            gpt_task = route_command(client_id, input_text)
+            return jsonify({
+                "status": "received",
+                "task": gpt_task
+            })
+        except LLMUnavailable as e:
+            return jsonify({"status": "error", "message": str(e)}), 503
+        except Exception as e:
+            logger.error(f"Command processing failed: {e}")
+            return jsonify({"status": "error", "message": str(e)}), 500
+
     try:
-        gpt_task = interpret_command(input_text, client_id)
-        update_task_queue(gpt_task["agent"], gpt_task, client_id)
-        log_action("DigiManAPI", f"Delegated to {gpt_task['agent']}: {gpt_task['task']}", client_id)
-
-        return jsonify({
-            "status": "received",
-            "task": gpt_task
-        })
+        task_id = command_inbox().submit(client_id, input_text)
     except Exception as e:
-        logger.error(f"Command processing failed: {e}")
+        logger.error(f"Command enqueue failed: {e}")
         return jsonify({"status": "error", "message": str(e)}), 500
 
+    return jsonify({
+        "status": "accepted",
+        "task_id": task_id,
+        "status_url": f"/digiman/task/{task_id}"
+    }), 202
+
+# === Command status endpoint ===
+@app.route("/digiman/task/<task_id>", methods=["GET"])
+def task_status(task_id):
+    if not validate_request(request):
+        return jsonify({"status": "error", "message": "Unauthorized"}), 401
+
+    record = command_inbox().get(task_id)
+    client_id = request.args.get("client_id")
+    if record is None or (client_id and record["client_id"] != client_id):
+        return jsonify({"status": "error", "message": "Task not found"}), 404
+
+    return jsonify({
+        "status": "success",
+        "task_id": task_id,
+        "state": record["status"],
+        "task": record["result"],
+        "error": record["error"],
+        "attempts": record["attempts"],
+        "created_at": record["created_at"],
+        "updated_at": record["updated_at"]
+    })
+
 # === Existing insights endpoint ===
 @app.route("/digiman/insights", methods=["GET"])
 def insights():
@@ -61,7 +121,9 @@ def insights():
     memory = load_memory(client_id)
     return jsonify({
         "status": "success",
-        "metrics": metrics,
+        "metrics": get_metrics(),
+        "llm": llm_client.stats(),
+        "llm_parse": parse_stats(),
         "recent_memory": memory[-5:]
     })
 
@@ -1,30 +1,58 @@
 
 import os
 import json
-import imaplib
-import smtplib
-import email
-from email.message import EmailMessage
-from email.header import decode_header
+import time
 from datetime import datetime
+from pathlib import Path
 from core.digiman_core import log_action, update_task_queue
 from core.memory_store import load_memory
 from core.metrics import increment_metric
-from gpt.gpt_router import interpret_command
+from core.mail_transport import get_mail_transport, classify_headers
+from core.mail_ingest import ingest_message, remove_spool, purge_spool
+from gpt.gpt_router import interpret_command, request_json
+from gpt.llm_client import LLMUnavailable
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# === Batch Classification ===
+# One LLM call classifies a page of emails; each body is truncated so the page fits one prompt.
+EMAIL_BATCH_MODE = os.getenv("EMAIL_BATCH_MODE", "True").lower() == "true"
+EMAIL_BATCH_SIZE = int(os.getenv("EMAIL_BATCH_SIZE", 20)) if EMAIL_BATCH_MODE else 1
+EMAIL_BATCH_BODY_CHARS = int(os.getenv("EMAIL_BATCH_BODY_CHARS", 1500))
+CATEGORIES = ("lead", "support", "spam", "client")
+# Only these hand their attachments on (as spool paths in the queued task); the spool of
+# every other message is deleted once it's handled, and kept ones expire after EMAIL_SPOOL_TTL
+ATTACHMENT_CATEGORIES = ("support",)
+
 class EmailAgent:
     def __init__(self, client_id=None):
         self.client_id = client_id
         self.memory = load_memory(client_id)
-        self.imap_server = os.getenv("IMAP_SERVER")
-        self.smtp_server = os.getenv("SMTP_SERVER")
-        self.email_account = os.getenv("EMAIL_ACCOUNT")
-        self.email_password = os.getenv("EMAIL_PASSWORD")
-        self.imap_port = int(os.getenv("IMAP_PORT", 993))
-        self.smtp_port = int(os.getenv("SMTP_PORT", 465))
+        # The tenant's own mailbox from mail.json; the process environment is only the fallback
+        settings = self.load_mail_settings()
+        self.imap_server = settings.get("imap_server", os.getenv("IMAP_SERVER"))
+        self.smtp_server = settings.get("smtp_server", os.getenv("SMTP_SERVER"))
+        self.email_account = settings.get("email_account", os.getenv("EMAIL_ACCOUNT"))
+        self.email_password = settings.get("email_password", os.getenv("EMAIL_PASSWORD"))
+        self.imap_port = int(settings.get("imap_port", os.getenv("IMAP_PORT", 993)))
+        self.smtp_port = int(settings.get("smtp_port", os.getenv("SMTP_PORT", 465)))
+        self.attachments_dir = Path(f".digi/clients/{client_id}/attachments")
+
+    def load_mail_settings(self):
+        path = Path(f".digi/clients/{self.client_id}/mail.json")
+        if path.exists():
+            try:
+                return json.loads(path.read_text())
+            except json.JSONDecodeError as e:
+                log_action("Email Agent", f"Ignoring unreadable {path}: {e}", self.client_id)
+        return {}
+
+    def transport(self):
+        return get_mail_transport(
+            self.imap_server, self.imap_port, self.smtp_server, self.smtp_port,
+            self.email_account, self.email_password, client_id=self.client_id
+        )
 
     def run_task(self, task):
         log_action("Email Agent", f"Running task: {task['task']}", self.client_id)
@@ -32,90 +60,187 @@ class EmailAgent:
 
     def process_inbox(self):
         try:
-            mail = imaplib.IMAP4_SSL(self.imap_server, self.imap_port)
-            mail.login(self.email_account, self.email_password)
-            mail.select("inbox")
-            _, messages = mail.search(None, 'UNSEEN')
-
-            for num in messages[0].split():
-                _, data = mail.fetch(num, "(RFC822)")
-                msg = email.message_from_bytes(data[0][1])
-
-                subject = decode_header(msg["Subject"])[0][0]
-                subject = subject.decode() if isinstance(subject, bytes) else subject
-                sender = msg.get("From", "")
-                body = ""
-
-                for part in msg.walk():
-                    if part.get_content_type() == "text/plain" and part.get_payload(decode=True):
-                        body += part.get_payload(decode=True).decode(errors="ignore")
-
-                attachments = []
-                for part in msg.walk():
-                    if part.get_content_disposition() == "attachment":
-                        attachments.append(part.get_filename())
-
-                full_context = "\\n".join([m["content"] for m in self.memory[-5:] if "content" in m])
-                prompt = f"You are DigiMan, an AI email agent. User memory:\\n{full_context}\\n\\nEmail received:\\nSubject: {subject}\\nFrom: {sender}\\nBody: {body}\\n\\nClassify the sender (lead, support, spam, client), assign priority (1-3), summarize content, and suggest a reply."
-
-                response = interpret_command(prompt, self.client_id)
-
-                reply_text = response.get("task", "Thanks for contacting DigiMan.")
-                category = response.get("intent", "unknown")
-                priority = response.get("priority", 2)
-                summary = response.get("summary", "General inquiry")
-
-                lead_score = 1
-                if "demo" in body.lower() or "pricing" in body.lower():
-                    lead_score += 2
-                if "urgent" in subject.lower():
-                    lead_score += 1
-
-                if category == "lead":
-                    update_task_queue("CRM Agent", {
-                        "task": f"Add lead: {sender}",
-                        "email": sender,
-                        "note": summary,
-                        "score": lead_score,
-                        "priority": priority
-                    }, self.client_id)
-
-                elif category == "support":
-                    update_task_queue("Support Agent", {
-                        "task": f"Support needed: {summary}",
-                        "email": sender,
-                        "attachments": attachments,
-                        "priority": priority
-                    }, self.client_id)
-
-                    support_tickets = sum(1 for m in self.memory if "support" in m.get("content", "").lower())
-                    if support_tickets > 3:
-                        update_task_queue("Manager Agent", {
-                            "task": "High support volume detected — investigate workflow bottlenecks.",
-                            "priority": 3
-                        }, self.client_id)
-
-                if category != "spam":
-                    self.send_reply(sender, subject, reply_text)
-
-                log_action("Email Agent", f"Handled {category} from {sender} | Priority: {priority}", self.client_id)
-                increment_metric("tasks_processed")
-
-            mail.logout()
+            transport = self.transport()
+            started = time.monotonic()
+            purge_spool(self.attachments_dir)
+            uids = transport.unseen_uids()
+
+            # Header triage first: spam, auto-replies and bulk mail never have their bodies downloaded
+            wanted, skipped = [], []
+            for header in transport.fetch_headers(uids):
+                verdict = classify_headers(header.headers)
+                if verdict:
+                    skipped.append(header.uid)
+                    log_action("Email Agent", f"Skipped {verdict} from {header.headers.get('From', '')} (headers only)", self.client_id)
+                else:
+                    wanted.append(header)
+            if skipped:
+                transport.mark_seen(skipped)
+
+            page = []
+            for uid, chunks in transport.fetch_streams(wanted):
+                page.append(self.parse_message(uid, chunks))
+                if len(page) >= EMAIL_BATCH_SIZE:
+                    self.finish_page(transport, page)
+                    page = []
+            if page:
+                self.finish_page(transport, page)
+
+            transport.record_sweep(time.monotonic() - started, len(skipped))
+            log_action("Email Agent", f"Inbox sweep: {len(uids)} unseen, {len(skipped)} skipped on headers, "
+                                      f"{transport.messages_per_second()} msg/s", self.client_id)
 
         except Exception as e:
             log_action("Email Agent", f"Processing error: {e}", self.client_id)
 
+    def parse_message(self, uid, chunks):
+        # One streaming pass: text capped, attachments decoded to disk, only metadata kept
+        spool_dir = self.attachments_dir / f"{datetime.now().strftime('%Y%m%d')}_{uid}"
+        msg = ingest_message(chunks, spool_dir)
+        return {
+            "uid": uid,
+            "subject": msg.subject,
+            "sender": msg.sender,
+            "body": msg.body,
+            "truncated": msg.truncated,
+            "attachments": msg.attachments,
+            "spool_dir": spool_dir
+        }
+
+    def memory_context(self):
+        return "\\n".join([m["content"] for m in self.memory[-5:] if "content" in m])
+
+    def finish_page(self, transport, page):
+        handled = []
+        try:
+            self.handle_page(page, handled)
+        finally:
+            # Settle what was queued and answered now, so a failure later in the sweep
+            # (LLM down, IMAP error) can't make the next sweep handle it again
+            if handled:
+                transport.mark_seen(handled)
+                for failed in transport.flush_replies():
+                    log_action("Email Agent", f"Failed to reply to {failed['To']}", self.client_id)
+            # Unhandled messages stay unseen and are spooled afresh on the next sweep
+            for item in page:
+                if item["uid"] not in handled:
+                    remove_spool(item["spool_dir"])
+
+    def handle_page(self, page, handled=None):
+        results = self.classify_batch(page) if len(page) > 1 else [None]
+        for item, result in zip(page, results):
+            if result is None:
+                result = self.classify_one(item)
+            self.handle_email(item, result)
+            if handled is not None:
+                handled.append(item["uid"])
+
+    def classify_batch(self, page):
+        """One structured request for the whole page; entries that don't come back valid are None."""
+        emails = [
+            {"id": i, "subject": item["subject"], "from": item["sender"], "body": item["body"][:EMAIL_BATCH_BODY_CHARS]}
+            for i, item in enumerate(page)
+        ]
+        prompt = f"""You are DigiMan, an AI email agent. User memory:
+{self.memory_context()}
+
+Classify each email below. Respond ONLY with a JSON array containing one object per email:
+[{{"id": 0, "category": "lead|support|spam|client", "priority": 1-3, "summary": "...", "reply": "..."}}]
+
+Emails:
+{json.dumps(emails, separators=(",", ":"))}"""
+        try:
+            response = request_json(prompt, agent="Email Agent")
+        except LLMUnavailable:
+            raise  # no point trying one by one; the page stays unseen for the next sweep
+        except Exception as e:
+            log_action("Email Agent", f"Batch classification failed, classifying {len(page)} emails one by one: {e}", self.client_id)
+            return [None] * len(page)
+
+        results = [None] * len(page)
+        for entry in response if isinstance(response, list) else []:
+            if not isinstance(entry, dict):
+                continue
+            i = entry.get("id")
+            if isinstance(i, int) and 0 <= i < len(page) and entry.get("category") in CATEGORIES:
+                results[i] = self.normalize_result(entry)
+        missing = results.count(None)
+        if missing:
+            log_action("Email Agent", f"Batch response missing {missing}/{len(page)} emails; falling back per message", self.client_id)
+        return results
+
+    def classify_one(self, item):
+        full_context = self.memory_context()
+        prompt = f"You are DigiMan, an AI email agent. User memory:\\n{full_context}\\n\\nEmail received:\\nSubject: {item['subject']}\\nFrom: {item['sender']}\\nBody: {item['body']}\\n\\nClassify the sender (lead, support, spam, client), assign priority (1-3), summarize content, and suggest a reply."
+
+        response = interpret_command(prompt, self.client_id)
+        return self.normalize_result({
+            "reply": response.get("task"),
+            "category": response.get("intent", "unknown"),
+            "priority": response.get("priority", 2),
+            "summary": response.get("summary")
+        })
+
+    def normalize_result(self, entry):
+        try:
+            priority = min(3, max(1, int(entry.get("priority", 2))))
+        except (TypeError, ValueError):
+            priority = 2
+        return {
+            "category": entry.get("category") or "unknown",
+            "priority": priority,
+            "summary": entry.get("summary") or "General inquiry",
+            "reply": entry.get("reply") or "Thanks for contacting DigiMan."
+        }
+
+    def handle_email(self, item, result):
+        subject, sender, body = item["subject"], item["sender"], item["body"]
+        reply_text = result["reply"]
+        category = result["category"]
+        priority = result["priority"]
+        summary = result["summary"]
+
+        lead_score = 1
+        if "demo" in body.lower() or "pricing" in body.lower():
+            lead_score += 2
+        if "urgent" in subject.lower():
+            lead_score += 1
+
+        if category == "lead":
+            update_task_queue("CRM Agent", {
+                "task": f"Add lead: {sender}",
+                "email": sender,
+                "note": summary,
+                "score": lead_score,
+                "priority": priority
+            }, self.client_id)
+
+        elif category == "support":
+            update_task_queue("Support Agent", {
+                "task": f"Support needed: {summary}",
+                "email": sender,
+                "attachments": item["attachments"],
+                "priority": priority
+            }, self.client_id)
+
+            support_tickets = sum(1 for m in self.memory if "support" in m.get("content", "").lower())
+            if support_tickets > 3:
+                update_task_queue("Manager Agent", {
+                    "task": "High support volume detected — investigate workflow bottlenecks.",
+                    "priority": 3
+                }, self.client_id)
+
+        if category != "spam":
+            self.send_reply(sender, subject, reply_text)
+        if category not in ATTACHMENT_CATEGORIES:
+            remove_spool(item["spool_dir"])
+
+        log_action("Email Agent", f"Handled {category} from {sender} | Priority: {priority}", self.client_id)
+        increment_metric("tasks_processed")
+
     def send_reply(self, to_email, subject, reply):
+        # Queued; process_inbox flushes the batch over one pooled SMTP session
         try:
-            smtp = smtplib.SMTP_SSL(self.smtp_server, self.smtp_port)
-            smtp.login(self.email_account, self.email_password)
-            msg = EmailMessage()
-            msg["Subject"] = f"Re: {subject}"
-            msg["From"] = self.email_account
-            msg["To"] = to_email
-            msg.set_content(reply)
-            smtp.send_message(msg)
-            smtp.quit()
+            self.transport().queue_reply(to_email, subject, reply)
         except Exception as e:
             log_action("Email Agent", f"Failed to reply to {to_email}: {e}", self.client_id)
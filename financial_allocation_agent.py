@@ -6,6 +6,8 @@ from core.digiman_core import log_action, update_task_queue
 from core.memory_store import load_memory
 from core.metrics import metrics, increment_metric
 from gpt.gpt_router import interpret_command
+from gpt.prompt_builder import PromptBuilder
+from gpt.structured_output import ALLOCATION_SCHEMA
 
 class FinancialAllocationAgent:
     def __init__(self, client_id=None):
@@ -23,22 +25,19 @@ class FinancialAllocationAgent:
             log_action("Financial Allocation Agent", f"Task error: {e}", self.client_id)
 
     def evaluate_allocation(self, task):
-        context_summary = "\\n".join([m["content"] for m in self.memory[-5:] if "content" in m])
-        prompt = f"""
+        prompt = (
+            PromptBuilder("Financial Allocation Agent")
+            .text("""
 You are the Financial Allocation Agent for an AI-powered autonomous business system.
 
 Objective:
 - Maximize return on resource allocation (RoR, IRR, GRR)
 - Collaborate with AnalystAgent, MonetizationAgent, ManagerAgent
-- Balance stability, scale, and strategic focus
-
-Metrics:
-{json.dumps(self.metrics, indent=2)}
-
-User Memory:
-{context_summary}
-
-Task:
+- Balance stability, scale, and strategic focus""")
+            .context("Metrics", self.metrics, priority=2)
+            .context("User Memory", [m["content"] for m in self.memory[-5:] if "content" in m],
+                     priority=1, render="\n".join)
+            .text(f"""Task:
 {task['task']}
 
 Evaluate:
@@ -60,10 +59,11 @@ Output format:
     "task": "Launch funded campaign with $1200 budget targeting tech founders",
     "priority": 3
   }}
-}}
-"""
+}}""")
+            .build()
+        )
         try:
-            result = interpret_command(prompt, self.client_id)
+            result = interpret_command(prompt, self.client_id, schema=ALLOCATION_SCHEMA)
             decision = result.get("decision", "delay")
             summary = result.get("impact_summary", "No summary available")
             collaborators = ", ".join(result.get("collaboration", []))
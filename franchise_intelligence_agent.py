@@ -5,6 +5,8 @@ from core.digiman_core import log_action, update_task_queue
 from core.memory_store import load_memory
 from core.metrics import increment_metric
 from gpt.gpt_router import interpret_command
+from gpt.prompt_builder import PromptBuilder
+from gpt.structured_output import FRANCHISE_REPORT_SCHEMA
 from datetime import datetime
 from pathlib import Path
 
@@ -30,19 +32,18 @@ class FranchiseIntelligenceAgent:
             log_action("FranchiseIntelligenceAgent", f"Error: {e}", self.client_id)
 
     def analyze_market(self, task):
-        prompt = f"""
+        prompt = (
+            PromptBuilder("Franchise Intelligence Agent")
+            .text("""
 You are DigiMan's FranchiseIntelligenceAgent.
 
 Your mission:
 - Analyze live market data for franchise expansion.
 - Identify competitor density, market demand, pricing trends.
 - Suggest ideal regions or cities for expansion.
-- Collaborate with FranchiseBuilderAgent and AnalystAgent.
-
-Context memory:
-{json.dumps(self.memory[-5:], indent=2)}
-
-Task:
+- Collaborate with FranchiseBuilderAgent and AnalystAgent.""")
+            .context("Context memory", self.memory[-5:], priority=1)
+            .text(f"""Task:
 {task['task']}
 
 Respond in JSON:
@@ -55,10 +56,11 @@ Respond in JSON:
         "task": "Prepare expansion package for Austin, TX.",
         "priority": 2
     }}
-}}
-"""
+}}""")
+            .build()
+        )
         try:
-            result = interpret_command(prompt, self.client_id)
+            result = interpret_command(prompt, self.client_id, schema=FRANCHISE_REPORT_SCHEMA)
             log_action("FranchiseIntelligenceAgent", f"GPT Analysis: {result}", self.client_id)
             self.save_report(result)
 
@@ -96,7 +98,7 @@ Respond in JSON:
 }}
 """
         try:
-            result = interpret_command(prompt, self.client_id)
+            result = interpret_command(prompt, self.client_id, schema=FRANCHISE_REPORT_SCHEMA)
             log_action("FranchiseIntelligenceAgent", f"Forecast generated: {result}", self.client_id)
             self.save_report(result)
 
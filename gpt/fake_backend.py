@@ -0,0 +1,79 @@
+import json
+import time
+import random
+import hashlib
+import threading
+from gpt.structured_output import first_object
+
+# === Fake Completions ===
+# Agents that routing replies pick from when nobody passes a list
+FAKE_AGENTS = ["Sales Agent", "Marketing Agent", "CRM Agent", "Analyst Agent"]
+
+class ServiceUnavailableError(Exception):
+    """Injected failure; the name is in RETRYABLE_ERRORS, so the client retries it like a 503."""
+
+class FakeLLM:
+    """
+    Seeded stand-in for the completion API: plug it in with set_backend(FakeLLM(...)).
+    Every reply is a function of the seed and the prompt, never of call order, so runs
+    with several workers stay reproducible. Prompts that carry a JSON example get that
+    example back (it already fits the schema the caller validates against); routing
+    prompts get a routing decision. Latency is `latency` seconds +/- `jitter` (a fraction),
+    and `failure_rate` of calls raise a retryable error before answering.
+    """
+
+    def __init__(self, seed=0, latency=0.0, jitter=0.0, failure_rate=0.0, agents=None, follow_up_rate=0.0):
+        self.seed = seed
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.agents = list(agents or FAKE_AGENTS)
+        self.follow_up_rate = follow_up_rate
+        self.lock = threading.Lock()
+        self.attempts = {}          # prompt digest -> calls so far, so a retry can succeed
+        self.counters = {"calls": 0, "failures": 0, "tokens": 0}
+
+    def __call__(self, model, messages, temperature, timeout):
+        prompt = str(messages[-1].get("content", "")) if messages else ""
+        digest = hashlib.sha1(f"{self.seed}:{model}:{prompt}".encode("utf-8")).hexdigest()
+        with self.lock:
+            attempt = self.attempts.get(digest, 0)
+            self.attempts[digest] = attempt + 1
+            self.counters["calls"] += 1
+        rng = random.Random(f"{digest}:{attempt}")
+
+        delay = self.latency * (1 + self.jitter * rng.uniform(-1, 1))
+        if delay > 0:
+            time.sleep(min(delay, timeout))
+        if rng.random() < self.failure_rate:
+            with self.lock:
+                self.counters["failures"] += 1
+            raise ServiceUnavailableError(f"Injected failure (attempt {attempt + 1})")
+
+        content = self.reply(prompt, messages, random.Random(digest))
+        tokens = (sum(len(str(m.get("content", ""))) for m in messages) + len(content)) // 4
+        with self.lock:
+            self.counters["tokens"] += tokens
+        return content, tokens
+
+    def reply(self, prompt, messages, rng):
+        system = str(messages[0].get("content", "")) if len(messages) > 1 else ""
+        example = first_object(prompt) if '"agent"' not in system else None
+        if example is not None:
+            return example[1]
+        decision = {
+            "agent": rng.choice(self.agents),
+            "task": f"Handle: {prompt.strip()[:80]}",
+            "priority": rng.randint(1, 3)
+        }
+        if rng.random() < self.follow_up_rate:
+            decision["self_improvement_task"] = {
+                "agent": rng.choice(self.agents),
+                "task": f"Review outcome of: {prompt.strip()[:60]}",
+                "priority": 1
+            }
+        return json.dumps(decision) + "\nReasoning: synthetic routing decision."
+
+    def stats(self):
+        with self.lock:
+            return dict(self.counters)
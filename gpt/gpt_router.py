@@ -1,25 +1,163 @@
 import os
+import copy
 import json
+import time
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
 from datetime import datetime
 from pathlib import Path
 import openai
 
-from core.memory_store import load_memory, save_memory
+from core.memory_store import add_memory_entries
+from core.memory_index import search_memory, MEMORY_TOP_K, MEMORY_TOKEN_BUDGET
 from core.digiman_core import update_task_queue, log_action
+from core.tracing import traced, annotate, propagate
+from gpt.response_cache import response_cache, cache_key, ttl_for_agent
+from gpt.llm_client import llm_client, LLMUnavailable
+from gpt.replay_backend import install_from_env
+from gpt.structured_output import ROUTING_SCHEMA, extract_json, parse_structured
 
 # === Setup ===
 openai.api_key = os.getenv("OPENAI_API_KEY")
 logger = logging.getLogger("GPT_Router")
+install_from_env()  # LLM_BACKEND=record|replay: archive or replay every agent's completions
 
-def retrieve_relevant_memory(memory, query):
-    key_terms = ["campaign", "lead", "client", "sales", "growth"]
-    relevant = [m for m in memory if any(k in m.get("content", "").lower() for k in key_terms)]
-    return relevant[-5:] if relevant else memory[-5:]
+MODEL = "gpt-4o-preview"
+TEMPERATURE = 0.2
+GATHER_WORKERS = int(os.getenv("LLM_GATHER_WORKERS", 16))
+# Each fanned-out call gets this as a deadline: llm_client stops queueing, retrying and
+# waiting on the API at that point, so a timed-out call doesn't keep running in the pool
+GATHER_TIMEOUT = float(os.getenv("LLM_GATHER_TIMEOUT", 90))
+GATHER_GRACE = 1.0
 
-def interpret_command(text_input, client_id="default"):
-    memory = load_memory(client_id)
-    relevant_memory = retrieve_relevant_memory(memory, text_input)
+def llm_saturated():
+    # Callers that fan work out (the concurrent loop) hold back while the LLM client is full
+    return llm_client.saturated()
+
+# === Task Decision Context ===
+# One queued task should cost one routing call. The loop opens a context per task;
+# the first interpret_command() for that task hits the LLM, and the repeat calls made
+# by GPTWrappedAgent and the agent's own run_task() reuse the recorded decision.
+_context_state = threading.local()
+
+class TaskDecisionContext:
+    def __init__(self, client_id, task_text, priority=1):
+        self.client_id = client_id
+        self.task_text = task_text
+        self.priority = priority
+        self.decision = None
+        self.texts = {task_text}
+        self.calls_saved = 0
+        self.lock = threading.Lock()   # gather_commands shares one context across threads
+
+    def record(self, decision):
+        self.decision = decision
+        if isinstance(decision.get("task"), str):
+            self.texts.add(decision["task"])
+
+    def lookup(self, text_input, client_id):
+        if self.decision is None or client_id != self.client_id or text_input not in self.texts:
+            return None
+        with self.lock:
+            self.calls_saved += 1
+        return copy.deepcopy(self.decision)
+
+    def __enter__(self):
+        self._previous = getattr(_context_state, "current", None)
+        _context_state.current = self
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _context_state.current = self._previous
+        return False
+
+def current_task_context():
+    return getattr(_context_state, "current", None)
+
+def run_in_context(context, fn, *args, deadline=None, **kwargs):
+    # Worker threads see the caller's task context (cached routing decision, LLM priority)
+    # and, for gathered calls, the deadline every completion they make must finish by
+    previous = getattr(_context_state, "current", None), getattr(_context_state, "deadline", None)
+    _context_state.current, _context_state.deadline = context, deadline
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        _context_state.current, _context_state.deadline = previous
+
+def retrieve_relevant_memory(client_id, query, k=MEMORY_TOP_K, token_budget=MEMORY_TOKEN_BUDGET):
+    # BM25 top-k over the client's memory; the most recent entries when nothing matches
+    return search_memory(client_id, query, k, token_budget)
+
+def raw_reply(content):
+    return content
+
+@traced("llm.completion")
+def chat_completion(messages, agent=None, model=MODEL, temperature=TEMPERATURE, parse=raw_reply):
+    """
+    parse(reply) for one completion, through the response cache (bypassed while
+    LLM_BACKEND records or replays, see gpt.replay_backend). A reply is cached only
+    after parse accepts it, and a cached reply that parse rejects is dropped and asked for
+    again. The key covers every message, retrieved memory included: interpret_command
+    appends to the client's memory on each call, so a routing prompt repeats (and hits)
+    only while its retrieved memory is unchanged, whereas request_json prompts carry no
+    memory and hit for the whole TTL.
+    """
+    ttl = ttl_for_agent(agent) if llm_client.caching() else 0
+    key = cache_key(model, temperature, messages) if ttl > 0 else None
+    if key:
+        cached = response_cache.get(key)
+        if cached is not None:
+            try:
+                result = parse(cached)
+            except Exception as e:
+                logger.warning(f"Dropping cached reply that no longer parses: {e}")
+                response_cache.discard(key)
+            else:
+                annotate(cache="hit")
+                logger.info("LLM cache hit for %s", agent or "router")
+                return result
+
+    # Calls made while a task runs queue for the LLM at that task's priority
+    context = current_task_context()
+    priority = context.priority if context is not None else 1
+    deadline = getattr(_context_state, "deadline", None)
+    content = llm_client.complete(messages, model, temperature, priority=priority, deadline=deadline)
+    result = parse(content)
+    if key:
+        response_cache.put(key, content, ttl)
+    return result
+
+def request_json(prompt, agent=None, system_prompt=None):
+    """
+    One completion whose answer is raw JSON in the caller's own shape (no routing,
+    memory or task queueing). Raises ValueError when nothing parses.
+    """
+    messages = []
+    if system_prompt:
+        messages.append({"role": "system", "content": system_prompt})
+    messages.append({"role": "user", "content": prompt})
+    def parse(content):
+        logger.info("GPT Raw JSON Response: %s", content)
+        return extract_json(content)
+
+    return chat_completion(messages, agent=agent, parse=parse)
+
+@traced("gpt.interpret_command")
+def interpret_command(text_input, client_id="default", agent=None, schema=None):
+    """
+    Route text_input through the LLM. The reply's first JSON object is validated against
+    `schema` (the routing shape by default; agents asking for their own JSON pass theirs).
+    """
+    annotate(client=client_id, caller=agent)
+    context = current_task_context()
+    if context is not None:
+        cached = context.lookup(text_input, client_id)
+        if cached is not None:
+            annotate(decision="reused")
+            return cached
+
+    relevant_memory = retrieve_relevant_memory(client_id, text_input)
 
     business_phase = "growth"
     seasonality = "Q3 planning"
@@ -51,49 +189,91 @@ AFTER the JSON, provide a short reasoning for your decision.
     messages.append({"role": "user", "content": text_input})
 
     try:
-        response = openai.ChatCompletion.create(
-            model="gpt-4o-preview",
-            messages=messages,
-            temperature=0.2
-        )
-        content = response.choices[0].message["content"]
-        logger.info("GPT Raw Response: %s", content)
-
-        split = content.split('}', 1)
-        json_part = split[0] + "}" if "}" in split[0] else content
-        reasoning = split[1].strip() if len(split) > 1 else ""
-
-        parsed = json.loads(json_part)
-        required_keys = {"agent", "task", "priority"}
-        if required_keys.issubset(parsed.keys()):
-            memory.append({"role": "user", "content": text_input})
-            memory.append({"role": "assistant", "content": json_part})
-            save_memory(client_id, memory)
-
-            log_path = Path(f".digi/clients/{client_id}/gpt_reasons.log")
-            log_path.parent.mkdir(parents=True, exist_ok=True)
-            with open(log_path, "a") as f:
-                f.write(f"[{datetime.now()}] INPUT: {text_input}\nDECISION: {json_part}\nREASONING: {reasoning}\n\n")
-
-            if "self_improvement_task" in parsed:
-                update_task_queue(
-                    parsed["self_improvement_task"]["agent"],
-                    parsed["self_improvement_task"],
-                    client_id
-                )
-                log_action(
-                    "GPT Router",
-                    f"Queued self-improvement task: {parsed['self_improvement_task']}",
-                    client_id
-                )
-            return parsed
-        else:
-            raise ValueError("Missing required keys in GPT response")
+        def parse(content):
+            logger.info("GPT Raw Response: %s", content)
+            return parse_structured(content, schema or ROUTING_SCHEMA, agent)
+
+        parsed, json_part, reasoning = chat_completion(messages, agent=agent, parse=parse)
+        add_memory_entries(client_id, [("user", text_input), ("assistant", json_part)])
+
+        log_path = Path(f".digi/clients/{client_id}/gpt_reasons.log")
+        log_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(log_path, "a") as f:
+            f.write(f"[{datetime.now()}] INPUT: {text_input}\nDECISION: {json_part}\nREASONING: {reasoning}\n\n")
+
+        if "self_improvement_task" in parsed:
+            update_task_queue(
+                parsed["self_improvement_task"]["agent"],
+                parsed["self_improvement_task"],
+                client_id
+            )
+            log_action(
+                "GPT Router",
+                f"Queued self-improvement task: {parsed['self_improvement_task']}",
+                client_id
+            )
 
+    except LLMUnavailable:
+        # Not a routing answer: let the caller retry the task later instead of filing a fallback
+        raise
     except Exception as e:
         logger.error(f"GPT interpretation error: {e}")
-        return {
+        parsed = {
             "agent": "Manager Agent",
             "task": f"Unable to interpret: {text_input}",
             "priority": 1
         }
+
+    if context is not None and context.decision is None and text_input == context.task_text:
+        context.record(parsed)
+    return copy.deepcopy(parsed)
+
+# === Concurrent Fan-Out ===
+_gather_pool = None
+_gather_pool_lock = threading.Lock()
+
+def gather_pool():
+    global _gather_pool
+    with _gather_pool_lock:
+        if _gather_pool is None:
+            _gather_pool = ThreadPoolExecutor(max_workers=GATHER_WORKERS, thread_name_prefix="digiman-gather")
+        return _gather_pool
+
+def gather_commands(requests, client_id="default", timeout=GATHER_TIMEOUT, return_exceptions=False):
+    """
+    Run several independent interpret_command() calls at once and return their results in
+    request order. Each request is a prompt or a dict with "prompt" and optional "agent",
+    "schema" and "timeout". A call still running at its timeout yields TimeoutError; with
+    return_exceptions the error takes that call's slot, otherwise the first one is raised.
+    The timeout is also handed to the LLM client as a deadline, so a call that runs out
+    of time stops with LLMUnavailable rather than finishing unobserved in the background.
+    """
+    context = current_task_context()
+    pool = gather_pool()
+    started = time.monotonic()
+    futures = []
+    for request in requests:
+        request = request if isinstance(request, dict) else {"prompt": request}
+        # Calls run side by side, so each deadline counts from submission
+        call_timeout = request.get("timeout", timeout)
+        future = pool.submit(
+            propagate(run_in_context), context, interpret_command, request["prompt"], client_id,
+            agent=request.get("agent"), schema=request.get("schema"), deadline=started + call_timeout
+        )
+        futures.append((future, call_timeout))
+
+    results = []
+    for future, call_timeout in futures:
+        try:
+            # A moment's grace past the deadline, so the call's own LLMUnavailable wins the race
+            results.append(future.result(timeout=max(0.0, call_timeout + GATHER_GRACE - (time.monotonic() - started))))
+        except FutureTimeout:
+            future.cancel()
+            results.append(TimeoutError(f"LLM call exceeded {call_timeout:.0f}s"))
+        except Exception as e:
+            results.append(e)
+    if not return_exceptions:
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
+    return results
@@ -0,0 +1,316 @@
+import os
+import time
+import heapq
+import random
+import logging
+import itertools
+import threading
+from collections import deque
+import openai
+
+logger = logging.getLogger("GPT_LLMClient")
+
+# === Client Settings ===
+# OPENAI_API_BASE (read by the openai package) points every agent at a local fake
+# completion server; set_backend() swaps the call out entirely inside one process.
+LLM_RPM = float(os.getenv("LLM_RPM", 500))                       # requests per minute
+LLM_TPM = float(os.getenv("LLM_TPM", 90000))                     # tokens per minute
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 8))
+LLM_COMPLETION_TOKENS = int(os.getenv("LLM_COMPLETION_TOKENS", 400))  # reply size assumed before usage is known
+LLM_REQUEST_TIMEOUT = float(os.getenv("LLM_REQUEST_TIMEOUT", 60))
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", 120))   # longest a caller waits for a slot
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 4))
+LLM_RETRY_BASE = float(os.getenv("LLM_RETRY_BASE", 0.5))
+LLM_RETRY_CAP = float(os.getenv("LLM_RETRY_CAP", 20))
+LLM_BREAKER_THRESHOLD = int(os.getenv("LLM_BREAKER_THRESHOLD", 5))  # consecutive failures before opening
+LLM_BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", 30))
+
+# Transient errors worth another attempt, matched by name so any openai version works
+RETRYABLE_ERRORS = {
+    "RateLimitError", "Timeout", "APIError", "APIConnectionError",
+    "ServiceUnavailableError", "TryAgain", "TimeoutError", "ConnectionError"
+}
+
+class LLMUnavailable(Exception):
+    """The completion could not be made (breaker open, queue timeout or retries spent)."""
+
+def estimate_tokens(messages):
+    return sum(len(str(m.get("content", ""))) for m in messages) // 4 + 4 * len(messages)
+
+def is_retryable(error):
+    return any(cls.__name__ in RETRYABLE_ERRORS for cls in type(error).__mro__)
+
+def retry_after(error):
+    headers = getattr(error, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after") or headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+def openai_backend(model, messages, temperature, timeout):
+    response = openai.ChatCompletion.create(
+        model=model,
+        messages=messages,
+        temperature=temperature,
+        request_timeout=timeout
+    )
+    usage = getattr(response, "usage", None) or {}
+    return response.choices[0].message["content"], usage.get("total_tokens")
+
+class TokenBucket:
+    """Refills `per_minute` units evenly over a minute; holds at most one minute's worth."""
+
+    def __init__(self, per_minute):
+        self.capacity = max(float(per_minute), 1.0)
+        self.rate = self.capacity / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_for(self, amount, now):
+        """Seconds until `amount` fits (0 if it fits now). Requests larger than the bucket wait for a full one."""
+        self.refill(now)
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount):
+        self.level -= amount
+
+    def adjust(self, amount):
+        # Settle an estimate against real usage; the level may go negative and pay it back
+        self.level = min(self.capacity, self.level - amount)
+
+class CircuitBreaker:
+    """closed -> open after `threshold` consecutive failures -> half-open probe after `cooldown`."""
+
+    def __init__(self, threshold=LLM_BREAKER_THRESHOLD, cooldown=LLM_BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        return "half-open" if time.monotonic() - self.opened_at >= self.cooldown else "open"
+
+    def allow(self):
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half-open" and not self.probing:
+            self.probing = True
+            return True
+        return False
+
+    def success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    def failure(self):
+        self.failures += 1
+        if self.probing or self.failures >= self.threshold:
+            if self.opened_at is None or self.probing:
+                logger.warning(f"LLM circuit opened after {self.failures} consecutive failures")
+            self.opened_at = time.monotonic()
+        self.probing = False
+
+class LLMClient:
+    """
+    The one path to the completion API for every agent. Callers wait in a priority queue
+    (priority 3 before 2 before 1, FIFO within a level) until the request and token
+    buckets and a concurrency slot all allow them; transient errors retry with jittered
+    exponential backoff, and a run of failures opens the breaker so callers fail fast.
+    """
+
+    def __init__(self, rpm=LLM_RPM, tpm=LLM_TPM, max_concurrency=LLM_MAX_CONCURRENCY,
+                 max_retries=LLM_MAX_RETRIES, backend=None):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backend = backend or openai_backend
+        self.breaker = CircuitBreaker()
+        self.cond = threading.Condition()
+        self.waiting = []           # heap of (-priority, seq)
+        self.seq = itertools.count()
+        self.in_flight = 0
+        self.paused_until = 0.0     # set from Retry-After on a 429
+        self.usage_window = deque() # (monotonic time, tokens) over the last minute
+        self.counters = {
+            "requests": 0, "retries": 0, "rate_limited": 0, "failures": 0,
+            "rejected": 0, "tokens": 0, "wait_seconds": 0.0
+        }
+
+    # === Admission ===
+    def acquire(self, estimate, priority=1, timeout=LLM_QUEUE_TIMEOUT):
+        try:
+            priority = int(priority or 1)
+        except (TypeError, ValueError):
+            priority = 1
+        ticket = (-priority, next(self.seq))
+        started = time.monotonic()
+        deadline = started + timeout
+        with self.cond:
+            if not self.breaker.allow():
+                self.counters["rejected"] += 1
+                raise LLMUnavailable(f"LLM circuit {self.breaker.state}")
+            probe = self.breaker.probing
+            heapq.heappush(self.waiting, ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    wait = self._admission_wait(ticket, estimate, now)
+                    if wait == 0:
+                        break
+                    if now >= deadline:
+                        self.counters["rejected"] += 1
+                        raise LLMUnavailable(f"Waited {timeout:.0f}s for LLM capacity")
+                    self.cond.wait(min(wait, deadline - now))
+            except BaseException:
+                self.waiting.remove(ticket)
+                heapq.heapify(self.waiting)
+                if probe:
+                    self.breaker.probing = False
+                self.cond.notify_all()
+                raise
+            heapq.heappop(self.waiting)
+            self.requests.take(1)
+            self.tokens.take(estimate)
+            self.in_flight += 1
+            self.counters["wait_seconds"] += time.monotonic() - started
+            self.cond.notify_all()  # the next waiter is now at the head
+
+    def _admission_wait(self, ticket, estimate, now):
+        """0 when `ticket` may run now, else a hint for how long to sleep."""
+        if self.waiting[0] != ticket:
+            return 1.0  # woken by notify_all when the head moves
+        if self.in_flight >= self.max_concurrency:
+            return 1.0
+        if now < self.paused_until:
+            return self.paused_until - now
+        if not getattr(self.backend, "rate_limited", True):
+            return 0  # replaying an archive: no API quota to protect
+        return max(self.requests.wait_for(1, now), self.tokens.wait_for(estimate, now))
+
+    def caching(self):
+        """False while the backend is recording or replaying: every call must reach it."""
+        return getattr(self.backend, "use_response_cache", True)
+
+    def release(self, estimate, used_tokens):
+        with self.cond:
+            self.in_flight -= 1
+            if used_tokens is not None:
+                self.tokens.adjust(used_tokens - estimate)
+            tokens = used_tokens if used_tokens is not None else estimate
+            now = time.monotonic()
+            self.usage_window.append((now, tokens))
+            self.counters["tokens"] += tokens
+            self.cond.notify_all()
+
+    # === Calls ===
+    def complete(self, messages, model, temperature, priority=1, deadline=None):
+        """
+        The completion text. `deadline` (a time.monotonic() value) bounds the whole call:
+        queueing, each request and the retry sleeps; past it the call raises LLMUnavailable.
+        """
+        estimate = estimate_tokens(messages) + LLM_COMPLETION_TOKENS
+        attempt = 0
+        while True:
+            queue_timeout, request_timeout = LLM_QUEUE_TIMEOUT, LLM_REQUEST_TIMEOUT
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise LLMUnavailable(f"LLM call ran out of time after {attempt} attempt(s)")
+                queue_timeout, request_timeout = min(queue_timeout, remaining), min(request_timeout, remaining)
+            self.acquire(estimate, priority, timeout=queue_timeout)
+            if deadline is not None:
+                request_timeout = min(request_timeout, max(0.1, deadline - time.monotonic()))
+            used = None
+            try:
+                content, used = self.backend(model, messages, temperature, request_timeout)
+            except Exception as e:
+                self.release(estimate, 0)
+                if not self._failed(e, attempt, deadline):
+                    if not is_retryable(e):
+                        raise
+                    raise LLMUnavailable(f"LLM call failed after {attempt + 1} attempt(s): {e}") from e
+                attempt += 1
+                continue
+            self.release(estimate, used)
+            with self.cond:
+                self.breaker.success()
+                self.counters["requests"] += 1
+            return content
+
+    def _failed(self, error, attempt, deadline=None):
+        """Record a failed attempt; sleep and return True if it should be retried."""
+        retryable = is_retryable(error)
+        delay = min(LLM_RETRY_CAP, LLM_RETRY_BASE * 2 ** attempt)
+        delay = random.uniform(0, delay)  # full jitter spreads out callers that failed together
+        with self.cond:
+            self.counters["failures"] += 1
+            if not retryable:
+                # The API answered (bad request, auth...): not an outage, and not worth retrying
+                self.breaker.success()
+                return False
+            self.breaker.failure()
+            if type(error).__name__ == "RateLimitError":
+                self.counters["rate_limited"] += 1
+                hinted = retry_after(error)
+                if hinted:
+                    delay = hinted
+                    self.paused_until = max(self.paused_until, time.monotonic() + hinted)
+            out_of_time = deadline is not None and time.monotonic() + delay >= deadline
+            if attempt >= self.max_retries or self.breaker.state == "open" or out_of_time:
+                logger.error(f"LLM call failed (attempt {attempt + 1}): {error}")
+                return False
+            self.counters["retries"] += 1
+        logger.warning(f"LLM call failed (attempt {attempt + 1}), retrying in {delay:.2f}s: {error}")
+        time.sleep(delay)
+        return True
+
+    def retry_delay(self):
+        """Seconds until a new call could be admitted: the breaker's cooldown or a Retry-After pause."""
+        with self.cond:
+            now = time.monotonic()
+            delay = self.paused_until - now
+            if self.breaker.opened_at is not None:
+                delay = max(delay, self.breaker.opened_at + self.breaker.cooldown - now)
+            return max(0.0, delay)
+
+    # === Reporting ===
+    def saturated(self):
+        with self.cond:
+            return self.in_flight >= self.max_concurrency or bool(self.waiting)
+
+    def stats(self):
+        with self.cond:
+            now = time.monotonic()
+            while self.usage_window and now - self.usage_window[0][0] > 60:
+                self.usage_window.popleft()
+            stats = dict(self.counters)
+            stats.update({
+                "wait_seconds": round(self.counters["wait_seconds"], 3),
+                "tokens_per_minute": sum(tokens for _, tokens in self.usage_window),
+                "requests_per_minute": len(self.usage_window),
+                "queue_depth": len(self.waiting),
+                "in_flight": self.in_flight,
+                "breaker": self.breaker.state
+            })
+        backend_stats = getattr(self.backend, "stats", None)
+        if backend_stats is not None:
+            stats["backend"] = backend_stats()
+        return stats
+
+llm_client = LLMClient()
+
+def set_backend(backend):
+    """Route completions through backend(model, messages, temperature, timeout) -> (content, total_tokens)."""
+    llm_client.backend = backend or openai_backend
@@ -0,0 +1,157 @@
+import os
+import json
+import logging
+from core.memory_index import estimate_tokens
+
+try:
+    import tiktoken
+except ImportError:  # optional: fall back to the ~4 characters per token heuristic
+    tiktoken = None
+
+logger = logging.getLogger("GPT_PromptBuilder")
+
+# === Prompt Budgets ===
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", 1500))
+
+# Tokens a prompt may use, by the agent that builds it
+AGENT_PROMPT_BUDGETS = {
+    "Financial Allocation Agent": 1200,
+    "Franchise Intelligence Agent": 1000,
+    "Support Agent": 900,
+}
+
+_encoding = None
+
+def count_tokens(text):
+    global _encoding
+    if tiktoken is not None and _encoding is None:
+        try:
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception:  # encoding files not cached and no network
+            _encoding = False
+    if _encoding:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return estimate_tokens(text)
+
+def budget_for_agent(agent):
+    return AGENT_PROMPT_BUDGETS.get(agent, PROMPT_TOKEN_BUDGET)
+
+def compact_json(value):
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False, default=str)
+
+def prune(value):
+    """Drop None and empty containers; they cost tokens and tell the model nothing."""
+    if isinstance(value, dict):
+        pruned = {k: prune(v) for k, v in value.items()}
+        return {k: v for k, v in pruned.items() if v not in (None, {}, [], "")}
+    if isinstance(value, list):
+        return [v for v in (prune(v) for v in value) if v not in (None, {}, [], "")]
+    return value
+
+def shrink(value, keep):
+    """
+    Cap every container at `keep` items: lists keep their newest entries, dicts their
+    largest numeric values (or their first keys), with a marker for what was cut.
+    """
+    if isinstance(value, list):
+        cut = len(value) - keep
+        items = [shrink(v, keep) for v in value[-keep:]] if cut > 0 else [shrink(v, keep) for v in value]
+        return ([f"... {cut} earlier omitted"] if cut > 0 else []) + items
+    if isinstance(value, dict):
+        items = list(value.items())
+        cut = len(items) - keep
+        if cut > 0:
+            if all(isinstance(v, (int, float)) for _, v in items):
+                items = sorted(items, key=lambda kv: -abs(kv[1]))
+            items = items[:keep]
+        shrunk = {k: shrink(v, keep) for k, v in items}
+        if cut > 0:
+            shrunk["..."] = f"{cut} more omitted"
+        return shrunk
+    if isinstance(value, str) and len(value) > keep * 40:
+        return value[:keep * 40] + "..."
+    return value
+
+def widest(value):
+    if isinstance(value, (list, dict)):
+        return max([len(value)] + [widest(v) for v in (value.values() if isinstance(value, dict) else value)])
+    if isinstance(value, str):
+        return len(value) // 40 + 1
+    return 1
+
+class PromptSection:
+    def __init__(self, text=None, title=None, data=None, priority=None, render=None):
+        self.title = title
+        self.data = data
+        self.priority = priority    # None: always kept; otherwise lower values are cut first
+        self.render_data = render or compact_json
+        self.text = text if text is not None else self.render(prune(data))
+        self.raw_text = text if text is not None else self.render(data, indent=2)
+
+    def render(self, data, indent=None):
+        body = json.dumps(data, indent=2, default=str) if indent else self.render_data(data)
+        return f"{self.title}:\n{body}" if self.title else body
+
+class PromptBuilder:
+    """
+    Assembles a prompt from fixed text and context sections and keeps it within the
+    agent's token budget: context is compacted JSON from the start, and while the prompt
+    is over budget the lowest-priority section is shrunk (oldest list items and smallest
+    dict entries go first) and, if that is not enough, dropped.
+    """
+
+    def __init__(self, agent, budget=None):
+        self.agent = agent
+        self.budget = budget or budget_for_agent(agent)
+        self.sections = []
+
+    def text(self, text):
+        self.sections.append(PromptSection(text=text.strip("\n")))
+        return self
+
+    def context(self, title, data, priority=1, render=None):
+        self.sections.append(PromptSection(title=title, data=data, priority=priority, render=render))
+        return self
+
+    def join(self, texts):
+        return "\n\n".join(t for t in texts if t)
+
+    def build(self):
+        before = count_tokens(self.join(s.raw_text for s in self.sections))
+        dropped = []
+        size = count_tokens(self.join(s.text for s in self.sections))
+        cuttable = sorted((s for s in self.sections if s.priority is not None), key=lambda s: s.priority)
+        for section in cuttable:
+            if size <= self.budget:
+                break
+            size = self.fit(section, size)
+            if size > self.budget:
+                section.text = ""
+                dropped.append(section.title)
+                size = count_tokens(self.join(s.text for s in self.sections))
+
+        prompt = "\n" + self.join(s.text for s in self.sections) + "\n"
+        logger.info(
+            f"{self.agent} prompt: {before} -> {size} tokens (budget {self.budget})"
+            + (f", dropped {', '.join(dropped)}" if dropped else "")
+        )
+        return prompt
+
+    def fit(self, section, size):
+        """Shrink one section as little as needed; returns the new prompt size."""
+        data = prune(section.data)
+        low, high = 1, widest(data)
+        best = None
+        while low <= high:
+            keep = (low + high) // 2
+            section.text = section.render(shrink(data, keep))
+            candidate = count_tokens(self.join(s.text for s in self.sections))
+            if candidate <= self.budget:
+                best, low = (keep, candidate), keep + 1
+            else:
+                high = keep - 1
+        if best is None:
+            section.text = section.render(shrink(data, 1))
+            return count_tokens(self.join(s.text for s in self.sections))
+        section.text = section.render(shrink(data, best[0]))
+        return best[1]
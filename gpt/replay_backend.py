@@ -0,0 +1,174 @@
+import os
+import gzip
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from gpt.response_cache import cache_key, normalize_messages
+from gpt.llm_client import openai_backend, set_backend
+
+logger = logging.getLogger("GPT_ReplayBackend")
+
+# === Replay Settings ===
+# LLM_BACKEND=record wraps the live API and archives every completion; LLM_BACKEND=replay
+# answers from the archive, sleeping the recorded latency times LLM_REPLAY_LATENCY_SCALE
+# (0.1 replays a day of traffic at 10x speed, 0 as fast as the loop can go).
+# Both modes bypass the response cache: a cached answer would never reach the recorder,
+# and in a replay it would stand in for the recorded one and skew the timings. Replay
+# also skips the request and token buckets (nothing is sent to the API) unless misses go
+# to the live API; the concurrency cap still applies, since it models worker contention.
+LLM_BACKEND = os.getenv("LLM_BACKEND", "openai").lower()
+LLM_ARCHIVE_PATH = Path(os.getenv("LLM_ARCHIVE_PATH", ".digi/llm_archive.jsonl.gz"))
+LLM_REPLAY_LATENCY_SCALE = float(os.getenv("LLM_REPLAY_LATENCY_SCALE", 1.0))
+LLM_REPLAY_ON_MISS = os.getenv("LLM_REPLAY_ON_MISS", "error").lower()   # error | live
+
+class ReplayMiss(Exception):
+    """No recorded completion for this prompt (not retryable: the archive won't change)."""
+
+def prompt_key(messages):
+    """Looser key: the last message alone, for prompts whose retrieved memory drifted since recording."""
+    last = normalize_messages(messages[-1:])
+    return hashlib.sha256(json.dumps(last, sort_keys=True).encode("utf-8")).hexdigest()
+
+def read_archive(path):
+    """Records from a gzip JSONL archive; a member cut short by a crash ends the read, not the run."""
+    records = []
+    path = Path(path)
+    if not path.exists():
+        return records
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    records.append(json.loads(line))
+    except (EOFError, OSError, ValueError) as e:
+        logger.warning(f"Stopped reading {path} after {len(records)} records: {e}")
+    return records
+
+class RecordingBackend:
+    """
+    Calls `backend` and appends (prompt hashes, response, latency, tokens) to the archive.
+    Each record is its own gzip member written with one append, so several processes can
+    record into the same file and a crash loses at most the record being written.
+    """
+    use_response_cache = False
+    rate_limited = True
+
+    def __init__(self, path=LLM_ARCHIVE_PATH, backend=None):
+        self.path = Path(path)
+        self.backend = backend or openai_backend
+        self.lock = threading.Lock()
+        self.counters = {"recorded": 0, "record_errors": 0}
+
+    def __call__(self, model, messages, temperature, timeout):
+        started = time.perf_counter()
+        content, tokens = self.backend(model, messages, temperature, timeout)
+        record = {
+            "key": cache_key(model, temperature, messages),
+            "prompt_key": prompt_key(messages),
+            "model": model,
+            "response": content,
+            "tokens": tokens,
+            "latency": round(time.perf_counter() - started, 4),
+            "recorded_at": datetime.now().isoformat()
+        }
+        self.write(record)
+        return content, tokens
+
+    def write(self, record):
+        member = gzip.compress((json.dumps(record) + "\n").encode("utf-8"))
+        with self.lock:
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                with open(self.path, "ab") as f:
+                    f.write(member)
+                self.counters["recorded"] += 1
+            except OSError as e:
+                # Recording is best effort: the caller still gets its completion
+                self.counters["record_errors"] += 1
+                logger.error(f"Failed to record completion to {self.path}: {e}")
+
+    def stats(self):
+        with self.lock:
+            return dict(self.counters, archive=str(self.path))
+
+class ReplayBackend:
+    """
+    Answers completions from an archive: an exact match on model, temperature and every
+    message first, then the last message alone. A prompt recorded several times replays
+    its answers in order and then repeats the last one. Misses raise ReplayMiss, or go to
+    `fallback` (a live or fake backend) when one is given.
+    """
+    use_response_cache = False
+
+    def __init__(self, path=LLM_ARCHIVE_PATH, latency_scale=LLM_REPLAY_LATENCY_SCALE, fallback=None):
+        self.path = Path(path)
+        self.latency_scale = latency_scale
+        self.fallback = fallback
+        self.rate_limited = fallback is openai_backend
+        self.lock = threading.Lock()
+        self.exact = {}     # key -> deque of records
+        self.loose = {}     # prompt_key -> deque of records
+        self.counters = {"hits": 0, "loose_hits": 0, "misses": 0, "replayed_latency": 0.0}
+        records = read_archive(self.path)
+        for record in records:
+            self.exact.setdefault(record["key"], deque()).append(record)
+            self.loose.setdefault(record.get("prompt_key"), deque()).append(record)
+        logger.info(f"Loaded {len(records)} recorded completions from {self.path}")
+
+    def __call__(self, model, messages, temperature, timeout):
+        with self.lock:
+            record = self._take(self.exact, cache_key(model, temperature, messages))
+            kind = "hits"
+            if record is None:
+                record = self._take(self.loose, prompt_key(messages))
+                kind = "loose_hits"
+            if record is None:
+                self.counters["misses"] += 1
+            else:
+                self.counters[kind] += 1
+        if record is None:
+            if self.fallback is None:
+                raise ReplayMiss(f"No recorded completion for prompt {prompt_key(messages)[:12]}")
+            return self.fallback(model, messages, temperature, timeout)
+
+        delay = (record.get("latency") or 0) * self.latency_scale
+        if delay > 0:
+            time.sleep(min(delay, timeout))
+        with self.lock:
+            self.counters["replayed_latency"] += delay
+        return record["response"], record.get("tokens")
+
+    def _take(self, index, key):
+        answers = index.get(key)
+        if not answers:
+            return None
+        return answers.popleft() if len(answers) > 1 else answers[0]
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.counters, archive=str(self.path), prompts=len(self.exact))
+            stats["replayed_latency"] = round(stats["replayed_latency"], 3)
+            return stats
+
+def backend_from_env():
+    """The backend LLM_BACKEND asks for, or None for the live API."""
+    if LLM_BACKEND == "record":
+        return RecordingBackend(LLM_ARCHIVE_PATH)
+    if LLM_BACKEND == "replay":
+        fallback = openai_backend if LLM_REPLAY_ON_MISS == "live" else None
+        return ReplayBackend(LLM_ARCHIVE_PATH, LLM_REPLAY_LATENCY_SCALE, fallback)
+    if LLM_BACKEND != "openai":
+        logger.warning(f"Unknown LLM_BACKEND '{LLM_BACKEND}', using the live API")
+    return None
+
+def install_from_env():
+    backend = backend_from_env()
+    if backend is not None:
+        set_backend(backend)
+        logger.info(f"LLM backend: {LLM_BACKEND} ({LLM_ARCHIVE_PATH})")
+    return backend
@@ -0,0 +1,178 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+logger = logging.getLogger("GPT_ResponseCache")
+
+# === Cache Settings ===
+CACHE_DIR = Path(".digi/llm_cache")
+CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "True").lower() == "true"
+MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", 2000))
+DEFAULT_TTL = int(os.getenv("LLM_CACHE_DEFAULT_TTL", 3600))
+# The server, the loop and tenant workers share the directory: each process re-reads it
+# this often so MAX_ENTRIES holds for the directory, not just for its own writes
+RESCAN_SECONDS = float(os.getenv("LLM_CACHE_RESCAN_SECONDS", 60))
+
+# Seconds a completion stays valid, by the agent that asked for it (0 disables caching)
+AGENT_TTLS = {
+    "Scout Agent": 7 * 24 * 3600,
+    "Monetization Agent": 24 * 3600,
+    "Manager Agent": 6 * 3600,
+    "Marketing Agent": 6 * 3600,
+    "Sales Agent": 3600,
+    "Email Agent": 0,
+    "Support Agent": 0,
+}
+
+cache_stats = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0, "writes": 0}
+
+def ttl_for_agent(agent):
+    if not CACHE_ENABLED:
+        return 0
+    return AGENT_TTLS.get(agent, DEFAULT_TTL)
+
+def normalize_messages(messages):
+    return [
+        {"role": m.get("role", "user"), "content": " ".join(str(m.get("content", "")).split())}
+        for m in messages
+    ]
+
+def cache_key(model, temperature, messages):
+    payload = json.dumps(
+        {"model": model, "temperature": temperature, "messages": normalize_messages(messages)},
+        sort_keys=True,
+        separators=(",", ":")
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class ResponseCache:
+    """
+    Content-addressed completion cache. One small file per entry under .digi/llm_cache/,
+    so a put never rewrites the rest of the cache. File mtime doubles as the LRU clock,
+    which every process sharing the directory sees, so any of them can evict for all.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, max_entries=MAX_ENTRIES, rescan_seconds=RESCAN_SECONDS):
+        self.cache_dir = Path(cache_dir)
+        self.max_entries = max_entries
+        self.rescan_seconds = rescan_seconds
+        self.lock = threading.Lock()
+        self.index = OrderedDict()  # key -> None, least recently used first
+        self.loaded = False
+        self.last_scan = 0.0
+
+    def _load_index(self):
+        if not self.loaded:
+            self._scan()
+            self.loaded = True
+
+    def _scan(self):
+        """Rebuild the index from the directory, picking up other processes' entries."""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        entries = []
+        for path in self.cache_dir.glob("*.json"):
+            try:
+                entries.append((path.stat().st_mtime_ns, path.stem))
+            except FileNotFoundError:
+                continue  # evicted by another process mid-scan
+        entries.sort()
+        self.index = OrderedDict((key, None) for _, key in entries)
+        # Temp files a crashed writer left behind
+        stale = time.time() - 3600
+        for path in self.cache_dir.glob(".*.tmp"):
+            try:
+                if path.stat().st_mtime < stale:
+                    path.unlink()
+            except FileNotFoundError:
+                continue
+        self.last_scan = time.monotonic()
+
+    def _path(self, key):
+        return self.cache_dir / f"{key}.json"
+
+    def get(self, key):
+        with self.lock:
+            self._load_index()
+            path = self._path(key)
+            try:
+                entry = json.loads(path.read_text())
+            except (FileNotFoundError, json.JSONDecodeError):
+                self.index.pop(key, None)
+                cache_stats["misses"] += 1
+                return None
+
+            if entry.get("expires_at", 0) < time.time():
+                self._drop(key)
+                cache_stats["expired"] += 1
+                cache_stats["misses"] += 1
+                return None
+
+            self.index[key] = None
+            self.index.move_to_end(key)
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+            cache_stats["hits"] += 1
+            return entry.get("response")
+
+    def put(self, key, response, ttl):
+        if ttl <= 0:
+            return
+        with self.lock:
+            self._load_index()
+            entry = {"response": response, "expires_at": time.time() + ttl, "created_at": time.time()}
+            path = self._path(key)
+            # Per writer: two processes caching the same key must not share a temp file
+            tmp_path = path.with_name(f".{key}.{os.getpid()}.{threading.get_ident()}.tmp")
+            try:
+                tmp_path.write_text(json.dumps(entry, separators=(",", ":")))
+                os.replace(tmp_path, path)
+            except OSError as e:
+                logger.error(f"Failed to write cache entry {key}: {e}")
+                try:
+                    tmp_path.unlink()
+                except OSError:
+                    pass
+                return
+            self.index[key] = None
+            self.index.move_to_end(key)
+            cache_stats["writes"] += 1
+
+            if time.monotonic() - self.last_scan >= self.rescan_seconds:
+                self._scan()
+
+            while len(self.index) > self.max_entries:
+                oldest, _ = self.index.popitem(last=False)
+                self._drop(oldest)
+                cache_stats["evictions"] += 1
+
+    def discard(self, key):
+        with self.lock:
+            self._load_index()
+            self._drop(key)
+
+    def _drop(self, key):
+        self.index.pop(key, None)
+        try:
+            self._path(key).unlink()
+        except FileNotFoundError:
+            pass
+
+    def clear(self):
+        with self.lock:
+            self._load_index()
+            for key in list(self.index):
+                self._drop(key)
+
+    def stats(self):
+        with self.lock:
+            total = cache_stats["hits"] + cache_stats["misses"]
+            return dict(cache_stats, entries=len(self.index), hit_rate=round(cache_stats["hits"] / total, 3) if total else 0.0)
+
+response_cache = ResponseCache()
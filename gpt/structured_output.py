@@ -0,0 +1,251 @@
+import re
+import json
+import logging
+import threading
+
+logger = logging.getLogger("GPT_StructuredOutput")
+
+# === Schemas ===
+# {"required": {key: type}, "optional": {key: type}, "nested": {key: schema}}. Nested
+# optional objects that fail validation are dropped rather than failing the whole reply.
+TASK_SCHEMA = {
+    "required": {"agent": str, "task": str},
+    "optional": {"priority": int}
+}
+
+ROUTING_SCHEMA = {
+    "required": {"agent": str, "task": str, "priority": int},
+    "optional": {"self_improvement_task": dict},
+    "nested": {"self_improvement_task": TASK_SCHEMA}
+}
+
+ALLOCATION_SCHEMA = {
+    "required": {"decision": str},
+    "optional": {"allocated_amount": str, "impact_summary": str, "collaboration": list, "next_task": dict},
+    "nested": {"next_task": TASK_SCHEMA}
+}
+
+FRANCHISE_REPORT_SCHEMA = {
+    "required": {},
+    "optional": {"recommendation": str, "forecast": dict, "next_task": dict},
+    "nested": {"next_task": TASK_SCHEMA}
+}
+
+SUPPORT_RESOLUTION_SCHEMA = {
+    "required": {"resolution_attempt": str},
+    "optional": {"follow_up_task": dict},
+    "nested": {"follow_up_task": TASK_SCHEMA}
+}
+
+SUPPORT_CHURN_SCHEMA = {
+    "required": {"churn_risk": bool},
+    "optional": {"reason": str, "retention_action": dict},
+    "nested": {"retention_action": TASK_SCHEMA}
+}
+
+SCOUT_SCHEMA = {
+    "required": {},
+    "optional": {"niches": list, "platforms": list, "recommendation": str, "next_task": dict},
+    "nested": {"next_task": TASK_SCHEMA}
+}
+
+PLAN_CHANGE_SCHEMA = {
+    "required": {"recommendation": str},
+    "optional": {"suggested_plan": str, "reason": str}
+}
+
+class StructuredOutputError(ValueError):
+    pass
+
+# === Parse Counters ===
+_stats_lock = threading.Lock()
+_stats = {"parsed": {}, "repaired": {}, "failed": {}}
+
+def _count(kind, agent):
+    with _stats_lock:
+        bucket = _stats[kind]
+        bucket[agent] = bucket.get(agent, 0) + 1
+
+def parse_stats():
+    with _stats_lock:
+        return {kind: dict(counts) for kind, counts in _stats.items()}
+
+# === Extraction ===
+STRUCTURAL_RE = re.compile(r'[{}\[\]"]')
+STRING_END_RE = re.compile(r'["\\]')
+
+def json_spans(text, openers="{"):
+    """(start, end) of each top-level balanced JSON value, skipping braces inside strings."""
+    closers = {"{": "}", "[": "]"}
+    i, n = 0, len(text)
+    while i < n:
+        if text[i] not in openers:
+            i += 1
+            continue
+        stack = [closers[text[i]]]
+        j = i + 1
+        while stack:
+            # Jump between structural characters instead of walking every one
+            match = STRUCTURAL_RE.search(text, j)
+            if match is None:
+                break
+            ch, j = match.group(), match.end()
+            if ch == '"':
+                while True:
+                    end = STRING_END_RE.search(text, j)
+                    if end is None:
+                        j = n
+                        break
+                    if end.group() == "\\":
+                        j = end.end() + 1
+                        continue
+                    j = end.end()
+                    break
+            elif ch in closers:
+                stack.append(closers[ch])
+            elif ch != stack[-1]:
+                break
+            else:
+                stack.pop()
+        if stack:
+            yield i, None  # unbalanced: runs to the end (or a mismatched closer)
+            i += 1
+            continue
+        yield i, j
+        i = j
+
+def extract_json(content):
+    """First JSON object or array embedded in an LLM reply."""
+    for start, end in json_spans(content, "{["):
+        if end is None:
+            continue
+        try:
+            return json.loads(content[start:end])
+        except ValueError:
+            continue
+    raise StructuredOutputError("No JSON found in GPT response")
+
+FENCE_RE = re.compile(r"```(?:json)?", re.IGNORECASE)
+TRAILING_COMMA_RE = re.compile(r",\s*([}\]])")
+PY_LITERALS = {"True": "true", "False": "false", "None": "null"}
+PY_LITERAL_RE = re.compile(r"\b(True|False|None)\b")
+
+def repair_text(text):
+    """The usual ways a model breaks JSON: fences, smart quotes, trailing commas, Python literals, a missing closer."""
+    text = FENCE_RE.sub("", text)
+    text = text.replace("“", '"').replace("”", '"').replace("’", "'")
+    text = TRAILING_COMMA_RE.sub(r"\1", text)
+    text = PY_LITERAL_RE.sub(lambda m: PY_LITERALS[m.group(1)], text)
+    start = text.find("{")
+    if start == -1:
+        return text
+    spans = list(json_spans(text[start:]))
+    if spans and spans[0][1] is None:
+        # Close whatever is still open (the reply was cut off)
+        stack, in_string, escape = [], False, False
+        for ch in text[start:]:
+            if in_string:
+                if escape:
+                    escape = False
+                elif ch == "\\":
+                    escape = True
+                elif ch == '"':
+                    in_string = False
+            elif ch == '"':
+                in_string = True
+            elif ch in "{[":
+                stack.append("}" if ch == "{" else "]")
+            elif ch in "}]" and stack:
+                stack.pop()
+        text = text + ('"' if in_string else "") + "".join(reversed(stack))
+        text = TRAILING_COMMA_RE.sub(r"\1", text)  # cut off right after a comma
+    return text
+
+def first_object(content):
+    """(object, json text, trailing text) for the first object that parses, else None."""
+    for start, end in json_spans(content):
+        if end is None:
+            continue
+        try:
+            value = json.loads(content[start:end])
+        except ValueError:
+            continue
+        if isinstance(value, dict):
+            return value, content[start:end], content[end:].strip()
+    return None
+
+# === Validation ===
+def coerce(value, expected):
+    """value as `expected`, or raise ValueError."""
+    if expected is bool:
+        if isinstance(value, bool):
+            return value
+        if isinstance(value, str) and value.strip().lower() in ("true", "false"):
+            return value.strip().lower() == "true"
+        raise ValueError(f"expected boolean, got {value!r}")
+    if expected is int:
+        if isinstance(value, bool):
+            raise ValueError(f"expected integer, got {value!r}")
+        if isinstance(value, int):
+            return value
+        if isinstance(value, float) and value.is_integer():
+            return int(value)
+        if isinstance(value, str) and value.strip().lstrip("-").isdigit():
+            return int(value.strip())
+        raise ValueError(f"expected integer, got {value!r}")
+    if expected is str:
+        if isinstance(value, str):
+            return value
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return str(value)
+        raise ValueError(f"expected string, got {type(value).__name__}")
+    if not isinstance(value, expected):
+        raise ValueError(f"expected {expected.__name__}, got {type(value).__name__}")
+    return value
+
+def validate(value, schema):
+    """A copy of `value` coerced to `schema`; raises ValueError on anything it can't fix."""
+    result = dict(value)
+    for key, expected in schema.get("required", {}).items():
+        if key not in result:
+            raise ValueError(f"missing required key '{key}'")
+        try:
+            result[key] = coerce(result[key], expected)
+        except ValueError as e:
+            raise ValueError(f"'{key}': {e}")
+    for key, expected in schema.get("optional", {}).items():
+        if key not in result:
+            continue
+        try:
+            result[key] = coerce(result[key], expected)
+            if key in schema.get("nested", {}):
+                result[key] = validate(result[key], schema["nested"][key])
+        except ValueError as e:
+            logger.warning(f"Dropping invalid '{key}' from GPT response: {e}")
+            del result[key]
+    return result
+
+def parse_structured(content, schema=ROUTING_SCHEMA, agent=None):
+    """
+    (object, json text, trailing reasoning) from an LLM reply validated against `schema`.
+    One local repair pass runs before giving up; raises StructuredOutputError.
+    """
+    agent = agent or "router"
+    error = None
+    for attempt, text in enumerate((content, None)):
+        if text is None:
+            text = repair_text(content)
+        found = first_object(text)
+        if found is None:
+            error = "no JSON object found"
+            continue
+        value, json_text, rest = found
+        try:
+            value = validate(value, schema)
+        except ValueError as e:
+            error = str(e)
+            continue
+        _count("repaired" if attempt else "parsed", agent)
+        return value, json_text, rest
+    _count("failed", agent)
+    raise StructuredOutputError(f"Unparseable GPT response ({error})")
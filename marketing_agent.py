@@ -1,6 +1,7 @@
 import json
-from core.digiman_core import log_action, update_task_queue
+from core.digiman_core import log_action, enqueue_many
 from core.memory_store import load_memory
+from core.lead_store import get_lead_store
 from core.metrics import metrics
 from gpt.gpt_router import interpret_command
 from pathlib import Path
@@ -11,9 +12,8 @@ class MarketingAgent:
         self.client_id = client_id
         self.memory = load_memory(client_id)
         self.metrics = metrics
-        self.leads_path = Path(f".digi/clients/{client_id}/leads.json")
+        self.leads = get_lead_store(client_id)
         self.last_campaign_log = Path(f".digi/clients/{client_id}/last_campaign.json")
-        self.leads = self.load_leads()
 
     def run_task(self, task):
         log_action("Marketing Agent", f"Running task: {task['task']}", self.client_id)
@@ -31,11 +31,6 @@ class MarketingAgent:
         elif "auto" in task["task"].lower() or "weekly" in task["task"].lower():
             self.check_auto_trigger()
 
-    def load_leads(self):
-        if self.leads_path.exists():
-            return json.loads(self.leads_path.read_text())
-        return []
-
     def load_last_campaign_date(self):
         if self.last_campaign_log.exists():
             data = json.loads(self.last_campaign_log.read_text())
@@ -61,33 +56,29 @@ class MarketingAgent:
 
         log_action("Marketing Agent", f"Proposed campaign: {campaign_brief}", self.client_id)
 
-        update_task_queue("Financial Allocation Agent", {
-            "task": f"Approve marketing campaign budget: {campaign_brief}",
-            "priority": 2
-        }, self.client_id)
-
-        update_task_queue("Visuals Agent", {
-            "task": f"Design campaign visuals for: {campaign_brief['headline']}",
-            "priority": 2
-        }, self.client_id)
-
-        update_task_queue("Socials Agent", {
-            "task": f"Schedule posts for: {campaign_brief['headline']} on {', '.join(campaign_brief['channels'])}",
-            "priority": 2
-        }, self.client_id)
-
-        update_task_queue("Analyst Agent", {
-            "task": f"Analyze expected performance for: {campaign_brief['headline']}",
-            "priority": 1
-        }, self.client_id)
+        enqueue_many([
+            ("Financial Allocation Agent", {
+                "task": f"Approve marketing campaign budget: {campaign_brief}",
+                "priority": 2
+            }),
+            ("Visuals Agent", {
+                "task": f"Design campaign visuals for: {campaign_brief['headline']}",
+                "priority": 2
+            }),
+            ("Socials Agent", {
+                "task": f"Schedule posts for: {campaign_brief['headline']} on {', '.join(campaign_brief['channels'])}",
+                "priority": 2
+            }),
+            ("Analyst Agent", {
+                "task": f"Analyze expected performance for: {campaign_brief['headline']}",
+                "priority": 1
+            })
+        ], self.client_id, source="Marketing Agent")
 
         self.save_last_campaign_date()
 
     def detect_common_industry(self):
-        industries = [lead.get("industry", "unknown") for lead in self.leads if "industry" in lead]
-        if not industries:
-            return None
-        return max(set(industries), key=industries.count)
+        return self.leads.most_common_industry()
 
     def check_auto_trigger(self):
         last_run = self.load_last_campaign_date()
@@ -1,18 +1,18 @@
 # Tracks and updates system-wide metrics
-from pathlib import Path
-
-# Define path for enhanced metrics_v2.py
-metrics_v2_path = Path("/mnt/data/metrics.py")
-
-enhanced_metrics_v2_code = '''
+import os
+import copy
 import json
+import atexit
+import threading
 from datetime import datetime
 from pathlib import Path
+from core.journal import Journal, atomic_write_json
 
 # Global live metrics
 metrics = {
     "tasks_processed": 0,
     "tasks_failed": 0,
+    "tasks_deferred": 0,  # requeued because the LLM was unavailable
     "agents_generated": 0,
     "clients_onboarded": 0,
     "revenue_generated": 0,
@@ -31,75 +31,136 @@ METRICS_FILE = Path(".digi/live_metrics.json")
 SNAPSHOT_DIR = Path(".digi/snapshots")
 SNAPSHOT_DIR.mkdir(parents=True, exist_ok=True)
 
+# === Persistence ===
+# Every change is appended to a delta journal right away (so a crash loses nothing);
+# the full snapshot is rewritten at most once per SAVE_DEBOUNCE seconds, atomically.
+SAVE_DEBOUNCE = float(os.getenv("METRICS_SAVE_DEBOUNCE", 2.0))
+METRICS_FSYNC = os.getenv("METRICS_FSYNC", "False").lower() == "true"
+
+_lock = threading.RLock()
+_journal = Journal(METRICS_FILE.with_suffix(".journal"), fsync=METRICS_FSYNC)
+_save_timer = None
+
+def _apply(record):
+    target = metrics
+    path = record["path"]
+    for key in path[:-1]:
+        target = target.setdefault(key, {})
+    if record["op"] == "inc":
+        target[path[-1]] = target.get(path[-1], 0) + record["amount"]
+    elif record["op"] == "set":
+        target[path[-1]] = record["value"]
+
+def _catch_up():
+    """Caller holds _lock and the journal lock: fold in deltas other processes wrote."""
+    records, rotated = _journal.read_new()
+    if rotated:
+        _load_snapshot()
+    for record in records:
+        _apply(record)
+
+def _record(*changes):
+    with _lock:
+        with _journal.locked():
+            _catch_up()
+            for change in changes:
+                _apply(change)
+            _journal.append(list(changes))
+        _schedule_save()
+
+def _inc(path, amount=1):
+    return {"op": "inc", "path": path, "amount": amount}
+
+def _set(path, value):
+    return {"op": "set", "path": path, "value": value}
+
+def _schedule_save():
+    global _save_timer
+    if _save_timer is None:
+        _save_timer = threading.Timer(SAVE_DEBOUNCE, save_metrics)
+        _save_timer.daemon = True
+        _save_timer.start()
+
 def increment_metric(key, amount=1):
-    if key in metrics:
-        metrics[key] += amount
-    elif key == "campaigns_launched":
-        metrics[key] = metrics.get(key, 0) + amount
-    save_metrics()
+    if key in metrics or key == "campaigns_launched":
+        _record(_inc([key], amount))
 
 def record_agent_error(agent_name):
-    metrics["errors_by_agent"][agent_name] = metrics["errors_by_agent"].get(agent_name, 0) + 1
-    metrics["tasks_failed"] += 1
-    save_metrics()
+    _record(_inc(["errors_by_agent", agent_name]), _inc(["tasks_failed"]))
 
 def record_phase_performance(phase, success=True):
-    perf = metrics["performance_by_phase"].setdefault(phase, {"success": 0, "fail": 0})
-    if success:
-        perf["success"] += 1
-    else:
-        perf["fail"] += 1
-    save_metrics()
+    with _lock:
+        metrics["performance_by_phase"].setdefault(phase, {"success": 0, "fail": 0})
+    _record(_inc(["performance_by_phase", phase, "success" if success else "fail"]))
 
 def track_agent_task(agent_name, success=True):
-    log = metrics["agent_success_fail"].setdefault(agent_name, {"success": 0, "fail": 0})
-    if success:
-        log["success"] += 1
-    else:
-        log["fail"] += 1
-    save_metrics()
+    with _lock:
+        metrics["agent_success_fail"].setdefault(agent_name, {"success": 0, "fail": 0})
+    _record(_inc(["agent_success_fail", agent_name, "success" if success else "fail"]))
 
 def log_campaign_result(name, result):
-    outcomes = metrics["campaign_results"].setdefault(name, {"won": 0, "lost": 0})
-    if result == "won":
-        outcomes["won"] += 1
-    elif result == "lost":
-        outcomes["lost"] += 1
-    save_metrics()
+    with _lock:
+        metrics["campaign_results"].setdefault(name, {"won": 0, "lost": 0})
+    if result in ("won", "lost"):
+        _record(_inc(["campaign_results", name, result]))
 
 def add_revenue_for_client(client_id, amount):
-    rev = metrics["revenue_by_client"].get(client_id, 0)
-    metrics["revenue_by_client"][client_id] = rev + amount
-    metrics["revenue_generated"] += amount
-    save_metrics()
+    _record(_inc(["revenue_by_client", client_id], amount), _inc(["revenue_generated"], amount))
 
 def update_forecast(model_data):
-    metrics["forecast"] = model_data
-    save_metrics()
+    _record(_set(["forecast"], model_data))
+
+def get_metrics():
+    """Consistent in-memory copy; never touches disk."""
+    with _lock:
+        return copy.deepcopy(metrics)
 
 def save_metrics():
-    with open(METRICS_FILE, "w") as f:
-        json.dump(metrics, f, indent=2)
+    global _save_timer
+    with _lock:
+        _save_timer = None
+        with _journal.locked():
+            _catch_up()
+            atomic_write_json(METRICS_FILE, metrics, indent=2)
+            _journal.rotate()
+
+def _load_snapshot():
+    if METRICS_FILE.exists():
+        try:
+            with open(METRICS_FILE, "r") as f:
+                saved = json.load(f)
+        except json.JSONDecodeError:
+            return
+        metrics.clear()
+        metrics.update(saved)
 
 def load_metrics():
-    global metrics
-    if METRICS_FILE.exists():
-        with open(METRICS_FILE, "r") as f:
-            metrics = json.load(f)
+    # Snapshot plus every delta since; updated in place because agents hold this dict
+    with _lock:
+        with _journal.locked(shared=True):
+            _load_snapshot()
+            _journal.inode, _journal.offset = None, 0
+            records, _ = _journal.read_new()
+            for record in records:
+                _apply(record)
 
 def snapshot_metrics():
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     with open(SNAPSHOT_DIR / f"snapshot_{timestamp}.json", "w") as f:
-        json.dump(metrics, f, indent=2)
+        json.dump(get_metrics(), f, indent=2)
 
 def auto_trigger_responses(client_id):
     if metrics["leads_generated"] < 5:
-        from core.digiman_core import update_task_queue
-        update_task_queue("Scout Agent", {"task": "Boost lead research", "priority": 3}, client_id)
-        update_task_queue("Outreach Agent", {"task": "Revive cold campaigns", "priority": 3}, client_id)
-'''
-
-# Save the enhanced metrics_v2.py
-metrics_v2_path.write_text(enhanced_metrics_v2_code.strip())
-
-str(metrics_v2_path)
+        from core.digiman_core import enqueue_many
+        enqueue_many([
+            ("Scout Agent", {"task": "Boost lead research", "priority": 3}),
+            ("Outreach Agent", {"task": "Revive cold campaigns", "priority": 3})
+        ], client_id, source="Metrics")
+
+def _save_on_exit():
+    if _save_timer is not None:
+        _save_timer.cancel()
+        save_metrics()
+
+load_metrics()
+atexit.register(_save_on_exit)
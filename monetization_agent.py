@@ -2,6 +2,7 @@ import json
 import os
 from core.digiman_core import log_action, update_task_queue
 from core.memory_store import load_memory
+from core.lead_store import get_lead_store
 from core.metrics import (
     metrics, add_revenue_for_client, update_forecast, increment_metric
 )
@@ -15,7 +16,7 @@ class MonetizationAgent:
         self.memory = load_memory(client_id)
         self.pricing_file = Path("pricing.json")
         self.current_pricing = self.load_pricing()
-        self.client_leads_path = Path(f".digi/clients/{client_id}/leads.json")
+        self.leads = get_lead_store(client_id)
         self.client_revenue_path = Path(f".digi/clients/{client_id}/revenue.json")
 
     def run_task(self, task):
@@ -41,11 +42,6 @@ class MonetizationAgent:
             return json.loads(self.pricing_file.read_text())
         return {}
 
-    def load_client_leads(self):
-        if self.client_leads_path.exists():
-            return json.loads(self.client_leads_path.read_text())
-        return []
-
     def analyze_pricing(self):
         prompt = f"""
 You are a Monetization Strategist. Based on current pricing:
@@ -57,7 +53,7 @@ Propose:
 - Monthly vs annual strategies
 - Features that should be added or removed per tier
 """
-        suggestion = interpret_command(prompt, self.client_id)
+        suggestion = interpret_command(prompt, self.client_id, agent="Monetization Agent")
         log_action("Monetization Agent", f"Pricing Enhancement Proposal: {suggestion}", self.client_id)
         update_task_queue("Manager Agent", {
             "task": f"Evaluate new pricing strategy: {suggestion}",
@@ -65,7 +61,6 @@ Propose:
         }, self.client_id)
 
     def generate_forecast(self):
-        leads = self.load_client_leads()
         total_rev = metrics.get("revenue_generated", 0)
         total_clients = metrics.get("clients_onboarded", 1)
         avg = total_rev / total_clients if total_clients > 0 else 0
@@ -73,7 +68,7 @@ Propose:
         forecast = {
             "monthly_revenue_forecast": round(avg * total_clients * 1.1, 2),
             "projected_growth_rate": "10-15%",
-            "leads_considered": len(leads),
+            "leads_considered": self.leads.count(),
             "notes": "Data enriched via GPT and live memory context"
         }
         update_forecast(forecast)
@@ -4,7 +4,7 @@ import random
 from datetime import datetime
 from pathlib import Path
 from core.digiman_core import log_action, update_task_queue
-from core.metrics import metrics
+from core.metrics import increment_metric
 from core.memory_store import load_memory
 from gpt.gpt_router import interpret_command
 
@@ -40,7 +40,7 @@ class SalesAgent:
         else:
             log_action("Sales Agent", "Mock sales call executed", self.client_id)
             update_task_queue("Closer Agent", {"task": "Mock objection handling", "priority": 2}, self.client_id)
-            metrics["revenue_generated"] += 800
+            increment_metric("revenue_generated", 800)
 
     def prepare_pitch(self):
         pains = [m["content"] for m in self.memory if any(k in m["content"].lower() for k in ["frustrated", "confused", "low revenue", "no leads"])]
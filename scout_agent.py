@@ -4,7 +4,8 @@ from datetime import datetime, timedelta
 from core.digiman_core import log_action, update_task_queue
 from core.memory_store import load_memory
 from core.metrics import increment_metric
-from gpt.gpt_router import interpret_command
+from gpt.gpt_router import interpret_command, gather_commands
+from gpt.structured_output import SCOUT_SCHEMA
 
 class ScoutAgent:
     def __init__(self, client_id=None):
@@ -31,22 +32,32 @@ class ScoutAgent:
     def run_task(self, task):
         log_action("Scout Agent", f"[RUN_TASK] Running task: {task['task']}", self.client_id)
         increment_metric("tasks_processed")
-        try:
-            gpt_result = interpret_command(task["task"], self.client_id)
+        # The scouting prompt doesn't depend on the routing answer: ask both at once. The
+        # branch is decided on the text as queued, the same text that chose the prefetch.
+        scouting = self.is_scout_task(task)
+        requests = [task["task"]]
+        if scouting:
+            requests.append({"prompt": self.scout_prompt(), "agent": "Scout Agent", "schema": SCOUT_SCHEMA})
+        results = gather_commands(requests, self.client_id, return_exceptions=True)
+
+        gpt_result = results[0]
+        if isinstance(gpt_result, Exception):
+            log_action("Scout Agent", f"[ERROR] GPT interpretation failed: {gpt_result}", self.client_id)
+        else:
             log_action("Scout Agent", f"[GPT_DECISION] {gpt_result}", self.client_id)
             task.update(gpt_result)
-        except Exception as e:
-            log_action("Scout Agent", f"[ERROR] GPT interpretation failed: {e}", self.client_id)
 
-        if "scout" in task["task"].lower() or "research" in task["task"].lower():
-            self.scout_market()
+        if scouting:
+            self.scout_market(results[1] if len(results) > 1 else None)
         else:
             log_action("Scout Agent", "[SKIP] Task did not match scout pattern.", self.client_id)
 
-    def scout_market(self):
-        # === [FEATURE: MARKET & LEAD SCOUTING] ===
+    def is_scout_task(self, task):
+        return "scout" in task["task"].lower() or "research" in task["task"].lower()
+
+    def scout_prompt(self):
         context = "\n".join([m["content"] for m in self.memory[-5:] if isinstance(m, dict) and m.get("role") == "user"])
-        prompt = f"""
+        return f"""
 You are the Scout Agent for DigiMan. Your job is to:
 - Research emerging markets and lead sources.
 - Find forums, communities, and channels for targeted leads.
@@ -67,8 +78,14 @@ Respond in JSON:
   }}
 }}
 """
+
+    def scout_market(self, scout_data=None):
+        # === [FEATURE: MARKET & LEAD SCOUTING] ===
         try:
-            scout_data = interpret_command(prompt, self.client_id)
+            if scout_data is None:
+                scout_data = interpret_command(self.scout_prompt(), self.client_id, agent="Scout Agent", schema=SCOUT_SCHEMA)
+            elif isinstance(scout_data, Exception):
+                raise scout_data
             log_action("Scout Agent", f"[SCOUT_RESULT] {scout_data}", self.client_id)
 
             recommendation = scout_data.get("recommendation", "Continue current outreach.")
@@ -7,7 +7,8 @@ from pathlib import Path
 from core.digiman_core import log_action, update_task_queue
 from core.memory_store import load_memory
 from core.metrics import increment_metric
-from gpt.gpt_router import interpret_command
+from gpt.gpt_router import interpret_command, gather_commands
+from gpt.structured_output import PLAN_CHANGE_SCHEMA
 
 class SubscriptionAgent:
     def __init__(self, client_id=None):
@@ -38,23 +39,34 @@ class SubscriptionAgent:
         log_action("Subscription Agent", f"[RUN_TASK] {task['task']}", self.client_id)
         increment_metric("tasks_processed")
 
-        try:
-            gpt_decision = interpret_command(task["task"], self.client_id)
+        # The plan review reads only the subscription and memory: ask it alongside the routing
+        # call. Branch on the text as queued, the same text that chose the prefetch.
+        command = task["task"].lower()
+        plan_change = self.is_plan_change(task)
+        requests = [task["task"]]
+        if plan_change:
+            requests.append({"prompt": self.plan_change_prompt(), "schema": PLAN_CHANGE_SCHEMA})
+        results = gather_commands(requests, self.client_id, return_exceptions=True)
+
+        gpt_decision = results[0]
+        if isinstance(gpt_decision, Exception):
+            log_action("Subscription Agent", f"[ERROR] GPT interpretation failed: {gpt_decision}", self.client_id)
+        else:
             log_action("Subscription Agent", f"[GPT_DECISION] {gpt_decision}", self.client_id)
             task.update(gpt_decision)
-        except Exception as e:
-            log_action("Subscription Agent", f"[ERROR] GPT interpretation failed: {e}", self.client_id)
 
-        if "upgrade" in task["task"].lower() or "downgrade" in task["task"].lower():
-            self.handle_plan_change(task)
-        elif "renew" in task["task"].lower() or "subscription" in task["task"].lower():
+        if plan_change:
+            self.handle_plan_change(task, results[1] if len(results) > 1 else None)
+        elif "renew" in command or "subscription" in command:
             self.process_renewal()
-        elif "cancel" in task["task"].lower():
+        elif "cancel" in command:
             self.cancel_subscription()
 
-    def handle_plan_change(self, task):
-        # [FEATURE: GPT-GUIDED PLAN CHANGE]
-        prompt = f"""
+    def is_plan_change(self, task):
+        return "upgrade" in task["task"].lower() or "downgrade" in task["task"].lower()
+
+    def plan_change_prompt(self):
+        return f"""
 You are the Subscription Agent for DigiMan OS.
 
 Analyze the client's current usage:
@@ -73,8 +85,14 @@ Respond in JSON:
   "reason": "Client is using advanced features and needs more agent slots."
 }}
 """
+
+    def handle_plan_change(self, task, recommendation=None):
+        # [FEATURE: GPT-GUIDED PLAN CHANGE]
         try:
-            recommendation = interpret_command(prompt, self.client_id)
+            if recommendation is None:
+                recommendation = interpret_command(self.plan_change_prompt(), self.client_id, schema=PLAN_CHANGE_SCHEMA)
+            elif isinstance(recommendation, Exception):
+                raise recommendation
             log_action("Subscription Agent", f"[PLAN_RECOMMENDATION] {recommendation}", self.client_id)
 
             action = recommendation.get("recommendation", "stay")
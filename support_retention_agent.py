@@ -6,7 +6,9 @@ from datetime import datetime
 from core.digiman_core import log_action, update_task_queue
 from core.memory_store import load_memory
 from core.metrics import increment_metric
-from gpt.gpt_router import interpret_command
+from gpt.gpt_router import interpret_command, gather_commands
+from gpt.prompt_builder import PromptBuilder
+from gpt.structured_output import SUPPORT_RESOLUTION_SCHEMA, SUPPORT_CHURN_SCHEMA
 
 class SupportRetentionAgent:
     def __init__(self, client_id=None):
@@ -29,18 +31,34 @@ class SupportRetentionAgent:
         log_action("SupportRetentionAgent", f"[RUN_TASK] {task['task']}", self.client_id)
         increment_metric("tasks_processed")
 
-        try:
-            gpt_decision = interpret_command(task["task"], self.client_id)
+        # The churn check reads only memory and tickets: ask it alongside the routing call.
+        # The route is decided on the text as queued, the same text that chose the prefetch.
+        route = self.route(task)
+        requests = [task["task"]]
+        if route == "churn":
+            requests.append({"prompt": self.churn_prompt(), "schema": SUPPORT_CHURN_SCHEMA})
+        results = gather_commands(requests, self.client_id, return_exceptions=True)
+
+        gpt_decision = results[0]
+        if isinstance(gpt_decision, Exception):
+            log_action("SupportRetentionAgent", f"[ERROR] GPT interpretation failed: {gpt_decision}", self.client_id)
+        else:
             log_action("SupportRetentionAgent", f"[GPT_DECISION] {gpt_decision}", self.client_id)
             task.update(gpt_decision)
-        except Exception as e:
-            log_action("SupportRetentionAgent", f"[ERROR] GPT interpretation failed: {e}", self.client_id)
 
         # [TASK ROUTING BASED ON CONTENT]
-        if "support" in task["task"].lower() or "ticket" in task["task"].lower():
+        if route == "ticket":
             self.handle_ticket(task)
-        elif "churn" in task["task"].lower() or "retain" in task["task"].lower():
-            self.prevent_churn()
+        elif route == "churn":
+            self.prevent_churn(results[1] if len(results) > 1 else None)
+
+    def route(self, task):
+        text = task["task"].lower()
+        if "support" in text or "ticket" in text:
+            return "ticket"
+        if "churn" in text or "retain" in text:
+            return "churn"
+        return None
 
     def handle_ticket(self, task):
         # [FEATURE: TICKET HANDLING]
@@ -63,27 +81,27 @@ class SupportRetentionAgent:
             log_action("SupportRetentionAgent", "Escalated urgent support ticket to ManagerAgent.", self.client_id)
 
         # [FEATURE: AUTO-RESOLUTION ATTEMPT VIA GPT]
-        prompt = f"""
+        prompt = (
+            PromptBuilder("Support Agent")
+            .text(f"""
 You are DigiMan SupportRetentionAgent.
 
 Resolve or propose actions for:
-{task['task']}
-
-Context:
-{json.dumps(self.tickets[-3:], indent=2)}
-
-Respond with a JSON:
-{{
+{task['task']}""")
+            .context("Context", self.tickets[-3:], priority=1)
+            .text("""Respond with a JSON:
+{
   "resolution_attempt": "Response message to send to client",
-  "follow_up_task": {{
+  "follow_up_task": {
     "agent": "CRM Agent",
     "task": "Follow up with client regarding resolution",
     "priority": 2
-  }}
-}}
-"""
+  }
+}""")
+            .build()
+        )
         try:
-            resolution = interpret_command(prompt, self.client_id)
+            resolution = interpret_command(prompt, self.client_id, schema=SUPPORT_RESOLUTION_SCHEMA)
             message = resolution.get("resolution_attempt", "Thank you for contacting support. We are addressing your issue.")
             follow_up = resolution.get("follow_up_task")
 
@@ -96,32 +114,36 @@ Respond with a JSON:
         except Exception as e:
             log_action("SupportRetentionAgent", f"[ERROR] Resolution attempt failed: {e}", self.client_id)
 
-    def prevent_churn(self):
-        # [FEATURE: PROACTIVE RETENTION]
-        prompt = f"""
+    def churn_prompt(self):
+        return (
+            PromptBuilder("Support Agent")
+            .text("""
 You are DigiMan SupportRetentionAgent.
 
-Analyze client memory and current tickets to detect churn risk or dissatisfaction.
-
-Memory:
-{" ".join([m["content"] for m in self.memory[-5:] if isinstance(m, dict)])}
-
-Tickets:
-{json.dumps(self.tickets[-3:], indent=2)}
-
-Respond with JSON:
-{{
+Analyze client memory and current tickets to detect churn risk or dissatisfaction.""")
+            .context("Memory", [m["content"] for m in self.memory[-5:] if isinstance(m, dict)],
+                     priority=1, render=" ".join)
+            .context("Tickets", self.tickets[-3:], priority=2)
+            .text("""Respond with JSON:
+{
   "churn_risk": true | false,
   "reason": "Detected churn signals such as cancellation mention",
-  "retention_action": {{
+  "retention_action": {
     "agent": "Sales Agent",
     "task": "Offer loyalty discount to prevent churn",
     "priority": 3
-  }}
-}}
-"""
+  }
+}""")
+            .build()
+        )
+
+    def prevent_churn(self, churn_check=None):
+        # [FEATURE: PROACTIVE RETENTION]
         try:
-            churn_check = interpret_command(prompt, self.client_id)
+            if churn_check is None:
+                churn_check = interpret_command(self.churn_prompt(), self.client_id, schema=SUPPORT_CHURN_SCHEMA)
+            elif isinstance(churn_check, Exception):
+                raise churn_check
             churn_risk = churn_check.get("churn_risk", False)
             reason = churn_check.get("reason", "No specific reason provided.")
 
@@ -0,0 +1,29 @@
+from core.action_logger import ActionLogger
+
+def test_failed_write_is_retried_on_next_flush(tmp_path):
+    blocked = tmp_path / "client"
+    blocked.write_text("")   # a file where the log directory should be: every write fails
+    log = ActionLogger(flush_interval=3600)
+    path = blocked / "actions.log"
+    log.write(path, "first\n")
+    log.write(path, "second\n")
+    log.flush()
+    assert log.buffers[path] == ["first\n", "second\n"]
+
+    blocked.unlink()
+    log.write(path, "third\n")
+    log.flush()
+    log.close()
+    assert path.read_text() == "first\nsecond\nthird\n"
+    assert log.buffers == {} and log.retained_bytes == 0
+
+def test_retained_lines_are_capped_keeping_the_newest(tmp_path):
+    blocked = tmp_path / "client"
+    blocked.write_text("")
+    log = ActionLogger(flush_interval=3600, retry_bytes=12)
+    path = blocked / "actions.log"
+    for line in ("old-1\n", "old-2\n", "new-1\n", "new-2\n"):
+        log.write(path, line)
+    log.flush()
+    assert log.buffers[path] == ["new-1\n", "new-2\n"]
+    log.stop_event.set()
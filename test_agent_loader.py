@@ -0,0 +1,16 @@
+import sys
+import metrics
+from core.agent_loader import load_agents, AGENT_MODULE_PREFIX
+
+def test_agent_files_cannot_shadow_core_modules(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    agents = tmp_path / "agents"
+    agents.mkdir()
+    (agents / "metrics.py").write_text("class MetricsAgent:\n    def run_task(self, task):\n        pass\n")
+    (agents / "broken.py").write_text("class BrokenAgent:\n    pass\nraise RuntimeError('bad agent file')\n")
+
+    load_agents(str(agents), client_id="loader-test")
+
+    assert sys.modules["metrics"] is metrics
+    assert AGENT_MODULE_PREFIX + "metrics" in sys.modules
+    assert AGENT_MODULE_PREFIX + "broken" not in sys.modules
@@ -0,0 +1,26 @@
+from core.agent_registry import (
+    AgentRegistry, agent_registry, dead_letter, read_dead_letters,
+    routable_dead_letters, remove_dead_letters
+)
+
+def test_unknown_names_are_not_cached():
+    registry = AgentRegistry()
+    assert registry.resolve("sales-agent") == "Sales Agent"
+    for i in range(100):
+        assert registry.resolve(f"Made Up Agent {i}") is None
+    assert list(registry.resolved) == ["sales-agent"]
+
+def test_dead_letters_stay_parked_until_removed(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    dead_letter("dl-test", [("Lead Nurture Agent", {"task": "Warm up trial users"}),
+                            ("Nobody Agent", {"task": "Lost cause"})])
+    agent_registry.register("LeadNurtureAgent")
+
+    routable = routable_dead_letters("dl-test")
+    assert [(name, record["task"]["task"]) for name, record in routable] == [("Lead Nurture Agent", "Warm up trial users")]
+    # Nothing is removed until the caller has queued them
+    assert len(read_dead_letters("dl-test")) == 2
+
+    dead_letter("dl-test", [("Lead Nurture Agent", {"task": "Arrived meanwhile"})])
+    remove_dead_letters("dl-test", [record for _, record in routable])
+    assert [r["task"]["task"] for r in read_dead_letters("dl-test")] == ["Lost cause", "Arrived meanwhile"]
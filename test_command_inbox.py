@@ -0,0 +1,28 @@
+import time
+import sqlite3
+from core.command_inbox import CommandInbox
+
+def test_retried_command_waits_out_its_backoff(tmp_path):
+    inbox = CommandInbox(tmp_path / "commands.db")
+    task_id = inbox.submit("acme", "draft the newsletter")
+    assert inbox.claim()["task_id"] == task_id
+
+    inbox.fail(task_id, "LLM unavailable", retry=True, delay=0.2)
+    assert inbox.claim() is None
+    assert inbox.get(task_id)["status"] == "queued"
+    time.sleep(0.25)
+    command = inbox.claim()
+    assert command["task_id"] == task_id and command["attempts"] == 2
+
+def test_old_inbox_gains_the_backoff_column(tmp_path):
+    path = tmp_path / "commands.db"
+    conn = sqlite3.connect(str(path))
+    conn.execute(
+        "CREATE TABLE commands (id TEXT PRIMARY KEY, client_id TEXT NOT NULL, message TEXT NOT NULL, "
+        "status TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, result TEXT, error TEXT, "
+        "created_at REAL NOT NULL, updated_at REAL NOT NULL, lease_until REAL)"
+    )
+    conn.execute("INSERT INTO commands VALUES ('old', 'acme', 'hi', 'queued', 0, NULL, NULL, 1, 1, NULL)")
+    conn.commit()
+    conn.close()
+    assert CommandInbox(path).claim()["task_id"] == "old"
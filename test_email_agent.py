@@ -0,0 +1,102 @@
+import email_agent
+from core.mail_transport import MailHeader
+from gpt.llm_client import LLMUnavailable
+
+def raw_message(uid):
+    return (f"From: lead{uid}@example.com\r\nSubject: Pricing question {uid}\r\n"
+            f"Content-Type: text/plain\r\n\r\nCan I get a demo?\r\n").encode()
+
+class FakeTransport:
+    def __init__(self, uids, spam=()):
+        self.uids = uids
+        self.spam = set(spam)
+        self.seen = []
+        self.outbox = []
+        self.sent = []
+
+    def unseen_uids(self):
+        return list(self.uids)
+
+    def fetch_headers(self, uids):
+        return [
+            MailHeader(uid, 200, {"X-Spam-Flag": "YES"} if uid in self.spam else {"From": f"lead{uid}@example.com"})
+            for uid in uids
+        ]
+
+    def fetch_streams(self, headers):
+        for header in headers:
+            yield header.uid, (raw_message(header.uid),)
+
+    def mark_seen(self, uids):
+        self.seen.extend(uids)
+
+    def queue_reply(self, to_email, subject, body):
+        self.outbox.append(to_email)
+
+    def flush_replies(self):
+        self.sent.extend(self.outbox)
+        self.outbox = []
+        return []
+
+    def record_sweep(self, seconds, skipped=0):
+        pass
+
+    def messages_per_second(self):
+        return 0.0
+
+def test_pages_marked_seen_before_a_later_page_fails(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(email_agent, "EMAIL_BATCH_SIZE", 2)
+    queued = []
+    monkeypatch.setattr(email_agent, "update_task_queue", lambda agent, task, client_id=None: queued.append(task["email"]))
+
+    transport = FakeTransport([1, 2, 3, 4, 5], spam=[5])
+    agent = email_agent.EmailAgent("mail-test")
+    monkeypatch.setattr(agent, "transport", lambda: transport)
+
+    pages = []
+    def classify_batch(page):
+        pages.append(page)
+        if len(pages) > 1:
+            raise LLMUnavailable("LLM circuit open")
+        return [{"category": "lead", "priority": 2, "summary": "demo", "reply": "Thanks!"} for _ in page]
+    monkeypatch.setattr(agent, "classify_batch", classify_batch)
+
+    agent.process_inbox()
+
+    # The spam header and the first page are settled; the failed page stays unseen for the next sweep
+    assert sorted(transport.seen) == [1, 2, 5]
+    assert sorted(queued) == ["lead1@example.com", "lead2@example.com"]
+    assert sorted(transport.sent) == ["lead1@example.com", "lead2@example.com"]
+
+def raw_with_attachment(uid):
+    return (f"From: lead{uid}@example.com\r\nSubject: Invoice {uid}\r\nMIME-Version: 1.0\r\n"
+            f"Content-Type: multipart/mixed; boundary=XX\r\n\r\n"
+            f"--XX\r\nContent-Type: text/plain\r\n\r\nSee attached.\r\n"
+            f"--XX\r\nContent-Type: application/pdf\r\nContent-Disposition: attachment; filename=inv{uid}.pdf\r\n"
+            f"Content-Transfer-Encoding: base64\r\n\r\nJVBERi0xLjQK\r\n--XX--\r\n").encode()
+
+def test_only_support_mail_keeps_its_spooled_attachments(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    queued = []
+    monkeypatch.setattr(email_agent, "update_task_queue", lambda agent, task, client_id=None: queued.append(task))
+
+    transport = FakeTransport([1, 2])
+    transport.fetch_streams = lambda headers: ((h.uid, (raw_with_attachment(h.uid),)) for h in headers)
+    agent = email_agent.EmailAgent("mail-test")
+    monkeypatch.setattr(agent, "transport", lambda: transport)
+    categories = {0: "support", 1: "lead"}
+    monkeypatch.setattr(agent, "classify_batch", lambda page: [
+        {"category": categories[i], "priority": 2, "summary": "invoice", "reply": "Thanks!"} for i in range(len(page))
+    ])
+
+    agent.process_inbox()
+
+    support = next(task for task in queued if "attachments" in task)
+    kept = support["attachments"][0]["path"]
+    assert (tmp_path / kept).read_bytes().startswith(b"%PDF")
+    assert [p.name.split("_")[-1] for p in agent.attachments_dir.iterdir()] == ["1"]
+
+    # Past the TTL the spool is cleared
+    assert email_agent.purge_spool(agent.attachments_dir, ttl=0) == 1
+    assert list(agent.attachments_dir.iterdir()) == []
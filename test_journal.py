@@ -0,0 +1,30 @@
+from core.journal import Journal
+
+def test_append_after_torn_line_keeps_the_new_records(tmp_path):
+    path = tmp_path / "queue.journal"
+    writer = Journal(path, fsync=False)
+    with writer.locked():
+        writer.append([{"op": "add", "id": 1}])
+    # A writer crashed halfway through its record
+    with open(path, "ab") as f:
+        f.write(b'{"op":"add","id":')
+
+    with writer.locked():
+        writer.read_new()
+        writer.append([{"op": "add", "id": 2}, {"op": "add", "id": 3}])
+
+    records, rotated = Journal(path).read_new()
+    assert [r["id"] for r in records] == [1, 2, 3]
+    assert path.read_bytes().endswith(b"\n")
+
+def test_appends_are_read_back_by_other_readers(tmp_path):
+    path = tmp_path / "queue.journal"
+    writer, reader = Journal(path, fsync=False), Journal(path, fsync=False)
+    with writer.locked():
+        writer.append([{"id": 1}])
+    assert reader.read_new() == ([{"id": 1}], True)
+    with writer.locked():
+        writer.read_new()
+        writer.append([{"id": 2}])
+    assert reader.read_new() == ([{"id": 2}], False)
+    assert writer.read_new() == ([], False)
@@ -0,0 +1,93 @@
+import time
+import threading
+import pytest
+from gpt import llm_client as llm
+from gpt.llm_client import LLMClient, LLMUnavailable
+
+class ServiceUnavailableError(Exception):
+    pass
+
+class BadRequestError(Exception):
+    pass
+
+@pytest.fixture(autouse=True)
+def no_backoff_sleep(monkeypatch):
+    monkeypatch.setattr(llm.time, "sleep", lambda seconds: None)
+
+def flaky(failures, error=ServiceUnavailableError):
+    calls = []
+
+    def backend(model, messages, temperature, timeout):
+        calls.append(timeout)
+        if len(calls) <= failures:
+            raise error("try again")
+        return "ok", 10
+    return backend, calls
+
+MESSAGES = [{"role": "user", "content": "hello"}]
+
+def test_retries_transient_errors_then_succeeds():
+    backend, calls = flaky(2)
+    client = LLMClient(max_retries=3, backend=backend)
+    assert client.complete(MESSAGES, "m", 0) == "ok"
+    assert len(calls) == 3
+    assert client.stats()["retries"] == 2 and client.breaker.state == "closed"
+
+def test_gives_up_after_max_retries():
+    backend, calls = flaky(10)
+    client = LLMClient(max_retries=2, backend=backend)
+    with pytest.raises(LLMUnavailable):
+        client.complete(MESSAGES, "m", 0)
+    assert len(calls) == 3
+
+def test_non_retryable_error_is_raised_at_once():
+    backend, calls = flaky(1, BadRequestError)
+    client = LLMClient(backend=backend)
+    with pytest.raises(BadRequestError):
+        client.complete(MESSAGES, "m", 0)
+    assert len(calls) == 1 and client.breaker.state == "closed"
+
+def test_breaker_opens_fails_fast_and_probes_after_cooldown():
+    backend, calls = flaky(3)
+    client = LLMClient(max_retries=0, backend=backend)
+    client.breaker.threshold = 3
+    for _ in range(3):
+        with pytest.raises(LLMUnavailable):
+            client.complete(MESSAGES, "m", 0)
+    assert client.breaker.state == "open"
+    with pytest.raises(LLMUnavailable):
+        client.complete(MESSAGES, "m", 0)
+    assert len(calls) == 3 and client.retry_delay() > 0
+
+    client.breaker.opened_at -= client.breaker.cooldown  # the cooldown runs out
+    assert client.breaker.state == "half-open"
+    assert client.complete(MESSAGES, "m", 0) == "ok"
+    assert client.breaker.state == "closed"
+
+def test_deadline_stops_retries():
+    backend, calls = flaky(10)
+    client = LLMClient(max_retries=10, backend=backend)
+    with pytest.raises(LLMUnavailable):
+        client.complete(MESSAGES, "m", 0, deadline=time.monotonic() - 1)
+    assert calls == []
+
+def test_higher_priority_callers_are_admitted_first():
+    client = LLMClient(max_concurrency=1, backend=lambda *args: ("ok", 1))
+    client.acquire(10)  # hold the only slot
+    order = []
+
+    def call(priority):
+        client.acquire(10, priority=priority)
+        order.append(priority)
+        client.release(10, 1)
+
+    threads = []
+    for priority in (1, 3, 2):
+        threads.append(threading.Thread(target=call, args=(priority,)))
+        threads[-1].start()
+        while len(client.waiting) < len(threads):
+            pass
+    client.release(10, 1)
+    for thread in threads:
+        thread.join(5)
+    assert order == [3, 2, 1]
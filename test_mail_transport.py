@@ -0,0 +1,86 @@
+import time
+import imaplib
+import threading
+from core import mail_transport
+from core.mail_transport import MailTransport, get_mail_transport, uid_set, chunks
+
+class FakeIMAP:
+    def __init__(self, abort_first=False, delay=0.0):
+        self.abort_first = abort_first
+        self.delay = delay
+        self.commands = []
+        self.busy = False
+        self.overlapped = False
+        self.logged_out = False
+
+    def login(self, account, password):
+        return "OK", [b"logged in"]
+
+    def select(self, folder):
+        return "OK", [b"1"]
+
+    def noop(self):
+        return "OK", [b""]
+
+    def logout(self):
+        self.logged_out = True
+
+    def uid(self, command, *args):
+        if self.busy:
+            self.overlapped = True
+        self.busy = True
+        try:
+            if self.abort_first:
+                self.abort_first = False
+                raise imaplib.IMAP4.abort("connection reset")
+            time.sleep(self.delay)
+            self.commands.append((command,) + args)
+            if command == "SEARCH":
+                return "OK", [b"3 4 5 9"]
+            return "OK", [None]
+        finally:
+            self.busy = False
+
+def transport(sessions):
+    made = []
+
+    def factory():
+        made.append(sessions.pop(0) if sessions else FakeIMAP())
+        return made[-1]
+    return MailTransport("imap", 993, "smtp", 465, "me@example.com", "pw",
+                         imap_factory=factory, smtp_factory=lambda: None), made
+
+def test_uid_set_and_chunks():
+    assert uid_set([7, 1, 3, 2]) == "1:3,7"
+    assert uid_set(["10"]) == "10"
+    assert list(chunks([1, 2, 3, 4, 5], 2)) == [[1, 2], [3, 4], [5]]
+
+def test_reconnects_once_after_abort():
+    t, made = transport([FakeIMAP(abort_first=True)])
+    assert t.unseen_uids() == [3, 4, 5, 9]
+    assert len(made) == 2 and made[0].logged_out
+    assert t.stats["imap_connects"] == 2
+
+def test_mark_seen_batches_uids(monkeypatch):
+    monkeypatch.setattr(mail_transport, "MAIL_FETCH_BATCH", 1)
+    t, made = transport([])
+    t.mark_seen([1, 2, 3, 7, 8, 20, 21, 22, 23, 24, 25])
+    stores = [c[1] for c in made[0].commands]
+    assert stores == ["1:3,7:8,20:24", "25"]
+
+def test_concurrent_commands_share_the_session_one_at_a_time():
+    t, made = transport([FakeIMAP(delay=0.01)])
+    threads = [threading.Thread(target=t.unseen_uids) for _ in range(4)]
+    for th in threads:
+        th.start()
+    for th in threads:
+        th.join()
+    assert len(made) == 1 and len(made[0].commands) == 4
+    assert not made[0].overlapped
+
+def test_transports_are_kept_per_client():
+    args = ("imap", 993, "smtp", 465, "shared@example.com", "pw")
+    a = get_mail_transport(*args, client_id="acme", imap_factory=FakeIMAP, smtp_factory=lambda: None)
+    b = get_mail_transport(*args, client_id="globex", imap_factory=FakeIMAP, smtp_factory=lambda: None)
+    assert a is not b
+    assert get_mail_transport(*args, client_id="acme") is a
@@ -0,0 +1,23 @@
+import os
+import time
+from gpt.response_cache import ResponseCache
+
+def test_cap_holds_across_processes_sharing_the_directory(tmp_path):
+    server = ResponseCache(tmp_path, max_entries=3, rescan_seconds=0)
+    loop = ResponseCache(tmp_path, max_entries=3, rescan_seconds=0)
+    for i in range(4):
+        server.put(f"server{i}", "reply", 60)
+        time.sleep(0.01)   # distinct mtimes: they are the LRU order
+        loop.put(f"loop{i}", "reply", 60)
+        time.sleep(0.01)
+    files = sorted(p.name for p in tmp_path.iterdir())
+    assert files == ["loop2.json", "loop3.json", "server3.json"]
+    assert server.get("loop3") == "reply"
+
+def test_stale_temp_files_are_swept(tmp_path):
+    stale = tmp_path / ".abc.123.456.tmp"
+    stale.write_text("{")
+    os.utime(stale, (time.time() - 7200, time.time() - 7200))
+    cache = ResponseCache(tmp_path, rescan_seconds=0)
+    cache.put("abc", "reply", 60)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["abc.json"]
@@ -0,0 +1,38 @@
+import pytest
+from gpt.structured_output import (
+    ROUTING_SCHEMA, SUPPORT_CHURN_SCHEMA, StructuredOutputError,
+    extract_json, first_object, parse_structured, repair_text, parse_stats
+)
+
+def test_extract_json_skips_braces_inside_strings_and_prose():
+    reply = 'Sure {not json} here: {"note": "use {braces} and \\"quotes\\"", "n": [1, 2]} done'
+    assert extract_json(reply) == {"note": 'use {braces} and "quotes"', "n": [1, 2]}
+
+def test_extract_json_takes_arrays_too():
+    assert extract_json("Leads: [1, 2, 3]") == [1, 2, 3]
+    with pytest.raises(StructuredOutputError):
+        extract_json("no json at all")
+
+def test_first_object_splits_off_the_reasoning():
+    value, json_text, rest = first_object('{"agent": "CRM Agent"}\nReasoning: follow up.')
+    assert value == {"agent": "CRM Agent"}
+    assert json_text == '{"agent": "CRM Agent"}'
+    assert rest == "Reasoning: follow up."
+
+def test_parse_structured_coerces_and_drops_bad_nested_tasks():
+    reply = '{"agent": "Sales Agent", "task": "Call back", "priority": "2", "self_improvement_task": {"task": 5}}'
+    parsed, _, _ = parse_structured(reply, ROUTING_SCHEMA, "test-coerce")
+    assert parsed == {"agent": "Sales Agent", "task": "Call back", "priority": 2}
+
+def test_repair_pass_fixes_fences_commas_literals_and_cut_off_replies():
+    reply = '```json\n{"churn_risk": True, "reason": "no logins", "retention_action": {"agent": "CRM Agent", "task": "Call",'
+    assert repair_text(reply).rstrip().endswith("}}")
+    parsed, _, _ = parse_structured(reply, SUPPORT_CHURN_SCHEMA, "test-repair")
+    assert parsed["churn_risk"] is True
+    assert parsed["retention_action"] == {"agent": "CRM Agent", "task": "Call"}
+    assert parse_stats()["repaired"]["test-repair"] == 1
+
+def test_unrepairable_reply_raises_and_is_counted():
+    with pytest.raises(StructuredOutputError):
+        parse_structured('{"agent": "Sales Agent"}', ROUTING_SCHEMA, "test-fail")
+    assert parse_stats()["failed"]["test-fail"] == 1
@@ -0,0 +1,31 @@
+from core.task_queue import TaskQueue
+
+def test_move_survives_compaction_and_reload(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    queue = TaskQueue("move-test")
+    queue.append("Retention Agent", {"task": "Call back churned client", "priority": 2})
+    queue.append("Retention Agent", {"task": "Send loyalty offer", "priority": 1})
+    queue.append("Sales Agent", {"task": "Follow up demo", "priority": 1})
+
+    assert queue.move("Retention Agent", "Support Agent") == 2
+    snapshot = queue.snapshot()
+    assert "Retention Agent" not in snapshot
+    assert [e["task"]["task"] for e in snapshot["Support Agent"]] == ["Call back churned client", "Send loyalty offer"]
+
+    queue.compact()
+    reloaded = TaskQueue("move-test").snapshot()
+    assert "Retention Agent" not in reloaded
+    assert len(reloaded["Support Agent"]) == 2
+    assert len(reloaded["Sales Agent"]) == 1
+
+def test_pop_after_move_only_takes_own_tasks(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    queue = TaskQueue("move-pop")
+    queue.append("Retention Agent", {"task": "Send loyalty offer"})
+    queue.move("Retention Agent", "Support Agent")
+
+    # Another process replaying the journal sees the same result
+    other = TaskQueue("move-pop")
+    assert other.pop("Retention Agent") == []
+    assert [e["task"]["task"] for e in other.pop("Support Agent")] == ["Send loyalty offer"]
+    assert queue.pending() == 0
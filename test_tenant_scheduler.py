@@ -0,0 +1,57 @@
+import json
+import time
+from pathlib import Path
+from core.task_queue import TaskQueue
+from core.tenant_scheduler import TenantScheduler, TenantState
+
+def make_tenant(client_id, plan=None):
+    TaskQueue(client_id).append("Sales Agent", {"task": "Follow up lead", "priority": 1})
+    if plan is not None:
+        Path(f".digi/clients/{client_id}/subscription.json").write_text(json.dumps({"plan": plan}))
+
+def test_runs_are_shared_by_tier_weight(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    make_tenant("starter-co", "starter")
+    make_tenant("enterprise-co", "enterprise")
+    scheduler = TenantScheduler()
+    scheduler.refresh(["starter-co", "enterprise-co"])
+
+    runs = {"starter-co": 0, "enterprise-co": 0}
+    for _ in range(50):
+        tenant = scheduler.next_tenant()
+        runs[tenant.client_id] += 1
+        # Both stay backlogged: straight back onto the ready heap
+        with scheduler.lock:
+            tenant.running = False
+            scheduler.mark_ready(tenant)
+    assert runs == {"starter-co": 10, "enterprise-co": 40}
+
+def test_cancelled_tenant_is_never_scheduled(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    make_tenant("gone-co", "cancelled")
+    scheduler = TenantScheduler()
+    scheduler.discover()   # a fresh tenant's calendar jobs are due at once
+
+    scheduler.refresh()
+    scheduler.timers.schedule("gone-co", time.time() - 1)
+    scheduler.wake_due_tenants()
+    assert scheduler.next_tenant() is None
+    assert scheduler.timers.next_deadline() is None
+    assert scheduler.run_once() == 0
+
+    tenant = scheduler.tenants["gone-co"]
+    assert scheduler.mark_ready(tenant) is False and scheduler.ready == []
+
+def test_deferred_tenant_waits_for_its_retry_time(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    make_tenant("busy-co")
+    scheduler = TenantScheduler()
+    tenant = scheduler.tenants["busy-co"] = TenantState("busy-co")
+    tenant.deferred_until = time.time() + 60
+
+    scheduler.refresh(["busy-co"])
+    assert scheduler.next_tenant() is None
+
+    tenant.deferred_until = time.time() - 1
+    scheduler.refresh(["busy-co"])
+    assert scheduler.next_tenant() is tenant